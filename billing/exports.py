@@ -0,0 +1,139 @@
+import csv
+import io
+import logging
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.db import connections
+
+from .models import Invoice
+
+logger = logging.getLogger(__name__)
+
+
+def export_queryset(start=None, end=None, customer=None, after=None):
+    """Invoices to export, in id order so an interrupted export can resume after an id."""
+    invoices = Invoice.objects.all()
+    if start:
+        invoices = invoices.filter(date__date__gte=start)
+    if end:
+        invoices = invoices.filter(date__date__lte=end)
+    if customer:
+        invoices = invoices.filter(customer_id=customer)
+    if after:
+        invoices = invoices.filter(pk__gt=after)
+    return invoices.order_by('pk')
+
+
+def export_filename(invoice_no):
+    return f'{invoice_no}.pdf'
+
+
+def _init_worker():
+    import django
+    from django.apps import apps
+
+    # Spawned (non-forked) workers start without Django configured
+    if not apps.ready:
+        django.setup()
+
+
+def _render(invoice_id):
+    from .pdf_cache import invoice_pdf_bytes
+
+    invoice = Invoice.objects.select_related('customer').filter(pk=invoice_id).first()
+    if invoice is None:
+        return invoice_id, None, None, 'Invoice no longer exists.'
+    try:
+        return invoice_id, invoice.invoice_no, invoice_pdf_bytes(invoice), ''
+    except Exception as exc:
+        logger.exception('Failed to render invoice %s for export', invoice_id)
+        return invoice_id, invoice.invoice_no, None, str(exc)
+
+
+def _render_in_thread(invoice_id):
+    try:
+        return _render(invoice_id)
+    finally:
+        # Pool threads are not request threads, so nothing else closes their connections
+        connections.close_all()
+
+
+def render_invoice_pdfs(invoice_ids, workers=4, processes=False):
+    """
+    Yield (invoice_id, invoice_no, pdf_bytes, error) in the order of
+    invoice_ids. At most 2 × workers renders are in flight, so memory stays
+    bounded however many invoices there are. Renders go through the PDF
+    cache, so cached invoices are just read back.
+
+    Renders run in a thread pool, which is safe inside a web request.
+    processes=True uses a process pool instead; that forks and closes the
+    caller's database connections, so only the export_invoices command,
+    which owns its process, asks for it.
+    """
+    if workers <= 1:
+        for invoice_id in invoice_ids:
+            yield _render(invoice_id)
+        return
+
+    if processes:
+        # Children must open their own database connections
+        connections.close_all()
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+        render = _render
+    else:
+        pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='invoice-export')
+        render = _render_in_thread
+    with pool:
+        pending = deque()
+        for invoice_id in invoice_ids:
+            pending.append(pool.submit(render, invoice_id))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+class _ZipStream(io.RawIOBase):
+    """Write-only sink that lets zipfile stream into a generator."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def iter_invoice_zip(invoices, workers=4):
+    """
+    Stream a ZIP of invoice PDFs without holding the archive in memory. A
+    manifest.csv listing every invoice (and any render failure) is written
+    last; resume an interrupted download with after=<last invoice id>.
+    """
+    invoice_ids = list(invoices.values_list('pk', flat=True))
+    stream = _ZipStream()
+    manifest = io.StringIO()
+    writer = csv.writer(manifest)
+    writer.writerow(['invoice_id', 'invoice_no', 'file', 'error'])
+    with zipfile.ZipFile(stream, mode='w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for invoice_id, invoice_no, pdf_bytes, error in render_invoice_pdfs(invoice_ids, workers):
+            filename = ''
+            if pdf_bytes is not None:
+                filename = export_filename(invoice_no)
+                archive.writestr(filename, pdf_bytes)
+            writer.writerow([invoice_id, invoice_no or '', filename, error])
+            chunk = stream.drain()
+            if chunk:
+                yield chunk
+        archive.writestr('manifest.csv', manifest.getvalue())
+    yield stream.drain()
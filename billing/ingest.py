@@ -0,0 +1,231 @@
+from contextlib import nullcontext
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import serializers
+
+from customers.models import Customer
+from inventory.changes import publish_changes
+from inventory.models import StockTransaction
+from inventory.rollups import default_rebuild_start
+from inventory.services import InsufficientStock, create_stock_transactions, stock_batch
+from items.models import Item
+from notifications.services import queue_invoices_created
+
+from .models import Invoice, InvoiceIngestKey, InvoiceItem, InvoiceNumbersExhausted
+from .numbering import invoice_numbers
+from .serializers import InvoiceIngestSerializer, invoice_change_payload, not_enough_stock, price_invoice
+
+INGEST_CHUNK_SIZE = 50
+MAX_INGEST_BATCH = 500
+
+
+def _created(key, invoice_id, invoice_no, status='created'):
+    return {'key': key, 'status': status, 'invoice_id': invoice_id, 'invoice_no': invoice_no}
+
+
+def _failed(key, errors):
+    return {'key': key, 'status': 'error', 'errors': errors}
+
+
+def _store(results, done):
+    for index, result in done.items():
+        results[index] = result
+
+
+def _applied_keys(keys):
+    """key → (invoice id, invoice number) for the keys already ingested."""
+    return {
+        key: (invoice_id, invoice_no)
+        for key, invoice_id, invoice_no in InvoiceIngestKey.objects.filter(key__in=keys).values_list(
+            'key', 'invoice_id', 'invoice__invoice_no'
+        )
+    }
+
+
+def _ingest_chunk(chunk):
+    """
+    Validate, price and write one chunk of (index, entry) pairs in one
+    transaction and return index → result. Items, customers and invoice
+    numbers are fetched once for the chunk, invoices, lines and keys are
+    bulk inserted, and every line's stock is taken in one
+    create_stock_transactions() call. Invoices that fail validation are
+    reported and left out without holding up the rest; InsufficientStock
+    and IntegrityError (a key applied concurrently) abort the whole chunk.
+    """
+    results = {}
+    valid = []
+    for index, entry in chunk:
+        serializer = InvoiceIngestSerializer(data=entry)
+        if serializer.is_valid():
+            valid.append((index, serializer.validated_data))
+        else:
+            results[index] = _failed(entry.get('key'), serializer.errors)
+
+    with transaction.atomic():
+        # Keys applied since the batch-level lookup, by a concurrent upload
+        applied = _applied_keys([data['key'] for _, data in valid])
+        for index, data in valid:
+            if data['key'] in applied:
+                results[index] = _created(data['key'], *applied[data['key']], status='replayed')
+        valid = [(index, data) for index, data in valid if data['key'] not in applied]
+
+        item_ids = {line['item'] for _, data in valid for line in data['items']}
+        items = Item.objects.in_bulk(item_ids)
+        customer_ids = {data['customer'] for _, data in valid if data.get('customer') is not None}
+        customers = set(Customer.objects.filter(pk__in=customer_ids).values_list('pk', flat=True))
+        # Shared by the whole chunk, so invoices for the same item draw down one balance
+        available = {item_id: item.current_stock for item_id, item in items.items()}
+
+        # Ledger rows before this day are compacted into monthly openings and cannot take a backdated sale
+        first_open_day = default_rebuild_start()
+        accepted = []
+        for index, data in valid:
+            if data.get('customer') is not None and data['customer'] not in customers:
+                results[index] = _failed(data['key'], {'customer': [f"Invalid customer: {data['customer']}"]})
+                continue
+            if first_open_day and data.get('date') and timezone.localdate(data['date']) < first_open_day:
+                results[index] = _failed(
+                    data['key'], {'date': [f'Sales before {first_open_day} fall in a compacted stock ledger month.']}
+                )
+                continue
+            remaining = dict(available)
+            try:
+                priced = price_invoice(
+                    items, [line['item'] for line in data['items']], data['items'], remaining, data['discount']
+                )
+            except serializers.ValidationError as exc:
+                results[index] = _failed(data['key'], exc.detail)
+                continue
+            available = remaining
+            accepted.append((index, data, priced))
+
+        if not accepted:
+            return results
+
+        try:
+            numbers = invoice_numbers.reserve(len(accepted))
+        except InvoiceNumbersExhausted as exc:
+            # Keep the per-invoice errors found so far; the caller fills in the rest
+            exc.results = results
+            raise
+        now = timezone.now()
+        invoices = Invoice.objects.bulk_create([
+            Invoice(
+                customer_id=data.get('customer'),
+                invoice_no=f'{number}',
+                date=data.get('date') or now,
+                total_amount=subtotal,
+                gst_amount=gst_total,
+                discount=data['discount'],
+                payment_method=data['payment_method'],
+                payment_reference=data['payment_reference'],
+            )
+            for number, (_, data, (_, subtotal, gst_total)) in zip(numbers, accepted)
+        ])
+        InvoiceItem.objects.bulk_create([
+            InvoiceItem(invoice=invoice, item=item, quantity=quantity, price=price, gst_percent=gst_percent)
+            for invoice, (_, _, (lines, _, _)) in zip(invoices, accepted)
+            for item, quantity, price, gst_percent in lines
+        ])
+        # Stock leaves at the sale time. Backdated rows land between existing
+        # ones, so they go through stock_batch(), which rebalances each item
+        # from its earliest new row and books the rollups on the sale day
+        backdated = any(data.get('date') for _, data, _ in accepted)
+        with stock_batch() if backdated else nullcontext():
+            create_stock_transactions(
+                (
+                    StockTransaction(
+                        item=item,
+                        txn_type='OUT',
+                        quantity=quantity,
+                        note=f'Invoice {invoice.invoice_no}',
+                        created_at=invoice.date,
+                    )
+                    for invoice, (_, _, (lines, _, _)) in zip(invoices, accepted)
+                    for item, quantity, _, _ in lines
+                ),
+                check_stock=True,
+            )
+        InvoiceIngestKey.objects.bulk_create([
+            InvoiceIngestKey(key=data['key'], invoice=invoice) for invoice, (_, data, _) in zip(invoices, accepted)
+        ])
+        queue_invoices_created(invoices)
+        publish_changes('invoice', [invoice_change_payload(invoice, 'created') for invoice in invoices])
+
+    for invoice, (index, data, _) in zip(invoices, accepted):
+        results[index] = _created(data['key'], invoice.pk, invoice.invoice_no)
+    return results
+
+
+def _ingest_one(index, entry):
+    """Retry path for a chunk that aborted: this invoice in a transaction of its own."""
+    key = entry['key']
+    try:
+        return _ingest_chunk([(index, entry)])
+    except InsufficientStock as exc:
+        item = Item.objects.get(pk=exc.item_id)
+        return {index: _failed(key, not_enough_stock(item, exc.available).detail)}
+    except IntegrityError:
+        applied = _applied_keys([key])
+        if key not in applied:
+            raise
+        return {index: _created(key, *applied[key], status='replayed')}
+
+
+def ingest_invoices(entries, chunk_size=INGEST_CHUNK_SIZE):
+    """
+    Create invoices queued by offline terminals, each carrying a
+    client-generated idempotency `key`, and return one result per entry in
+    input order: 'created' or 'replayed' with the invoice id and number, or
+    'error' with the validation errors.
+
+    Keys already ingested are answered from InvoiceIngestKey without
+    validating the entry again, so a terminal can resend a batch whose
+    response it never received. The rest is written `chunk_size` invoices
+    per transaction. If a chunk is undercut by a concurrent sale or upload,
+    it is rolled back and redone one invoice at a time so only the affected
+    invoices fail.
+    """
+    results = [None] * len(entries)
+    first_seen = {}
+    repeats = []
+    pending = []
+    for index, entry in enumerate(entries):
+        key = entry.get('key') if isinstance(entry, dict) else None
+        if not isinstance(key, str) or not key:
+            results[index] = _failed(key, {'key': ['An idempotency key is required.']})
+        elif key in first_seen:
+            repeats.append((index, first_seen[key]))
+        else:
+            first_seen[key] = index
+            pending.append((index, entry))
+
+    applied = _applied_keys(list(first_seen))
+    for index, entry in pending:
+        if entry['key'] in applied:
+            results[index] = _created(entry['key'], *applied[entry['key']], status='replayed')
+    pending = [(index, entry) for index, entry in pending if results[index] is None]
+
+    for start in range(0, len(pending), chunk_size):
+        chunk = pending[start:start + chunk_size]
+        try:
+            try:
+                _store(results, _ingest_chunk(chunk))
+            except (InsufficientStock, IntegrityError):
+                for index, entry in chunk:
+                    _store(results, _ingest_one(index, entry))
+        except InvoiceNumbersExhausted as exc:
+            # Nothing from here on can be numbered; invoices that already
+            # failed validation keep their own errors
+            _store(results, getattr(exc, 'results', {}))
+            for index, entry in pending[start:]:
+                if results[index] is None:
+                    results[index] = _failed(entry['key'], {'non_field_errors': [str(exc)]})
+            break
+
+    # The same key twice in one batch: the later copies replay the first
+    for index, first in repeats:
+        result = results[first]
+        results[index] = {**result, 'status': 'replayed'} if result['status'] != 'error' else result
+    return results
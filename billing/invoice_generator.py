@@ -1,3 +1,5 @@
+from copy import copy
+from functools import lru_cache
 from io import BytesIO
 from pathlib import Path
 
@@ -15,6 +17,9 @@ from reportlab.platypus import (
     TableStyle,
 )
 
+# Bump whenever the layout changes so cached renders are not reused
+TEMPLATE_VERSION = "2"
+
 # -------- COLORS --------
 ACCENT = colors.black
 TEXT_LIGHT = colors.HexColor("#6B7280")
@@ -62,91 +67,154 @@ BOLD_FONT = (
 )
 
 
+PAGE_MARGINS = {
+    "leftMargin": 12 * mm,
+    "rightMargin": 12 * mm,
+    "topMargin": 12 * mm,
+    "bottomMargin": 10 * mm,
+}
+FRAME_WIDTH = A4[0] - PAGE_MARGINS["leftMargin"] - PAGE_MARGINS["rightMargin"]
+
+
+class _CompiledLayout:
+    """
+    Everything on the invoice that does not depend on the invoice itself:
+    styles, table styles and the static paragraphs. Built once per process;
+    static flowables are shallow-copied per document because ReportLab
+    stores layout state on them while wrapping.
+    """
+
+    def __init__(self):
+        styles = getSampleStyleSheet()
+
+        # -------- STYLES --------
+        styles.add(ParagraphStyle(
+            name="InvoiceTitle",
+            fontName=BOLD_FONT,
+            fontSize=20,
+            alignment=1,
+            spaceAfter=10,
+        ))
+
+        styles.add(ParagraphStyle(
+            name="Label",
+            fontName=BOLD_FONT,
+            fontSize=9,
+        ))
+
+        styles.add(ParagraphStyle(
+            name="Value",
+            fontName=NORMAL_FONT,
+            fontSize=10,
+            leading=14,
+        ))
+
+        styles.add(ParagraphStyle(
+            name="SectionTitle",
+            fontName=BOLD_FONT,
+            fontSize=11,
+            spaceBefore=10,
+            spaceAfter=4,
+        ))
+
+        styles.add(ParagraphStyle(
+            name="Currency",
+            fontName=BOLD_FONT,
+            fontSize=10,
+            alignment=2,
+        ))
+        self.styles = styles
+
+        # -------- STATIC PARAGRAPHS --------
+        self.title = Paragraph("<b>Sri Venkateswara Metals</b>", styles["InvoiceTitle"])
+        self.shop_details = Paragraph(
+            "Mobile: +91 87786 55591<br/>"
+            "GSTIN: 33BRLPM124C1ZA<br/>"
+            "Dhramapuri Main Road, Pochampalli – 635206",
+            styles["Value"],
+        )
+        self.items_heading = Paragraph("ITEM DETAILS", styles["SectionTitle"])
+        self.footer = Paragraph(
+            "<b>Thank you for choosing our service!</b><br/>"
+            "<font color='#6B7280'>For queries, contact +91 87786 55591</font>",
+            styles["Label"],
+        )
+
+        # -------- TABLE STYLES --------
+        self.header_style = TableStyle([
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+        ])
+        self.header_divider_style = [('LINEBELOW', (0, 0), (-1, -1), 1, colors.black)]
+        self.bill_to_style = TableStyle([
+            ('BOX', (0, 0), (-1, -1), 0.8, colors.black),
+            ('LEFTPADDING', (0, 0), (-1, -1), 8),
+            ('TOPPADDING', (0, 0), (-1, -1), 6),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+        ])
+        # Price and line total cells are plain strings; the bold font and right
+        # alignment below give them the same look as the Currency style.
+        self.item_table_style = TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.black),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+            ('FONTNAME', (0, 0), (-1, -1), BOLD_FONT),
+            ('ALIGN', (2, 1), (-1, -1), 'RIGHT'),
+            ('ALIGN', (0, 1), (0, -1), 'CENTER'),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, BG_LIGHT]),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor("#D1D5DB")),
+        ])
+        self.summary_style = TableStyle([
+            ('ALIGN', (0, 0), (-1, -1), 'RIGHT'),
+            ('LINEABOVE', (0, -1), (-1, -1), 1.5, colors.black),
+            ('TOPPADDING', (0, 0), (-1, -1), 4),
+        ])
+        self.footer_divider_style = [('LINEABOVE', (0, 0), (-1, -1), 0.5, colors.black)]
+
+        self.header_widths = [FRAME_WIDTH * 0.6, FRAME_WIDTH * 0.4]
+        self.item_widths = [
+            FRAME_WIDTH * 0.07,
+            FRAME_WIDTH * 0.33,
+            FRAME_WIDTH * 0.18,
+            FRAME_WIDTH * 0.14,
+            FRAME_WIDTH * 0.28,
+        ]
+        self.item_header_row = ["S.No", "Item", "Price", "QTY", "Line Total"]
+
+
+@lru_cache(maxsize=1)
+def _layout():
+    return _CompiledLayout()
+
+
 def generate_invoice_pdf(invoice):
+    layout = _layout()
+    styles = layout.styles
     buffer = BytesIO()
 
-    doc = SimpleDocTemplate(
-        buffer,
-        pagesize=A4,
-        leftMargin=12 * mm,
-        rightMargin=12 * mm,
-        topMargin=12 * mm,
-        bottomMargin=10 * mm,
-    )
-
-    styles = getSampleStyleSheet()
-
-    # -------- STYLES --------
-    styles.add(ParagraphStyle(
-        name="InvoiceTitle",
-        fontName=BOLD_FONT,
-        fontSize=20,
-        alignment=1,
-        spaceAfter=10,
-    ))
-
-    styles.add(ParagraphStyle(
-        name="Label",
-        fontName=BOLD_FONT,
-        fontSize=9,
-    ))
-
-    styles.add(ParagraphStyle(
-        name="Value",
-        fontName=NORMAL_FONT,
-        fontSize=10,
-        leading=14,
-    ))
-
-    styles.add(ParagraphStyle(
-        name="SectionTitle",
-        fontName=BOLD_FONT,
-        fontSize=11,
-        spaceBefore=10,
-        spaceAfter=4,
-    ))
-
-    styles.add(ParagraphStyle(
-        name="Currency",
-        fontName=BOLD_FONT,
-        fontSize=10,
-        alignment=2,
-    ))
+    doc = SimpleDocTemplate(buffer, pagesize=A4, **PAGE_MARGINS)
 
     elements = []
 
     # -------- TITLE --------
-    elements.append(Paragraph("<b>Sri Venkateswara Metals</b>", styles["InvoiceTitle"]))
+    elements.append(copy(layout.title))
 
     # -------- HEADER --------
     header_table = Table(
         [[
-            Paragraph(
-                "Mobile: +91 87786 55591<br/>"
-                "GSTIN: 33BRLPM124C1ZA<br/>"
-                "Dhramapuri Main Road, Pochampalli – 635206",
-                styles["Value"],
-            ),
+            copy(layout.shop_details),
             Paragraph(
                 f"<b>Invoice No:</b> {invoice.invoice_no}<br/>"
                 f"<b>Date:</b> {invoice.date.strftime('%d %b %Y %I:%M %p')}",
                 styles["Value"],
             ),
         ]],
-        colWidths=[doc.width * 0.6, doc.width * 0.4],
+        colWidths=layout.header_widths,
     )
-
-    header_table.setStyle(TableStyle([
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-    ]))
-
+    header_table.setStyle(layout.header_style)
     elements.append(header_table)
 
     # Divider
-    elements.append(Table([[""]], colWidths=[doc.width],
-        style=[('LINEBELOW', (0, 0), (-1, -1), 1, colors.black)]
-    ))
+    elements.append(Table([[""]], colWidths=[FRAME_WIDTH], style=layout.header_divider_style))
 
     # -------- BILL TO --------
     if invoice.customer:
@@ -157,56 +225,30 @@ def generate_invoice_pdf(invoice):
                 f"Phone: {invoice.customer.phone or '-'}",
                 styles["Value"],
             )
-        ]], colWidths=[doc.width])
-
-        bill_to.setStyle(TableStyle([
-            ('BOX', (0, 0), (-1, -1), 0.8, colors.black),
-            ('LEFTPADDING', (0, 0), (-1, -1), 8),
-            ('TOPPADDING', (0, 0), (-1, -1), 6),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-        ]))
+        ]], colWidths=[FRAME_WIDTH])
+        bill_to.setStyle(layout.bill_to_style)
 
         elements.append(Spacer(1, 8))
         elements.append(bill_to)
 
     # -------- ITEMS --------
     elements.append(Spacer(1, 10))
-    elements.append(Paragraph("ITEM DETAILS", styles["SectionTitle"]))
+    elements.append(copy(layout.items_heading))
 
-    table_data = [["S.No", "Item", "Price", "QTY", "Line Total"]]
+    table_data = [layout.item_header_row]
 
     for idx, line in enumerate(invoice.items.select_related("item"), start=1):
         line_total = line.price * line.quantity
         table_data.append([
             str(idx),
             line.item.name,
-            Paragraph(f"₹{float(line.price):,.2f}", styles["Currency"]),
+            f"₹{float(line.price):,.2f}",
             f"{float(line.quantity):,.3f} kgs",
-            Paragraph(f"₹{float(line_total):,.2f}", styles["Currency"]),
+            f"₹{float(line_total):,.2f}",
         ])
 
-    item_table = Table(
-        table_data,
-        colWidths=[
-            doc.width * 0.07,
-            doc.width * 0.33,
-            doc.width * 0.18,
-            doc.width * 0.14,
-            doc.width * 0.28,
-        ],
-        repeatRows=1,
-    )
-
-    item_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.black),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-        ('FONTNAME', (0, 0), (-1, -1), BOLD_FONT),
-        ('ALIGN', (2, 1), (-1, -1), 'RIGHT'),
-        ('ALIGN', (0, 1), (0, -1), 'CENTER'),
-        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, BG_LIGHT]),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor("#D1D5DB")),
-    ]))
-
+    item_table = Table(table_data, colWidths=layout.item_widths, repeatRows=1)
+    item_table.setStyle(layout.item_table_style)
     elements.append(item_table)
 
     # -------- SUMMARY --------
@@ -218,28 +260,16 @@ def generate_invoice_pdf(invoice):
         [Paragraph(f"GST : ₹{invoice.gst_amount:,.2f}", styles["Currency"])],
         [Paragraph(f"Discount : ₹{invoice.discount:,.2f}", styles["Currency"])],
         [Paragraph(f"<b>Total Payable : ₹{payable:,.2f}</b>", styles["Currency"])],
-    ], colWidths=[doc.width])
-
-    summary_table.setStyle(TableStyle([
-        ('ALIGN', (0, 0), (-1, -1), 'RIGHT'),
-        ('LINEABOVE', (0, -1), (-1, -1), 1.5, colors.black),
-        ('TOPPADDING', (0, 0), (-1, -1), 4),
-    ]))
-
+    ], colWidths=[FRAME_WIDTH])
+    summary_table.setStyle(layout.summary_style)
     elements.append(summary_table)
 
     # -------- FOOTER --------
     elements.append(Spacer(1, 12))
-    elements.append(Table([[""]], colWidths=[doc.width],
-        style=[('LINEABOVE', (0, 0), (-1, -1), 0.5, colors.black)]
-    ))
+    elements.append(Table([[""]], colWidths=[FRAME_WIDTH], style=layout.footer_divider_style))
 
     elements.append(Spacer(1, 6))
-    elements.append(Paragraph(
-        "<b>Thank you for choosing our service!</b><br/>"
-        "<font color='#6B7280'>For queries, contact +91 87786 55591</font>",
-        styles["Label"],
-    ))
+    elements.append(copy(layout.footer))
 
     doc.build(elements)
     buffer.seek(0)
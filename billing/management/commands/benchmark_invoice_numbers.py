@@ -0,0 +1,96 @@
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from billing.models import Invoice, InvoiceNumberSequence
+from billing.numbering import BLOCK, GAPLESS, InvoiceNumberAllocator
+from inventory_billing.benchmark import Stopwatch, scratch_database
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure invoices/sec for invoice number allocation plus invoice insert with '
+        'several concurrent creators, for each gap policy. Runs against a scratch database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--creators',
+            type=int,
+            nargs='+',
+            default=[1, 4, 16],
+            help='Concurrent creator counts to benchmark (default: 1 4 16).',
+        )
+        parser.add_argument(
+            '--invoices',
+            type=int,
+            default=200,
+            help='Invoices created by each creator per run (default: 200).',
+        )
+        parser.add_argument(
+            '--policy',
+            choices=[GAPLESS, BLOCK],
+            nargs='+',
+            default=[GAPLESS, BLOCK],
+            help='Gap policies to benchmark.',
+        )
+        parser.add_argument(
+            '--block-size',
+            type=int,
+            default=50,
+            help='Block size for the block policy (default: 50).',
+        )
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            self.stdout.write(f'{"policy":<10}{"creators":>10}{"invoices":>10}{"errors":>8}{"inv/sec":>12}')
+            for policy in options['policy']:
+                for creators in options['creators']:
+                    created, errors, elapsed = self._run(
+                        policy, creators, options['invoices'], options['block_size']
+                    )
+                    rate = created / elapsed if elapsed else 0
+                    self.stdout.write(
+                        f'{policy:<10}{creators:>10}{created:>10}{errors:>8}{rate:>12.1f}'
+                    )
+
+    def _run(self, policy, creators, invoices, block_size):
+        Invoice.objects.all().delete()
+        allocator = InvoiceNumberAllocator(gap_policy=policy, block_size=block_size)
+        # Make sure the cap never ends a run early
+        InvoiceNumberSequence.objects.update_or_create(
+            pk=1, defaults={'current': 0, 'max_number': creators * invoices + block_size * creators}
+        )
+
+        barrier = threading.Barrier(creators + 1)
+        counts = []
+        lock = threading.Lock()
+
+        def create_invoices():
+            created = errors = 0
+            barrier.wait()
+            try:
+                for _ in range(invoices):
+                    try:
+                        number = None if allocator.gapless else allocator.next_number()
+                        with transaction.atomic():
+                            if number is None:
+                                number = allocator.next_number()
+                            Invoice.objects.create(invoice_no=str(number))
+                        created += 1
+                    except Exception:
+                        errors += 1
+            finally:
+                connection.close()
+                with lock:
+                    counts.append((created, errors))
+
+        threads = [threading.Thread(target=create_invoices) for _ in range(creators)]
+        for thread in threads:
+            thread.start()
+        with Stopwatch() as timer:
+            barrier.wait()
+            for thread in threads:
+                thread.join()
+        return sum(c for c, _ in counts), sum(e for _, e in counts), timer.elapsed
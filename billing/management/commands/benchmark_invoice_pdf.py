@@ -0,0 +1,81 @@
+import time
+import tracemalloc
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from billing.invoice_generator import generate_invoice_pdf
+from billing.models import Invoice, InvoiceItem
+from customers.models import Customer
+from inventory_billing.benchmark import scratch_database
+from items.models import Item
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure invoice PDFs rendered per second and peak memory per render for '
+        'invoices of different sizes. Runs against a scratch database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lines',
+            type=int,
+            nargs='+',
+            default=[1, 50, 500],
+            help='Invoice line counts to benchmark (default: 1 50 500).',
+        )
+        parser.add_argument(
+            '--seconds',
+            type=float,
+            default=3.0,
+            help='Minimum time spent rendering each invoice size (default: 3).',
+        )
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            customer = Customer.objects.create(name='Benchmark Traders', phone='9000000000')
+            items = Item.objects.bulk_create(
+                Item(name=f'MS Flat Bar {i} mm', sku=f'BENCH-{i}', price=Decimal('85.50'))
+                for i in range(max(options['lines']))
+            )
+            self.stdout.write(f'{"lines":>6}{"pdf/sec":>10}{"ms/pdf":>10}{"peak KiB":>12}')
+            for line_count in options['lines']:
+                invoice = Invoice.objects.create(
+                    customer=customer,
+                    invoice_no=f'BENCH-{line_count}',
+                    total_amount=Decimal('85.50') * line_count,
+                )
+                InvoiceItem.objects.bulk_create(
+                    InvoiceItem(
+                        invoice=invoice,
+                        item=item,
+                        quantity=Decimal('12.500'),
+                        price=item.price,
+                        gst_percent=Decimal('18'),
+                    )
+                    for item in items[:line_count]
+                )
+                invoice = Invoice.objects.select_related('customer').get(pk=invoice.pk)
+                self._report(invoice, line_count, options['seconds'])
+
+    def _report(self, invoice, line_count, seconds):
+        # Warm up once so one-off font registration is not counted
+        generate_invoice_pdf(invoice).close()
+
+        tracemalloc.start()
+        generate_invoice_pdf(invoice).close()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        renders = 0
+        started = time.perf_counter()
+        while True:
+            generate_invoice_pdf(invoice).close()
+            renders += 1
+            elapsed = time.perf_counter() - started
+            if elapsed >= seconds:
+                break
+        self.stdout.write(
+            f'{line_count:>6}{renders / elapsed:>10.1f}{elapsed / renders * 1000:>10.2f}{peak / 1024:>12.0f}'
+        )
@@ -0,0 +1,81 @@
+import os
+import shutil
+import zipfile
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from billing.exports import export_filename, export_queryset, render_invoice_pdfs
+
+
+class Command(BaseCommand):
+    help = (
+        'Export invoice PDFs for a date range and/or customer into one ZIP file. PDFs are '
+        'rendered in a process pool and staged next to the output first, so re-running '
+        'the same command after an interruption only renders what is missing.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='Path of the ZIP file to write.')
+        parser.add_argument('--start', help='First invoice date to include (YYYY-MM-DD).')
+        parser.add_argument('--end', help='Last invoice date to include (YYYY-MM-DD).')
+        parser.add_argument('--customer', type=int, help='Only export invoices for this customer id.')
+        parser.add_argument('--workers', type=int, default=4, help='Render processes (default: 4).')
+
+    def handle(self, *args, **options):
+        start = self._date(options['start'], '--start')
+        end = self._date(options['end'], '--end')
+        output = Path(options['output'])
+        staging = output.with_name(f'{output.name}.parts')
+        staging.mkdir(parents=True, exist_ok=True)
+
+        invoices = list(
+            export_queryset(start=start, end=end, customer=options['customer']).values_list(
+                'pk', 'invoice_no'
+            )
+        )
+        total = len(invoices)
+        missing = [pk for pk, invoice_no in invoices if not (staging / export_filename(invoice_no)).exists()]
+        self.stdout.write(
+            f'{total} invoice(s) to export, {total - len(missing)} already staged, '
+            f'{len(missing)} to render.'
+        )
+
+        failures = 0
+        for done, (invoice_id, invoice_no, pdf_bytes, error) in enumerate(
+            render_invoice_pdfs(missing, options['workers'], processes=True), start=1
+        ):
+            if pdf_bytes is None:
+                failures += 1
+                self.stderr.write(f'Invoice {invoice_no or invoice_id}: {error}')
+            else:
+                target = staging / export_filename(invoice_no)
+                partial = target.with_suffix('.part')
+                partial.write_bytes(pdf_bytes)
+                os.replace(partial, target)
+            if done % 50 == 0 or done == len(missing):
+                self.stdout.write(f'Rendered {done}/{len(missing)}')
+
+        if failures:
+            raise CommandError(
+                f'{failures} invoice(s) failed to render. Staged PDFs are kept in {staging}; '
+                're-run the command to retry.'
+            )
+
+        partial_zip = output.with_name(f'{output.name}.tmp')
+        with zipfile.ZipFile(partial_zip, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+            for _, invoice_no in invoices:
+                filename = export_filename(invoice_no)
+                archive.write(staging / filename, filename)
+        os.replace(partial_zip, output)
+        shutil.rmtree(staging)
+        self.stdout.write(self.style.SUCCESS(f'Exported {total} invoice(s) to {output}.'))
+
+    def _date(self, value, flag):
+        if not value:
+            return None
+        parsed = parse_date(value)
+        if parsed is None:
+            raise CommandError(f'{flag} must be a date in YYYY-MM-DD format.')
+        return parsed
@@ -3,6 +3,7 @@ from django.db import transaction
 
 from billing.models import Invoice, InvoiceItem
 from inventory.models import StockTransaction
+from inventory.services import stock_batch
 
 
 class Command(BaseCommand):
@@ -30,8 +31,10 @@ class Command(BaseCommand):
         invoice_txns = StockTransaction.objects.filter(note__startswith='Invoice ').count()
 
         with transaction.atomic():
-            # Delete stock transactions first—signals will update item stock levels.
-            StockTransaction.objects.filter(note__startswith='Invoice ').delete()
+            # Delete stock transactions first—signals will update item stock levels,
+            # coalesced by the batch into one counter update per item.
+            with stock_batch():
+                StockTransaction.objects.filter(note__startswith='Invoice ').delete()
             InvoiceItem.objects.all().delete()
             Invoice.objects.all().delete()
 
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-16 21:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0003_invoicenumbersequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InvoiceIngestKey',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('invoice', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='ingest_key', to='billing.invoice')),
+            ],
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models, transaction
+from django.utils import timezone
 
 from customers.models import Customer
 from items.models import Item
@@ -14,7 +15,8 @@ class Invoice(models.Model):
         Customer, on_delete=models.SET_NULL, null=True, blank=True
     )
     invoice_no = models.CharField(max_length=50, unique=True)
-    date = models.DateTimeField(auto_now_add=True)
+    # Defaults to now; invoices uploaded by offline terminals keep their sale time
+    date = models.DateTimeField(default=timezone.now)
     total_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
     gst_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     discount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
@@ -30,6 +32,23 @@ class Invoice(models.Model):
         return self.invoice_no
 
 
+class InvoiceIngestKey(models.Model):
+    """Idempotency key a terminal sent with an invoice uploaded through the batch ingest."""
+    key = models.CharField(max_length=64, unique=True)
+    invoice = models.OneToOneField(Invoice, related_name='ingest_key', on_delete=models.CASCADE)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.key} → {self.invoice_id}'
+
+
+class InvoiceNumbersExhausted(ValueError):
+    """The invoice number tracker has no numbers left to hand out."""
+
+    def __init__(self):
+        super().__init__('Maximum invoice number reached. Please reset the tracker.')
+
+
 class InvoiceNumberSequence(models.Model):
     current = models.PositiveIntegerField(default=0)
     max_number = models.PositiveIntegerField(default=10000)
@@ -48,13 +67,23 @@ class InvoiceNumberSequence(models.Model):
         Return the next sequential invoice number.
         Starts at 1 and caps at max_number (default 10,000).
         """
+        first, _ = cls.reserve_block(1)
+        return first
+
+    @classmethod
+    def reserve_block(cls, size):
+        """
+        Claim up to `size` consecutive invoice numbers and return the
+        (first, last) pair. The block is truncated at max_number.
+        """
         with transaction.atomic():
             seq, _ = cls.objects.select_for_update().get_or_create(pk=1, defaults={'current': 0})
             if seq.current >= seq.max_number:
-                raise ValueError('Maximum invoice number reached. Please reset the tracker.')
-            seq.current += 1
+                raise InvoiceNumbersExhausted()
+            first = seq.current + 1
+            seq.current = min(seq.current + max(size, 1), seq.max_number)
             seq.save(update_fields=['current'])
-            return seq.current
+            return first, seq.current
 
 class InvoiceItem(models.Model):
     invoice = models.ForeignKey(Invoice, related_name='items', on_delete=models.CASCADE)
@@ -0,0 +1,83 @@
+import os
+import threading
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import InvoiceNumberSequence, InvoiceNumbersExhausted
+
+GAPLESS = 'gapless'
+BLOCK = 'block'
+
+
+def _billing_setting(name, default):
+    return getattr(settings, 'BILLING', {}).get(name, default)
+
+
+class InvoiceNumberAllocator:
+    """
+    Hands out invoice numbers from InvoiceNumberSequence.
+
+    With the `gapless` policy every number is claimed on the sequence row
+    inside the caller's transaction, so a rolled-back invoice gives its
+    number back. This is what GST numbering rules usually require, at the
+    cost of every invoice serialising on the sequence row.
+
+    With the `block` policy the allocator reserves `block_size` numbers at a
+    time in its own short transaction and hands them out from memory. Numbers
+    left in a block when the process exits, or taken by an invoice that later
+    fails validation, are skipped, so the series can have gaps.
+
+    Resetting the tracker while blocks are outstanding will hand out
+    duplicates; restart the workers after a reset.
+    """
+
+    def __init__(self, gap_policy=None, block_size=None):
+        self._gap_policy = gap_policy
+        self._block_size = block_size
+        self._lock = threading.Lock()
+        self._next = 1
+        self._last = 0
+        self._pid = None
+
+    @property
+    def gap_policy(self):
+        return self._gap_policy or _billing_setting('INVOICE_NUMBER_GAP_POLICY', GAPLESS)
+
+    @property
+    def block_size(self):
+        return int(self._block_size or _billing_setting('INVOICE_NUMBER_BLOCK_SIZE', 50))
+
+    @property
+    def gapless(self):
+        return self.gap_policy != BLOCK
+
+    def next_number(self):
+        if self.gapless:
+            return InvoiceNumberSequence.next_number()
+        with self._lock:
+            # A forked worker must not reuse the block it inherited from its parent
+            if self._pid != os.getpid() or self._next > self._last:
+                if transaction.get_connection().in_atomic_block:
+                    # A reservation made here would roll back with the caller while the
+                    # block stays in memory, so claim a single number in-transaction.
+                    return InvoiceNumberSequence.next_number()
+                self._next, self._last = InvoiceNumberSequence.reserve_block(self.block_size)
+                self._pid = os.getpid()
+            number = self._next
+            self._next += 1
+            return number
+
+    def reserve(self, count):
+        """
+        Claim `count` consecutive numbers on the sequence row in the caller's
+        transaction, under either policy, so a rolled-back batch gives them
+        back. Raises InvoiceNumbersExhausted when fewer than `count` are left.
+        """
+        first, last = InvoiceNumberSequence.reserve_block(count)
+        if last - first + 1 < count:
+            raise InvoiceNumbersExhausted()
+        return range(first, last + 1)
+
+
+invoice_numbers = InvoiceNumberAllocator()
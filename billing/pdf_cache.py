@@ -0,0 +1,125 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+
+from .invoice_generator import TEMPLATE_VERSION, generate_invoice_pdf
+
+logger = logging.getLogger(__name__)
+
+
+def _cache_dir() -> Path:
+    configured = getattr(settings, 'BILLING', {}).get('PDF_CACHE_DIR')
+    return Path(configured) if configured else Path(settings.BASE_DIR) / 'var' / 'invoice_pdfs'
+
+
+def _max_bytes() -> int:
+    return int(getattr(settings, 'BILLING', {}).get('PDF_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+
+
+def invoice_fingerprint(invoice) -> str:
+    """
+    Hash everything that ends up on the rendered PDF, plus the payment fields
+    and template version, so any change produces a new cache key.
+    """
+    customer = invoice.customer
+    lines = [
+        [line.item_id, line.item.name, str(line.quantity), str(line.price), str(line.gst_percent)]
+        for line in invoice.items.select_related('item').order_by('id')
+    ]
+    document = {
+        'template': TEMPLATE_VERSION,
+        'invoice_no': invoice.invoice_no,
+        'date': invoice.date.isoformat() if invoice.date else None,
+        'customer': [customer.name, customer.phone] if customer else None,
+        'totals': [str(invoice.total_amount), str(invoice.gst_amount), str(invoice.discount)],
+        'payment': [
+            invoice.payment_status,
+            str(invoice.paid_amount),
+            invoice.payment_method,
+            invoice.payment_reference,
+            invoice.paid_at.isoformat() if invoice.paid_at else None,
+        ],
+        'lines': lines,
+    }
+    encoded = json.dumps(document, sort_keys=True, separators=(',', ':')).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def _evict(cache_dir: Path, max_bytes: int, keep: Path):
+    """Delete least recently used PDFs (never `keep`) until the cache fits in max_bytes."""
+    entries = []
+    total = 0
+    for path in cache_dir.glob('*/*.pdf'):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+        total += stat.st_size
+    if total <= max_bytes:
+        return
+    for _, size, path in sorted(entries, key=lambda entry: entry[0]):
+        if path == keep:
+            continue
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+        total -= size
+        if total <= max_bytes:
+            break
+
+
+def cached_invoice_pdf(invoice) -> Path:
+    """
+    Return the path of the rendered PDF for an invoice, rendering and storing
+    it on a cache miss. Older renders of the same invoice are removed, and a
+    hit bumps the file's mtime, which is what LRU eviction orders by.
+    """
+    fingerprint = invoice_fingerprint(invoice)
+    invoice_dir = _cache_dir() / str(invoice.pk)
+    path = invoice_dir / f'{fingerprint}.pdf'
+    if path.exists():
+        try:
+            os.utime(path)
+            return path
+        except FileNotFoundError:
+            pass  # evicted between the check and the touch
+
+    invoice_dir.mkdir(parents=True, exist_ok=True)
+    for stale in invoice_dir.glob('*.pdf'):
+        stale.unlink(missing_ok=True)
+
+    buffer = generate_invoice_pdf(invoice)
+    fd, tmp_name = tempfile.mkstemp(dir=invoice_dir, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as handle:
+        handle.write(buffer.getbuffer())
+    os.replace(tmp_name, path)
+    buffer.close()
+
+    try:
+        _evict(_cache_dir(), _max_bytes(), keep=path)
+    except OSError as exc:  # pragma: no cover - filesystem dependent
+        logger.warning('Invoice PDF cache eviction failed: %s', exc)
+    return path
+
+
+def open_invoice_pdf(invoice):
+    """Open the cached PDF for reading, rendering it first if needed."""
+    for _ in range(2):
+        path = cached_invoice_pdf(invoice)
+        try:
+            return open(path, 'rb')
+        except FileNotFoundError:
+            continue  # evicted by a concurrent writer; render again
+    raise FileNotFoundError(f'Could not cache PDF for invoice {invoice.invoice_no}')
+
+
+def invoice_pdf_bytes(invoice) -> bytes:
+    with open_invoice_pdf(invoice) as handle:
+        return handle.read()
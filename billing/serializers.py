@@ -1,16 +1,100 @@
+from datetime import timedelta
 from decimal import Decimal
 from django.db import transaction
 from django.utils import timezone
 from rest_framework import serializers
 
-from inventory.models import StockTransaction, current_stock_for_item
+from inventory.changes import publish_change
+from inventory.models import StockTransaction
+from inventory.services import InsufficientStock, create_stock_transactions
 from items.models import Item
 from notifications.services import (
-    notify_invoice_created,
-    notify_payment_confirmation,
+    queue_invoice_created,
+    queue_payment_confirmation,
 )
 
-from .models import Invoice, InvoiceItem, InvoiceNumberSequence
+from .models import Invoice, InvoiceItem
+from .numbering import invoice_numbers
+
+
+def invoice_change_payload(invoice, event):
+    """An invoice as it appears on the live change feed (inventory.changes)."""
+    return {
+        'event': event,
+        'invoice_id': invoice.pk,
+        'invoice_no': invoice.invoice_no,
+        'customer_id': invoice.customer_id,
+        'date': invoice.date.isoformat(),
+        'total_amount': float(invoice.total_amount),
+        'gst_amount': float(invoice.gst_amount),
+        'discount': float(invoice.discount),
+        'payable_amount': float(invoice.total_amount + invoice.gst_amount - invoice.discount),
+        'payment_status': invoice.payment_status,
+        'paid_amount': float(invoice.paid_amount or 0),
+    }
+
+
+def publish_invoice_change(invoice, event):
+    publish_change('invoice', invoice_change_payload(invoice, event))
+
+
+def resolve_item_id(item):
+    # DRF resolves line items to Item instances, but be defensive about raw IDs
+    try:
+        return item.pk if isinstance(item, Item) else int(item)
+    except (ValueError, TypeError):
+        raise serializers.ValidationError({'items': f'Invalid item: {item}'})
+
+
+def not_enough_stock(item, available):
+    error_msg = f'Not enough stock for {item.name} ({item.sku}). Available: {available}'
+    if available == 0:
+        error_msg += '. Please add Stock IN transactions first.'
+    return serializers.ValidationError({'items': error_msg})
+
+
+def price_invoice(items, item_ids, items_data, available, discount):
+    """
+    Price an invoice's lines against `items` (pk → Item) and check them
+    against `available` (pk → stock), drawing it down as lines are accepted
+    so lines for the same item share one balance. Returns (lines, subtotal,
+    gst_total) with lines as (item, quantity, price, gst_percent) tuples, or
+    raises ValidationError.
+    """
+    lines = []
+    subtotal = Decimal('0')
+    gst_total = Decimal('0')
+
+    for item_id, item_payload in zip(item_ids, items_data):
+        item = items.get(item_id)
+        if item is None:
+            raise serializers.ValidationError({'items': f'Invalid item: {item_id}'})
+
+        quantity = Decimal(item_payload['quantity'])
+        price = Decimal(
+            item_payload.get('price') if item_payload.get('price') is not None else item.price
+        )
+        gst_percent = Decimal(
+            item_payload.get('gst_percent')
+            if item_payload.get('gst_percent') is not None
+            else item.gst_percent
+        )
+
+        if quantity > available[item_id]:
+            raise not_enough_stock(item, available[item_id])
+        available[item_id] -= quantity
+
+        line_total = price * quantity
+        gst_amount = (line_total * gst_percent) / Decimal('100')
+        subtotal += line_total
+        gst_total += gst_amount
+        lines.append((item, quantity, price, gst_percent))
+
+    if discount < 0:
+        raise serializers.ValidationError({'discount': 'Discount cannot be negative.'})
+    if discount > (subtotal + gst_total):
+        raise serializers.ValidationError({'discount': 'Discount exceeds invoice total.'})
+    return lines, subtotal, gst_total
 
 
 class InvoiceItemSerializer(serializers.ModelSerializer):
@@ -72,88 +156,106 @@ class InvoiceSerializer(serializers.ModelSerializer):
         return float(obj.total_amount + obj.gst_amount - obj.discount)
 
     def _generate_invoice_no(self):
-        next_number = InvoiceNumberSequence.next_number()
+        next_number = invoice_numbers.next_number()
         return f'{next_number}'
 
-    @transaction.atomic
     def create(self, validated_data):
+        if not validated_data.get('invoice_no') and not invoice_numbers.gapless:
+            # Take the number before opening the invoice transaction so a block
+            # reservation commits on its own instead of holding the sequence row.
+            validated_data['invoice_no'] = self._generate_invoice_no()
+        return self._create_invoice(validated_data)
+
+    @transaction.atomic
+    def _create_invoice(self, validated_data):
         items_data = validated_data.pop('items', [])
         if not items_data:
             raise serializers.ValidationError({'items': 'At least one line item is required.'})
 
-        discount = Decimal(validated_data.get('discount') or 0)
+        # One fetch for every item on the invoice. Stock is not locked here: the
+        # check in price_invoice fails fast, and the conditional decrement in
+        # create_stock_transactions is what guarantees stock never goes negative
+        item_ids = [resolve_item_id(payload['item']) for payload in items_data]
+        items = {item.pk: item for item in Item.objects.filter(pk__in=set(item_ids))}
+        available = {item_id: Decimal(item.current_stock or 0) for item_id, item in items.items()}
+        lines, subtotal, gst_total = price_invoice(
+            items, item_ids, items_data, available, Decimal(validated_data.get('discount') or 0)
+        )
+
         if not validated_data.get('invoice_no'):
             validated_data['invoice_no'] = self._generate_invoice_no()
 
-        invoice = Invoice.objects.create(**validated_data)
-        subtotal = Decimal('0')
-        gst_total = Decimal('0')
-
-        for item_payload in items_data:
-            item = item_payload['item']
-            # Ensure item is a proper Item instance - DRF should resolve this, but be defensive
-            if not isinstance(item, Item):
-                # If it's an ID, fetch the item from database
-                try:
-                    item_id = int(item) if not hasattr(item, 'pk') else (item.pk or item.id if hasattr(item, 'id') else item)
-                    item = Item.objects.select_for_update().get(pk=item_id)
-                except (ValueError, TypeError, Item.DoesNotExist):
-                    raise serializers.ValidationError(
-                        {'items': f'Invalid item: {item}'}
-                    )
-            else:
-                # Refresh from database to ensure we have latest data
-                item.refresh_from_db()
-            
-            quantity = Decimal(item_payload['quantity'])
-            price = Decimal(
-                item_payload.get('price') if item_payload.get('price') is not None else item.price
-            )
-            gst_percent = Decimal(
-                item_payload.get('gst_percent')
-                if item_payload.get('gst_percent') is not None
-                else item.gst_percent
-            )
-
-            # Calculate available stock - this queries the transaction ledger directly
-            available = current_stock_for_item(item)
-            if quantity > available:
-                error_msg = f'Not enough stock for {item.name} ({item.sku}). Available: {available}'
-                if available == 0:
-                    error_msg += '. Please add Stock IN transactions first.'
-                raise serializers.ValidationError({'items': error_msg})
-
-            line_total = price * quantity
-            gst_amount = (line_total * gst_percent) / Decimal('100')
-            subtotal += line_total
-            gst_total += gst_amount
-
-            InvoiceItem.objects.create(
+        invoice = Invoice.objects.create(
+            **validated_data, total_amount=subtotal, gst_amount=gst_total
+        )
+        InvoiceItem.objects.bulk_create([
+            InvoiceItem(
                 invoice=invoice,
                 item=item,
                 quantity=quantity,
                 price=price,
                 gst_percent=gst_percent,
             )
-            StockTransaction.objects.create(
-                item=item,
-                txn_type='OUT',
-                quantity=quantity,
-                note=f'Invoice {invoice.invoice_no}',
+            for item, quantity, price, gst_percent in lines
+        ])
+        try:
+            create_stock_transactions(
+                (
+                    StockTransaction(
+                        item=item,
+                        txn_type='OUT',
+                        quantity=quantity,
+                        note=f'Invoice {invoice.invoice_no}',
+                    )
+                    for item, quantity, _, _ in lines
+                ),
+                check_stock=True,
             )
+        except InsufficientStock as exc:
+            # Another sale took the stock after the check above; the invoice rolls back
+            raise not_enough_stock(items[exc.item_id], exc.available)
 
-        if discount < 0:
-            raise serializers.ValidationError({'discount': 'Discount cannot be negative.'})
-        if discount > (subtotal + gst_total):
-            raise serializers.ValidationError({'discount': 'Discount exceeds invoice total.'})
+        queue_invoice_created(invoice)
+        publish_invoice_change(invoice, 'created')
 
-        invoice.total_amount = subtotal
-        invoice.gst_amount = gst_total
-        invoice.save()
+        return invoice
 
-        notify_invoice_created(invoice)
 
-        return invoice
+class InvoiceListSerializer(serializers.ModelSerializer):
+    """
+    Lean invoice representation for the list endpoint. Line items are only
+    included when the view is asked to expand them (?expand=items).
+    """
+
+    items = InvoiceItemSerializer(many=True, read_only=True)
+    customer_name = serializers.CharField(source='customer.name', read_only=True)
+    payable_amount = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Invoice
+        fields = [
+            'id',
+            'invoice_no',
+            'customer',
+            'customer_name',
+            'date',
+            'total_amount',
+            'gst_amount',
+            'discount',
+            'payment_status',
+            'paid_amount',
+            'payable_amount',
+            'items',
+        ]
+        read_only_fields = fields
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if not self.context.get('expand_items'):
+            self.fields.pop('items')
+
+    def get_payable_amount(self, obj):
+        return float(obj.total_amount + obj.gst_amount - obj.discount)
 
 
 class PaymentConfirmationSerializer(serializers.Serializer):
@@ -192,7 +294,8 @@ class PaymentConfirmationSerializer(serializers.Serializer):
             ]
         )
 
-        notify_payment_confirmation(
+        publish_invoice_change(invoice, 'paid')
+        queue_payment_confirmation(
             invoice,
             {
                 'amount': amount,
@@ -202,3 +305,41 @@ class PaymentConfirmationSerializer(serializers.Serializer):
         )
 
         return invoice
+
+
+# How far ahead of the server a terminal's clock may run before its sale dates are refused
+INGEST_CLOCK_SKEW = timedelta(minutes=5)
+
+
+class InvoiceIngestLineSerializer(serializers.Serializer):
+    item = serializers.IntegerField()
+    quantity = serializers.DecimalField(max_digits=12, decimal_places=3)
+    price = serializers.DecimalField(max_digits=12, decimal_places=2, required=False, allow_null=True)
+    gst_percent = serializers.DecimalField(max_digits=5, decimal_places=2, required=False, allow_null=True)
+
+    def validate_quantity(self, value):
+        if value <= 0:
+            raise serializers.ValidationError('Quantity must be positive.')
+        return value
+
+
+class InvoiceIngestSerializer(serializers.Serializer):
+    """
+    One invoice in a batch upload (see billing.ingest). Items and customer
+    are plain ids so a whole chunk resolves them with one query each,
+    instead of one per line as with InvoiceSerializer.
+    """
+
+    key = serializers.CharField(max_length=64)
+    customer = serializers.IntegerField(required=False, allow_null=True)
+    discount = serializers.DecimalField(max_digits=12, decimal_places=2, required=False, default=Decimal('0'))
+    payment_method = serializers.CharField(max_length=50, required=False, allow_blank=True, default='')
+    payment_reference = serializers.CharField(max_length=100, required=False, allow_blank=True, default='')
+    # When the sale was made on the terminal; upload time if left out
+    date = serializers.DateTimeField(required=False)
+    items = InvoiceIngestLineSerializer(many=True, allow_empty=False)
+
+    def validate_date(self, value):
+        if value > timezone.now() + INGEST_CLOCK_SKEW:
+            raise serializers.ValidationError('Invoice date cannot be in the future.')
+        return value
@@ -0,0 +1,195 @@
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from customers.models import Customer
+from inventory.balances import rebuild_running_balances
+from inventory.models import StockDailyRollup, StockOpeningBalance, StockTransaction
+from inventory.rollups import rebuild_daily_rollups
+from items.models import Item
+
+from .models import Invoice, InvoiceItem, InvoiceNumberSequence
+
+
+class InvoiceListQueryBudgetTests(APITestCase):
+    """The invoice list costs a fixed number of queries per page, however many invoices it holds."""
+
+    LINES_PER_INVOICE = 3
+
+    @classmethod
+    def setUpTestData(cls):
+        # The cashier role is created by auth_user.signals
+        get_user_model().objects.create_user('cashier', password='secret')
+        cls.customer = Customer.objects.create(name='Ravi Traders', phone='9000000001')
+        cls.items = [
+            Item.objects.create(name=f'Rod {n}', sku=f'ROD-{n}', price=Decimal('100'))
+            for n in range(cls.LINES_PER_INVOICE)
+        ]
+
+    def setUp(self):
+        # Loaded with its role so the permission check does not add a query
+        user = get_user_model().objects.select_related('userrole').get(username='cashier')
+        self.client.force_authenticate(user=user)
+        self.url = reverse('invoice-list-create')
+
+    def create_invoices(self, count):
+        for _ in range(count):
+            number = Invoice.objects.count() + 1
+            invoice = Invoice.objects.create(
+                customer=self.customer, invoice_no=f'{number}', total_amount=Decimal('300')
+            )
+            InvoiceItem.objects.bulk_create([
+                InvoiceItem(invoice=invoice, item=item, quantity=Decimal('1'), price=item.price)
+                for item in self.items
+            ])
+
+    def assert_list_queries(self, expected, page_size, expand=False):
+        params = {'page_size': page_size}
+        if expand:
+            params['expand'] = 'items'
+        with self.assertNumQueries(expected):
+            response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.data['results']
+
+    def test_list_without_items_is_one_query(self):
+        for count, page_size in ((3, 2), (13, 10), (13, 50)):
+            with self.subTest(invoices=count, page_size=page_size):
+                Invoice.objects.all().delete()
+                self.create_invoices(count)
+                results = self.assert_list_queries(1, page_size)
+                self.assertEqual(len(results), min(count, page_size))
+                self.assertNotIn('items', results[0])
+                self.assertEqual(results[0]['customer_name'], 'Ravi Traders')
+
+    def test_list_with_expanded_items_is_two_queries(self):
+        for count, page_size in ((3, 2), (13, 10), (13, 50)):
+            with self.subTest(invoices=count, page_size=page_size):
+                Invoice.objects.all().delete()
+                self.create_invoices(count)
+                results = self.assert_list_queries(2, page_size, expand=True)
+                self.assertEqual(len(results), min(count, page_size))
+                self.assertEqual(len(results[0]['items']), self.LINES_PER_INVOICE)
+                self.assertEqual(results[0]['items'][0]['item_sku'], 'ROD-0')
+
+
+class InvoiceIngestTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user('cashier', password='secret')
+        cls.item = Item.objects.create(
+            name='Rod', sku='ROD-1', price=Decimal('100'), current_stock=Decimal('50')
+        )
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('invoice-ingest')
+
+    def entry(self, key, **extra):
+        return {'key': key, 'items': [{'item': self.item.pk, 'quantity': '1'}], **extra}
+
+    def test_keeps_the_terminal_sale_date(self):
+        sold_at = timezone.now() - timedelta(days=2)
+        response = self.client.post(
+            self.url,
+            {'invoices': [self.entry('t1-1', date=sold_at.isoformat()), self.entry('t1-2')]},
+            format='json',
+        )
+        self.assertEqual(response.data['created'], 2)
+        dated, undated = (Invoice.objects.get(pk=r['invoice_id']) for r in response.data['results'])
+        self.assertEqual(dated.date, sold_at)
+        self.assertLess(timezone.now() - undated.date, timedelta(minutes=1))
+
+    def test_backdated_sale_moves_stock_at_the_sale_time(self):
+        StockTransaction.objects.create(item=self.item, txn_type='IN', quantity=Decimal('50'))
+        StockTransaction.objects.filter(item=self.item).update(created_at=timezone.now() - timedelta(days=5))
+        rebuild_running_balances()
+        rebuild_daily_rollups()
+        later = StockTransaction.objects.create(item=self.item, txn_type='IN', quantity=Decimal('5'))
+        sold_at = timezone.now() - timedelta(days=2)
+
+        response = self.client.post(
+            self.url, {'invoices': [self.entry('t1-7', date=sold_at.isoformat())]}, format='json'
+        )
+
+        self.assertEqual(response.data['created'], 1)
+        sale = StockTransaction.objects.get(item=self.item, txn_type='OUT')
+        self.assertEqual(sale.created_at, sold_at)
+        self.assertEqual(sale.balance_after, Decimal('49'))
+        later.refresh_from_db()
+        self.assertEqual(later.balance_after, Decimal('54'))
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.current_stock, Decimal('54'))
+        rollup = StockDailyRollup.objects.get(item=self.item, out_qty__gt=0)
+        self.assertEqual((rollup.day, rollup.out_qty), (timezone.localdate(sold_at), Decimal('1')))
+
+    def test_rejects_sales_dated_in_a_compacted_month(self):
+        compacted = timezone.localdate().replace(day=1) - timedelta(days=1)
+        StockOpeningBalance.objects.create(item=self.item, period=compacted.replace(day=1))
+        sold_at = timezone.now() - timedelta(days=timezone.localdate().day + 1)
+        response = self.client.post(
+            self.url, {'invoices': [self.entry('t1-8', date=sold_at.isoformat())]}, format='json'
+        )
+        self.assertEqual(response.data['error'], 1)
+        self.assertIn('date', response.data['results'][0]['errors'])
+
+    def test_rejects_a_future_sale_date(self):
+        future = timezone.now() + timedelta(days=1)
+        response = self.client.post(
+            self.url, {'invoices': [self.entry('t1-3', date=future.isoformat())]}, format='json'
+        )
+        self.assertEqual(response.data['error'], 1)
+        self.assertIn('date', response.data['results'][0]['errors'])
+        self.assertFalse(Invoice.objects.exists())
+
+    def test_exhausted_numbers_fail_the_rest_of_the_batch(self):
+        InvoiceNumberSequence.objects.create(pk=1, current=1, max_number=2)
+        invalid = {'key': 't1-9', 'items': [{'item': self.item.pk, 'quantity': '-1'}]}
+        response = self.client.post(
+            self.url, {'invoices': [self.entry('t1-4'), invalid, self.entry('t1-5')]}, format='json'
+        )
+        self.assertEqual(response.data['error'], 3)
+        first, rejected, last = response.data['results']
+        self.assertIn('Maximum invoice number', first['errors']['non_field_errors'][0])
+        self.assertIn('Maximum invoice number', last['errors']['non_field_errors'][0])
+        # Its own validation error is kept, not replaced by the numbering one
+        self.assertIn('items', rejected['errors'])
+
+    def test_unrelated_value_errors_are_not_reported_as_exhausted_numbers(self):
+        with mock.patch('billing.ingest.create_stock_transactions', side_effect=ValueError('boom')):
+            with self.assertRaises(ValueError):
+                self.client.post(self.url, {'invoices': [self.entry('t1-6')]}, format='json')
+
+
+class InvoiceExportFilterTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user('admin', password='secret')
+        cls.user.userrole.role = 'admin'
+        cls.user.userrole.save()
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.user)
+
+    def test_rejects_malformed_and_reversed_ranges(self):
+        for params in (
+            {'start': 'garbage'},
+            {'end': '2024-13-01'},
+            {'start': '2024-02-30'},
+            {'start': '2024-03-01', 'end': '2024-02-01'},
+            {'customer': 'abc'},
+        ):
+            with self.subTest(**params):
+                response = self.client.get(reverse('invoice-export'), params)
+                self.assertEqual(response.status_code, 400)
+
+    def test_valid_range_streams_a_zip(self):
+        response = self.client.get(reverse('invoice-export'), {'start': '2024-02-01', 'end': '2024-02-01'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        b''.join(response.streaming_content)
@@ -4,6 +4,8 @@ from . import views
 
 urlpatterns = [
     path('', views.InvoiceListCreate.as_view(), name='invoice-list-create'),
+    path('ingest/', views.InvoiceIngestView.as_view(), name='invoice-ingest'),
+    path('export/', views.InvoiceExportView.as_view(), name='invoice-export'),
     path('<int:pk>/', views.InvoiceDetail.as_view(), name='invoice-detail'),
     path(
         '<int:pk>/confirm-payment/',
@@ -1,22 +1,93 @@
-from django.http import FileResponse
+from django.conf import settings
+from django.db.models import Prefetch
+from django.http import FileResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.dateparse import parse_date
 from rest_framework import generics
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.permissions import AllowAny
 
-from auth_user.permissions import IsAdminOrCashier
+from auth_user.permissions import IsAdminOrCashier, IsAdminRole
 
-from .models import Invoice
-from .serializers import InvoiceSerializer, PaymentConfirmationSerializer
-from .invoice_generator import generate_invoice_pdf
+from .models import Invoice, InvoiceItem
+from .pagination import InvoiceCursorPagination
+from .serializers import (
+    InvoiceListSerializer,
+    InvoiceSerializer,
+    PaymentConfirmationSerializer,
+)
+from .exports import export_queryset, iter_invoice_zip
+from .ingest import MAX_INGEST_BATCH, ingest_invoices
+from .pdf_cache import open_invoice_pdf
 
 
 class InvoiceListCreate(generics.ListCreateAPIView):
-    queryset = Invoice.objects.all().order_by('-date')
+    """
+    Lists invoices newest first with cursor pagination. Line items are left
+    out unless ?expand=items is passed; either way a page costs a fixed
+    number of queries (one, plus one for expanded lines).
+    """
+
+    queryset = Invoice.objects.all().order_by('-date', '-id')
     serializer_class = InvoiceSerializer
+    pagination_class = InvoiceCursorPagination
     permission_classes = [IsAdminOrCashier]
 
+    def _expand_items(self):
+        return 'items' in self.request.query_params.get('expand', '').split(',')
+
+    def get_queryset(self):
+        queryset = super().get_queryset().select_related('customer')
+        if self.request.method == 'GET' and self._expand_items():
+            queryset = queryset.prefetch_related(
+                Prefetch('items', queryset=InvoiceItem.objects.select_related('item').order_by('id'))
+            )
+        return queryset
+
+    def get_serializer_class(self):
+        if self.request.method == 'GET':
+            return InvoiceListSerializer
+        return InvoiceSerializer
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['expand_items'] = self._expand_items()
+        return context
+
+
+class InvoiceIngestView(APIView):
+    """
+    Batch upload of invoices queued by offline terminals.
+
+    POST {"invoices": [{"key": "<client-generated id>", "customer", "discount",
+    "payment_method", "payment_reference", "date", "items": [{"item",
+    "quantity", "price", "gst_percent"}]}, ...]} with up to MAX_INGEST_BATCH
+    invoices. "date" is when the terminal made the sale (ISO 8601, not in the
+    future); invoices without one are dated at upload.
+    The response has one result per invoice, in order: 'created',
+    'replayed' (the key was already applied; nothing is written again) or
+    'error'. Resending a whole batch after a timeout is safe.
+    """
+
+    permission_classes = [IsAdminOrCashier]
+
+    def post(self, request):
+        entries = request.data.get('invoices') if isinstance(request.data, dict) else None
+        if not isinstance(entries, list) or not entries:
+            return Response({'detail': 'invoices must be a non-empty list.'}, status=400)
+        if len(entries) > MAX_INGEST_BATCH:
+            return Response(
+                {'detail': f'At most {MAX_INGEST_BATCH} invoices per batch.'},
+                status=400,
+            )
+
+        results = ingest_invoices(entries)
+        counts = {status: 0 for status in ('created', 'replayed', 'error')}
+        for result in results:
+            counts[result['status']] += 1
+        return Response({**counts, 'results': results})
+
 
 class InvoiceDetail(generics.RetrieveAPIView):
     queryset = Invoice.objects.all()
@@ -42,10 +113,49 @@ class InvoicePDFView(APIView):
     permission_classes = [AllowAny]
 
     def get(self, request, pk):
-        invoice = get_object_or_404(
-            Invoice.objects.select_related('customer').prefetch_related('items__item'),
-            pk=pk,
-        )
-        buffer = generate_invoice_pdf(invoice)
+        invoice = get_object_or_404(Invoice.objects.select_related('customer'), pk=pk)
+        # Served straight from the on-disk render cache; rendered on a miss
+        handle = open_invoice_pdf(invoice)
         filename = f'{invoice.invoice_no}.pdf'
-        return FileResponse(buffer, as_attachment=True, filename=filename)
+        return FileResponse(handle, as_attachment=True, filename=filename)
+
+
+def _optional_date(value):
+    """A YYYY-MM-DD query value, or None when absent; anything else raises ValueError."""
+    if not value:
+        return None
+    parsed = parse_date(value)
+    if parsed is None:
+        raise ValueError(f'Invalid date: {value}')
+    return parsed
+
+
+class InvoiceExportView(APIView):
+    """
+    Stream every invoice PDF matching ?start=&end= (YYYY-MM-DD) and/or
+    ?customer=<id> as one ZIP. Pass ?after=<invoice id> to resume.
+    """
+
+    permission_classes = [IsAdminRole]
+
+    def get(self, request):
+        params = request.query_params
+        try:
+            start = _optional_date(params.get('start'))
+            end = _optional_date(params.get('end'))
+            customer = int(params['customer']) if params.get('customer') else None
+            after = int(params['after']) if params.get('after') else None
+        except ValueError:
+            return Response({'detail': 'Invalid export filters.'}, status=400)
+        if start and end and start > end:
+            return Response({'detail': 'start must not be after end.'}, status=400)
+
+        invoices = export_queryset(start=start, end=end, customer=customer, after=after)
+        workers = getattr(settings, 'BILLING', {}).get('EXPORT_WORKERS', 4)
+        response = StreamingHttpResponse(
+            iter_invoice_zip(invoices, workers=workers),
+            content_type='application/zip',
+        )
+        label = '_'.join(str(part) for part in (start, end) if part) or 'all'
+        response['Content-Disposition'] = f'attachment; filename="invoices_{label}.zip"'
+        return response
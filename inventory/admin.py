@@ -1,8 +1,13 @@
 from django.contrib import admin
 from django.utils.html import format_html
 from django.urls import reverse
-from .models import StockTransaction, current_stock_for_item
-from items.models import Item
+from .models import (
+    GoodsReceipt,
+    GoodsReceiptLine,
+    StockOpeningBalance,
+    StockTransaction,
+)
+from .services import stock_batch
 
 
 @admin.register(StockTransaction)
@@ -25,9 +30,9 @@ class StockTransactionAdmin(admin.ModelAdmin):
     )
     
     def item_link(self, obj):
-        """Link to the item with stock info"""
+        """Link to the item with its cached stock (item is select_related)"""
         url = reverse('admin:items_item_change', args=[obj.item.pk])
-        current_stock = current_stock_for_item(obj.item)
+        current_stock = obj.item.current_stock
         return format_html(
             '<a href="{}">{} ({})</a><br><small>Stock: {}</small>',
             url,
@@ -57,13 +62,60 @@ class StockTransactionAdmin(admin.ModelAdmin):
         """Optimize queries with select_related"""
         qs = super().get_queryset(request)
         return qs.select_related('item')
-    
+
     def save_model(self, request, obj, form, change):
-        """Override save to ensure stock is recalculated"""
-        super().save_model(request, obj, form, change)
-        # Stock will be recalculated via signals, but we can also force it
-        current_stock_for_item(obj.item)
+        """
+        New rows are applied by the post_save signal. An edit is applied as
+        taking the old row out and putting the new one in, so the counters,
+        running balances and daily rollups all follow it.
+        """
+        with stock_batch() as batch:
+            previous = StockTransaction.objects.get(pk=obj.pk) if change else None
+            super().save_model(request, obj, form, change)
+            if previous is not None:
+                batch.deleted(previous)
+                batch.created(obj)
 
 
-# Note: Item admin is registered in items/admin.py
+@admin.register(StockOpeningBalance)
+class StockOpeningBalanceAdmin(admin.ModelAdmin):
+    list_display = ['item', 'period', 'total_in', 'total_out', 'closing_balance', 'txn_count', 'archive_names']
+    list_filter = ['period']
+    search_fields = ['item__name', 'item__sku', 'archives']
+    list_select_related = ['item']
+    readonly_fields = [
+        'item', 'period', 'total_in', 'total_out', 'closing_balance', 'txn_count', 'archives', 'created_at'
+    ]
+
+    def archive_names(self, obj):
+        return ', '.join(obj.archives)
+    archive_names.short_description = 'Archives'
+
+    def has_add_permission(self, request):
+        # Rows are written only by compact_stock_ledger
+        return False
+
+
+
+class GoodsReceiptLineInline(admin.TabularInline):
+    model = GoodsReceiptLine
+    extra = 0
+    fields = ['item', 'quantity', 'note', 'stock_transaction']
+    readonly_fields = fields
+    can_delete = False
 
+    def has_add_permission(self, request, obj=None):
+        # Lines are posted through the goods receipt API so stock is applied with them
+        return False
+
+
+@admin.register(GoodsReceipt)
+class GoodsReceiptAdmin(admin.ModelAdmin):
+    list_display = ['id', 'supplier_reference', 'supplier_name', 'created_at']
+    search_fields = ['supplier_reference', 'supplier_name', 'note']
+    readonly_fields = ['created_at']
+    date_hierarchy = 'created_at'
+    inlines = [GoodsReceiptLineInline]
+
+
+# Note: Item admin is registered in items/admin.py
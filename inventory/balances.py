@@ -0,0 +1,177 @@
+from datetime import time
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from items.models import Item
+
+from .models import StockOpeningBalance, StockTransaction
+
+
+def _signed(txn_type, quantity) -> Decimal:
+    quantity = Decimal(quantity)
+    return quantity if txn_type == 'IN' else -quantity
+
+
+def record_balance(txn):
+    """Stamp a just-applied transaction with the item's balance after it, in one UPDATE."""
+    StockTransaction.objects.filter(pk=txn.pk).update(
+        balance_after=Subquery(
+            Item.objects.filter(pk=OuterRef('item_id')).values('current_stock')[:1]
+        )
+    )
+
+
+def shift_later_balances(txn):
+    """Take a deleted transaction out of the running balance of every later row of its item."""
+    StockTransaction.objects.filter(item_id=txn.item_id).filter(
+        Q(created_at__gt=txn.created_at) | Q(created_at=txn.created_at, pk__gt=txn.pk)
+    ).update(balance_after=F('balance_after') - _signed(txn.txn_type, txn.quantity))
+
+
+def assign_running_balances(transactions, opening):
+    """
+    Set balance_after on unsaved transactions in list order, starting from
+    `opening` (item_id → balance before the first of them). Returns the
+    balances after them, to carry into the next chunk.
+    """
+    balances = dict(opening)
+    for txn in transactions:
+        balance = balances.get(txn.item_id, Decimal('0')) + _signed(txn.txn_type, txn.quantity)
+        txn.balance_after = balance
+        balances[txn.item_id] = balance
+    return balances
+
+
+def _after(created_at, pk):
+    return Q(created_at__gt=created_at) | Q(created_at=created_at, pk__gte=pk)
+
+
+def rebalance_from(starts):
+    """
+    Recompute balance_after for each item's rows from a ledger position on.
+    `starts` maps item_id → (created_at, pk); the rows before it are trusted
+    and give the starting balance. Two reads per item, one batched write.
+    """
+    pending = []
+    for item_id, (created_at, pk) in starts.items():
+        rows = StockTransaction.objects.filter(item_id=item_id)
+        base = (
+            rows.exclude(_after(created_at, pk))
+            .order_by('-created_at', '-pk')
+            .values_list('balance_after', flat=True)
+            .first()
+        )
+        if base is None:
+            base = (
+                StockOpeningBalance.objects.filter(item_id=item_id)
+                .order_by('-period')
+                .values_list('closing_balance', flat=True)
+                .first()
+            ) or Decimal('0')
+        balance = base
+        later = rows.filter(_after(created_at, pk)).order_by('created_at', 'pk').values_list(
+            'pk', 'txn_type', 'quantity', 'balance_after'
+        )
+        for row_pk, txn_type, quantity, stored in later.iterator():
+            balance += _signed(txn_type, quantity)
+            if stored != balance:
+                pending.append((balance, row_pk))
+    if pending:
+        _write_balances(StockTransaction, pending)
+
+
+def compacted_month(moment, item_ids=None):
+    """
+    The first day of the compacted month `moment` falls strictly inside, for
+    any of `item_ids` (default: any item), or None. balance_as_of() cannot
+    answer such moments exactly; a month's start is always answerable.
+    """
+    local = timezone.localtime(moment)
+    month_start = local.date().replace(day=1)
+    if local.date() == month_start and local.time() == time.min:
+        return None
+    openings = StockOpeningBalance.objects.filter(period=month_start)
+    if item_ids is not None:
+        openings = openings.filter(item_id__in=item_ids)
+    return month_start if openings.exists() else None
+
+
+def balance_as_of(moment, item_ref='pk'):
+    """
+    Subquery expression for an item's stock just before `moment`: the
+    balance_after of its latest earlier transaction, else the closing balance
+    of its latest compacted month that ended by then, else 0. Each branch is
+    a single index seek. Inside a compacted month only month ends are known,
+    so callers must refuse moments for which compacted_month() answers.
+    """
+    latest = StockTransaction.objects.filter(
+        item_id=OuterRef(item_ref), created_at__lt=moment
+    ).order_by('-created_at', '-pk')
+    month_start = timezone.localtime(moment).date().replace(day=1)
+    opening = StockOpeningBalance.objects.filter(
+        item_id=OuterRef(item_ref), period__lt=month_start
+    ).order_by('-period')
+    return Coalesce(
+        Subquery(latest.values('balance_after')[:1]),
+        Subquery(opening.values('closing_balance')[:1]),
+        Decimal('0'),
+    )
+
+
+def _write_balances(model, rows):
+    # A plain executemany: bulk_update's per-row CASE expressions cost far
+    # more to compile than the UPDATEs themselves cost to run
+    quote = connection.ops.quote_name
+    sql = (
+        f'UPDATE {quote(model._meta.db_table)} SET {quote("balance_after")} = %s '
+        f'WHERE {quote(model._meta.pk.column)} = %s'
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+
+
+def _latest_closing_balances():
+    closings = {}
+    rows = StockOpeningBalance.objects.order_by('item_id', 'period').values_list('item_id', 'closing_balance')
+    for item_id, closing in rows.iterator():
+        closings[item_id] = closing
+    return closings
+
+
+def rebuild_running_balances(model=StockTransaction, chunk_size=2000):
+    """
+    Recompute balance_after for the whole ledger in one streaming pass in
+    (item, created_at, id) order, starting each item from the closing balance
+    of its latest compacted month, and writing only rows whose stored value
+    is wrong. Runs in one transaction so concurrent movements cannot
+    interleave. Returns (rows scanned, rows updated).
+    """
+    scanned = updated = 0
+    pending = []
+    current_item = None
+    balance = Decimal('0')
+    with transaction.atomic():
+        closings = _latest_closing_balances()
+        rows = model.objects.order_by('item_id', 'created_at', 'pk').values_list(
+            'pk', 'item_id', 'txn_type', 'quantity', 'balance_after'
+        )
+        for pk, item_id, txn_type, quantity, stored in rows.iterator(chunk_size=chunk_size):
+            if item_id != current_item:
+                current_item = item_id
+                balance = closings.get(item_id, Decimal('0'))
+            balance += _signed(txn_type, quantity)
+            scanned += 1
+            if stored != balance:
+                pending.append((balance, pk))
+            if len(pending) >= chunk_size:
+                _write_balances(model, pending)
+                updated += len(pending)
+                pending = []
+        if pending:
+            _write_balances(model, pending)
+            updated += len(pending)
+    return scanned, updated
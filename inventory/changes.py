@@ -0,0 +1,122 @@
+import threading
+import time
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from items.models import Item
+
+from .models import StockChangeEvent
+
+MAX_EVENTS = 500
+POLL_INTERVAL = 1.0
+
+# Wakes waiters in this process as soon as a publishing transaction commits;
+# waiters in other processes notice on their next poll
+_committed = threading.Condition()
+
+
+def _notify():
+    with _committed:
+        _committed.notify_all()
+
+
+def _publish(events):
+    StockChangeEvent.objects.bulk_create(events)
+    transaction.on_commit(_notify)
+
+
+def publish_stock_changes(item_ids):
+    """
+    Append one 'stock' event per item with its counters as they are now, in
+    the caller's transaction. Two queries, whatever the number of items.
+    """
+    item_ids = list(item_ids)
+    if not item_ids:
+        return
+    items = Item.objects.filter(pk__in=item_ids).values_list(
+        'id', 'sku', 'name', 'unit', 'total_in_stock', 'total_out_stock', 'current_stock', 'reorder_level'
+    )
+    _publish([
+        StockChangeEvent(
+            kind='stock',
+            payload={
+                'item_id': item_id,
+                'sku': sku,
+                'name': name,
+                'unit': unit,
+                'total_in': float(total_in),
+                'total_out': float(total_out),
+                'current_stock': float(current),
+                'reorder_level': float(reorder_level),
+                'is_low_stock': current <= reorder_level,
+            },
+        )
+        for item_id, sku, name, unit, total_in, total_out, current, reorder_level in items
+    ])
+
+
+def publish_change(kind, payload):
+    publish_changes(kind, [payload])
+
+
+def publish_changes(kind, payloads):
+    _publish([StockChangeEvent(kind=kind, payload=payload) for payload in payloads])
+
+
+def latest_sequence():
+    return StockChangeEvent.objects.aggregate(seq=Max('pk'))['seq'] or 0
+
+
+def is_expired(since):
+    """True when events after `since` have been pruned, so the client must reload instead of resuming."""
+    oldest = StockChangeEvent.objects.aggregate(seq=Min('pk'))['seq']
+    return oldest is not None and since < oldest - 1
+
+
+def events_since(since, limit=MAX_EVENTS):
+    """
+    Events with a sequence above `since`, oldest first. One primary key range
+    scan.
+
+    The sequence is the primary key, which is only commit-ordered on SQLite,
+    where writers are serialised. On a database with concurrent writers
+    (PostgreSQL) a transaction can commit a lower id after a client has
+    already read past it, and that client would never see the event.
+    """
+    rows = StockChangeEvent.objects.filter(pk__gt=since).order_by('pk').values_list(
+        'pk', 'kind', 'payload', 'created_at'
+    )[:limit]
+    return [
+        {'seq': seq, 'kind': kind, 'at': created_at.isoformat(), 'data': payload}
+        for seq, kind, payload, created_at in rows
+    ]
+
+
+def wait_for_events(since, timeout, limit=MAX_EVENTS):
+    """
+    Long-poll: return events after `since` as soon as there are any, or an
+    empty list after `timeout` seconds. Commits in this process wake the
+    wait immediately; others are seen within POLL_INTERVAL.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        events = events_since(since, limit)
+        remaining = deadline - time.monotonic()
+        if events or remaining <= 0:
+            return events
+        with _committed:
+            _committed.wait(min(POLL_INTERVAL, remaining))
+
+
+def prune_events(older_than_days):
+    """
+    Delete events older than the given number of days, always keeping the
+    latest one so is_expired() can still tell how far the feed has moved.
+    Returns how many were deleted.
+    """
+    cutoff = timezone.now() - timedelta(days=older_than_days)
+    deleted, _ = StockChangeEvent.objects.filter(created_at__lt=cutoff, pk__lt=latest_sequence()).delete()
+    return deleted
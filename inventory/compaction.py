@@ -0,0 +1,383 @@
+import hashlib
+import json
+import os
+from dataclasses import dataclass, field
+from datetime import datetime, time
+from decimal import Decimal
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+from .models import StockOpeningBalance, StockTransaction
+from .reconcile import _ledger_totals
+from .signals import muted_stock_signals
+
+ARCHIVE_FORMAT = 1
+CHUNK_SIZE = 2000
+READ_SIZE = 1024 * 1024
+
+
+class CompactionError(Exception):
+    pass
+
+
+@dataclass
+class ArchiveSummary:
+    """What an archive holds: its row count, SHA-256 and per item/month totals."""
+
+    rows: int = 0
+    sha256: str = ''
+    # (item_id, period) → [total_in, total_out, txn_count]
+    periods: dict = field(default_factory=dict)
+
+    def add(self, item_id, period, txn_type, quantity):
+        totals = self.periods.setdefault((item_id, period), [Decimal('0'), Decimal('0'), 0])
+        totals[0 if txn_type == 'IN' else 1] += quantity
+        totals[2] += 1
+        self.rows += 1
+
+    def item_ids(self):
+        return sorted({item_id for item_id, _ in self.periods})
+
+
+@dataclass
+class CompactionResult:
+    archive: Path
+    summary: ArchiveSummary
+    # item_id → (total_in, total_out) from ledger plus openings; equal before and after
+    totals: dict
+
+
+def archive_dir() -> Path:
+    configured = getattr(settings, 'INVENTORY', {}).get('LEDGER_ARCHIVE_DIR')
+    return Path(configured) if configured else Path(settings.BASE_DIR) / 'var' / 'stock_ledger'
+
+
+def _require_zstandard():
+    if zstandard is None:
+        raise CompactionError('Ledger archives need the zstandard package: pip install zstandard')
+
+
+def _month_start(moment):
+    return timezone.localtime(moment).date().replace(day=1)
+
+
+def _period_bound(month):
+    return timezone.make_aware(datetime.combine(month.replace(day=1), time.min))
+
+
+def _manifest_path(archive: Path) -> Path:
+    return archive.with_name(archive.name.replace('.jsonl.zst', '.manifest.json'))
+
+
+def pending_periods(before):
+    """Per-month row counts and totals that compacting up to `before` would fold."""
+    return (
+        StockTransaction.objects.filter(created_at__lt=_period_bound(before))
+        .annotate(period=TruncMonth('created_at'))
+        .values('period')
+        .annotate(
+            rows=Count('id'),
+            items=Count('item', distinct=True),
+            total_in=Sum('quantity', filter=Q(txn_type='IN')),
+            total_out=Sum('quantity', filter=Q(txn_type='OUT')),
+        )
+        .order_by('period')
+    )
+
+
+def _encode(pk, item_id, sku, txn_type, quantity, balance_after, note, created_at):
+    record = {
+        'id': pk,
+        'item_id': item_id,
+        'sku': sku,
+        'txn_type': txn_type,
+        'quantity': str(quantity),
+        'balance_after': None if balance_after is None else str(balance_after),
+        'note': note,
+        'created_at': created_at.isoformat(),
+    }
+    return (json.dumps(record, sort_keys=True, separators=(',', ':')) + '\n').encode('utf-8')
+
+
+def _write_archive(rows, path):
+    """Stream `rows` into a zstandard-compressed JSONL file; returns (summary, pks)."""
+    summary = ArchiveSummary()
+    digest = hashlib.sha256()
+    pks = []
+    rows = rows.order_by('pk').values_list(
+        'pk', 'item_id', 'item__sku', 'txn_type', 'quantity', 'balance_after', 'note', 'created_at'
+    )
+    with open(path, 'wb') as handle:
+        with zstandard.ZstdCompressor(level=10).stream_writer(handle, closefd=False) as writer:
+            for row in rows.iterator(chunk_size=CHUNK_SIZE):
+                line = _encode(*row)
+                writer.write(line)
+                digest.update(line)
+                pk, item_id, _, txn_type, quantity, _, _, created_at = row
+                summary.add(item_id, _month_start(created_at), txn_type, quantity)
+                pks.append(pk)
+        handle.flush()
+        os.fsync(handle.fileno())
+    summary.sha256 = digest.hexdigest()
+    return summary, pks
+
+
+def _iter_archive_lines(path):
+    buffer = b''
+    with open(path, 'rb') as handle:
+        reader = zstandard.ZstdDecompressor().stream_reader(handle)
+        while True:
+            chunk = reader.read(READ_SIZE)
+            if not chunk:
+                break
+            buffer += chunk
+            *lines, buffer = buffer.split(b'\n')
+            for line in lines:
+                yield line + b'\n'
+    if buffer:
+        yield buffer
+
+
+def _write_manifest(archive, before, summary):
+    manifest = {
+        'format': ARCHIVE_FORMAT,
+        'archive': archive.name,
+        'before': before.isoformat(),
+        'created_at': timezone.now().isoformat(),
+        'rows': summary.rows,
+        'sha256': summary.sha256,
+        'periods': [
+            {
+                'item_id': item_id,
+                'period': period.isoformat(),
+                'total_in': str(total_in),
+                'total_out': str(total_out),
+                'txn_count': txn_count,
+            }
+            for (item_id, period), (total_in, total_out, txn_count) in sorted(summary.periods.items())
+        ],
+    }
+    _manifest_path(archive).write_text(json.dumps(manifest, indent=2))
+
+
+def read_manifest(archive: Path) -> ArchiveSummary:
+    path = _manifest_path(archive)
+    if not path.exists():
+        raise CompactionError(f'Manifest {path} not found next to the archive.')
+    manifest = json.loads(path.read_text())
+    summary = ArchiveSummary(rows=manifest['rows'], sha256=manifest['sha256'])
+    for entry in manifest['periods']:
+        summary.periods[(entry['item_id'], parse_date(entry['period']))] = [
+            Decimal(entry['total_in']),
+            Decimal(entry['total_out']),
+            entry['txn_count'],
+        ]
+    return summary
+
+
+def _first_periods(summary):
+    first = {}
+    for item_id, period in summary.periods:
+        first[item_id] = min(period, first.get(item_id, period))
+    return first
+
+
+def _recompute_closings(openings, first):
+    """
+    Re-derive closing balances of `openings` ((item_id, period) → opening)
+    from each item's `first` changed period onward, carrying the closing of
+    the opening before it. Returns the openings whose closing was recomputed.
+    """
+    changed = []
+    closing = {}
+    for (item_id, period), opening in sorted(openings.items()):
+        if period < first[item_id]:
+            closing[item_id] = opening.closing_balance
+            continue
+        closing[item_id] = closing.get(item_id, Decimal('0')) + opening.total_in - opening.total_out
+        opening.closing_balance = closing[item_id]
+        changed.append(opening)
+    return changed
+
+
+def _merge_openings(summary, archive_name):
+    """Fold the archived periods into StockOpeningBalance rows, carrying closing balances forward."""
+    item_ids = summary.item_ids()
+    openings = {
+        (opening.item_id, opening.period): opening
+        for opening in StockOpeningBalance.objects.filter(item_id__in=item_ids)
+    }
+    created = []
+    for (item_id, period), (total_in, total_out, txn_count) in summary.periods.items():
+        opening = openings.get((item_id, period))
+        if opening is None:
+            opening = StockOpeningBalance(item_id=item_id, period=period)
+            openings[(item_id, period)] = opening
+            created.append(opening)
+        opening.total_in += total_in
+        opening.total_out += total_out
+        opening.txn_count += txn_count
+        if archive_name not in opening.archives:
+            opening.archives = [*opening.archives, archive_name]
+    # Backdated rows can land in periods that already have openings, so every
+    # closing from an item's first touched period on is derived again
+    updated = [opening for opening in _recompute_closings(openings, _first_periods(summary)) if opening.pk]
+    StockOpeningBalance.objects.bulk_create(created, batch_size=500)
+    StockOpeningBalance.objects.bulk_update(
+        updated, ['total_in', 'total_out', 'txn_count', 'closing_balance', 'archives'], batch_size=500
+    )
+
+
+def compact_ledger(before, directory=None):
+    """
+    Fold every stock transaction created before the month `before` into one
+    StockOpeningBalance per item per month, archiving the raw rows to a
+    zstandard JSONL file with a manifest. Ledger totals per item (transactions
+    plus openings) are compared before and after, and any difference rolls
+    the whole compaction back. Returns None when there is nothing to compact.
+    """
+    _require_zstandard()
+    if before.replace(day=1) > _month_start(timezone.now()):
+        raise CompactionError('Only closed months can be compacted.')
+    directory = Path(directory or archive_dir())
+    directory.mkdir(parents=True, exist_ok=True)
+    # Microseconds keep two compactions within the same second from sharing (and overwriting) a name
+    archive = directory / f'stock_ledger_before_{before:%Y-%m}_{timezone.now():%Y%m%d%H%M%S%f}.jsonl.zst'
+    partial = archive.with_name(f'{archive.name}.part')
+
+    try:
+        with transaction.atomic():
+            rows = StockTransaction.objects.filter(created_at__lt=_period_bound(before))
+            item_ids = list(rows.values_list('item_id', flat=True).distinct().order_by())
+            if not item_ids:
+                return None
+            totals = _ledger_totals(item_ids)
+
+            summary, pks = _write_archive(rows, partial)
+            _merge_openings(summary, archive.name)
+            # The counters and running balances already include these rows
+            with muted_stock_signals():
+                for start in range(0, len(pks), CHUNK_SIZE):
+                    StockTransaction.objects.filter(pk__in=pks[start:start + CHUNK_SIZE]).delete()
+
+            if _ledger_totals(item_ids) != totals:
+                raise CompactionError('Ledger totals changed during compaction; rolled back.')
+            os.replace(partial, archive)
+            _write_manifest(archive, before, summary)
+    except BaseException:
+        # The transaction rolled back, so the rows are still in the ledger
+        for path in (partial, archive, _manifest_path(archive)):
+            path.unlink(missing_ok=True)
+        raise
+    return CompactionResult(archive=archive, summary=summary, totals=totals)
+
+
+def verify_archive(archive: Path):
+    """
+    Re-read an archive and recompute its checksum and per item/month totals.
+    Returns (manifest summary, recomputed summary); they match when intact.
+    """
+    _require_zstandard()
+    expected = read_manifest(archive)
+    actual = ArchiveSummary()
+    digest = hashlib.sha256()
+    for line in _iter_archive_lines(archive):
+        digest.update(line)
+        record = json.loads(line)
+        created_at = parse_datetime(record['created_at'])
+        actual.add(record['item_id'], _month_start(created_at), record['txn_type'], Decimal(record['quantity']))
+    actual.sha256 = digest.hexdigest()
+    return expected, actual
+
+
+def _restore_chunk(records):
+    StockTransaction.objects.bulk_create(
+        StockTransaction(
+            pk=record['id'],
+            item_id=record['item_id'],
+            txn_type=record['txn_type'],
+            quantity=Decimal(record['quantity']),
+            balance_after=None if record['balance_after'] is None else Decimal(record['balance_after']),
+            note=record['note'],
+            created_at=parse_datetime(record['created_at']),
+        )
+        for record in records
+    )
+
+
+def restore_archive(archive: Path):
+    """
+    Put an archive's rows back into the ledger and take its periods out of
+    the opening balances, re-deriving the closing balances that counted
+    them. Archives must be restored newest first, so the openings left
+    behind still describe a prefix of the ledger.
+    """
+    _require_zstandard()
+    summary = read_manifest(archive)
+    item_ids = summary.item_ids()
+    newest = {item_id: max(p for i, p in summary.periods if i == item_id) for item_id in item_ids}
+    later = (
+        StockOpeningBalance.objects.filter(item_id__in=item_ids)
+        .values('item_id')
+        .annotate(latest=Max('period'))
+    )
+    blocked = [row['item_id'] for row in later if row['latest'] > newest[row['item_id']]]
+    if blocked:
+        raise CompactionError(
+            f'Newer compacted periods exist for {len(blocked)} item(s); restore newer archives first.'
+        )
+
+    with transaction.atomic():
+        totals = _ledger_totals(item_ids)
+        digest = hashlib.sha256()
+        records = []
+        for line in _iter_archive_lines(archive):
+            digest.update(line)
+            records.append(json.loads(line))
+            if len(records) >= CHUNK_SIZE:
+                _restore_chunk(records)
+                records = []
+        if records:
+            _restore_chunk(records)
+        if digest.hexdigest() != summary.sha256:
+            raise CompactionError('Archive checksum does not match its manifest; nothing restored.')
+
+        openings = {
+            (opening.item_id, opening.period): opening
+            for opening in StockOpeningBalance.objects.select_for_update().filter(item_id__in=item_ids)
+        }
+        emptied = []
+        for key, (total_in, total_out, txn_count) in summary.periods.items():
+            opening = openings.get(key)
+            if opening is None:
+                raise CompactionError(f'No opening balance for item {key[0]} in {key[1]:%Y-%m}.')
+            opening.total_in -= total_in
+            opening.total_out -= total_out
+            opening.txn_count -= txn_count
+            if opening.txn_count <= 0:
+                emptied.append(opening)
+                del openings[key]
+            else:
+                # What is left is in the other archives
+                opening.archives = [name for name in opening.archives if name != archive.name]
+        StockOpeningBalance.objects.filter(pk__in=[opening.pk for opening in emptied]).delete()
+        StockOpeningBalance.objects.bulk_update(
+            _recompute_closings(openings, _first_periods(summary)),
+            ['total_in', 'total_out', 'txn_count', 'closing_balance', 'archives'],
+            batch_size=500,
+        )
+
+        if _ledger_totals(item_ids) != totals:
+            raise CompactionError('Ledger totals changed during restore; rolled back.')
+    return summary
@@ -0,0 +1,193 @@
+import csv
+import json
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+
+from items.models import Item
+
+from .balances import assign_running_balances
+from .models import StockTransaction
+from .rollups import add_to_rollup, apply_rollup_deltas
+from .services import apply_stock_deltas
+
+CHUNK_SIZE = 5000
+MAX_REPORTED_ERRORS = 1000
+FORMATS = ('csv', 'jsonl')
+
+_quantity_field = StockTransaction._meta.get_field('quantity')
+QUANTITY_PLACES = _quantity_field.decimal_places
+MAX_QUANTITY = Decimal(10) ** (_quantity_field.max_digits - _quantity_field.decimal_places)
+NOTE_MAX_LENGTH = StockTransaction._meta.get_field('note').max_length
+
+
+class ImportFormatError(Exception):
+    """The file as a whole cannot be read (unknown format, missing columns, not UTF-8)."""
+
+
+@dataclass
+class ImportReport:
+    rows: int = 0
+    imported: int = 0
+    items: int = 0
+    error_count: int = 0
+    errors: list = field(default_factory=list)
+
+    def add_error(self, line, sku, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'sku': sku, 'error': message})
+
+    def as_dict(self):
+        return {
+            'rows': self.rows,
+            'imported': self.imported,
+            'items': self.items,
+            'error_count': self.error_count,
+            'errors': self.errors,
+            'errors_truncated': self.error_count > len(self.errors),
+        }
+
+
+def detect_format(filename, explicit=None):
+    if not explicit and filename and '.' in filename:
+        explicit = filename.rsplit('.', 1)[-1]
+    fmt = (explicit or '').lower()
+    if fmt == 'ndjson':
+        fmt = 'jsonl'
+    if fmt not in FORMATS:
+        raise ImportFormatError(f'Unsupported import format {fmt!r}; use one of: {", ".join(FORMATS)}.')
+    return fmt
+
+
+def _csv_records(text):
+    reader = csv.DictReader(text)
+    columns = {name.strip().lower(): name for name in reader.fieldnames or []}
+    qty_column = columns.get('qty') or columns.get('quantity')
+    if 'sku' not in columns or not qty_column:
+        raise ImportFormatError('CSV header must include sku and qty columns.')
+    note_column = columns.get('note')
+    for row in reader:
+        yield reader.line_num, {
+            'sku': row.get(columns['sku']),
+            'qty': row.get(qty_column),
+            'note': row.get(note_column) if note_column else '',
+        }, None
+
+
+def _jsonl_records(text):
+    for line, raw in enumerate(text, start=1):
+        if not raw.strip():
+            continue
+        try:
+            record = json.loads(raw)
+        except ValueError:
+            yield line, None, 'Invalid JSON.'
+            continue
+        if not isinstance(record, dict):
+            yield line, None, 'Each line must be a JSON object.'
+            continue
+        if 'qty' not in record and 'quantity' in record:
+            record['qty'] = record['quantity']
+        yield line, record, None
+
+
+def _decoded_lines(handle):
+    """Decode a binary file line by line, so an encoding error can name its line."""
+    for line, raw in enumerate(handle, start=1):
+        try:
+            yield raw.decode('utf-8-sig' if line == 1 else 'utf-8')
+        except UnicodeDecodeError:
+            raise ImportFormatError(
+                f'Line {line} is not valid UTF-8; save the file as UTF-8 and upload it again.'
+            ) from None
+
+
+def _records(handle, fmt):
+    """Yield (line, record, parse error) from a binary file object, streaming."""
+    handle.seek(0)
+    text = _decoded_lines(handle)
+    if fmt == 'csv':
+        yield from _csv_records(text)
+    else:
+        yield from _jsonl_records(text)
+
+
+def _clean(record, sku_map):
+    """Return (item_id, quantity, note) for a record, or raise ValueError with the reason."""
+    sku = str(record.get('sku') or '').strip()
+    if not sku:
+        raise ValueError('SKU is required.')
+    item_id = sku_map.get(sku)
+    if item_id is None:
+        raise ValueError(f'Unknown SKU {sku}.')
+    try:
+        quantity = Decimal(str(record.get('qty')).strip())
+    except (InvalidOperation, ValueError):
+        raise ValueError('Invalid quantity value.')
+    if not quantity.is_finite() or quantity <= 0:
+        raise ValueError('Quantity must be greater than zero.')
+    if quantity >= MAX_QUANTITY or quantity.as_tuple().exponent < -QUANTITY_PLACES:
+        raise ValueError(
+            f'Quantity must be below {MAX_QUANTITY} with at most {QUANTITY_PLACES} decimal places.'
+        )
+    note = str(record.get('note') or '')
+    if len(note) > NOTE_MAX_LENGTH:
+        raise ValueError(f'Note is longer than {NOTE_MAX_LENGTH} characters.')
+    return item_id, quantity, note
+
+
+def import_stock_in(handle, fmt, dry_run=False, chunk_size=CHUNK_SIZE):
+    """
+    Import stock IN rows of (sku, qty, note) from a seekable binary file.
+
+    The file is read twice, streaming: once to validate every row against an
+    in-memory SKU map, and, only if no row failed, once more to insert in
+    chunks of `chunk_size` inside one transaction. Memory stays proportional
+    to the number of items, not rows. The item counters are updated by a
+    single UPDATE at the end, and running balances are assigned as rows are
+    built. Returns an ImportReport; nothing is written if it has errors.
+    """
+    sku_map = dict(Item.objects.values_list('sku', 'id'))
+    report = ImportReport()
+    item_ids = set()
+    for line, record, error in _records(handle, fmt):
+        report.rows += 1
+        if error is None:
+            try:
+                item_id, _, _ = _clean(record, sku_map)
+                item_ids.add(item_id)
+                continue
+            except ValueError as exc:
+                error = str(exc)
+        report.add_error(line, (record or {}).get('sku'), error)
+    report.items = len(item_ids)
+    if report.error_count or dry_run or not report.rows:
+        return report
+
+    deltas = {item_id: (Decimal('0'), Decimal('0')) for item_id in item_ids}
+    rollup = {}
+    with transaction.atomic():
+        balances = dict(
+            Item.objects.select_for_update().filter(pk__in=item_ids).values_list('pk', 'current_stock')
+        )
+        chunk = []
+        for _, record, _ in _records(handle, fmt):
+            item_id, quantity, note = _clean(record, sku_map)
+            chunk.append(StockTransaction(item_id=item_id, txn_type='IN', quantity=quantity, note=note))
+            deltas[item_id] = (deltas[item_id][0] + quantity, Decimal('0'))
+            if len(chunk) >= chunk_size:
+                balances = assign_running_balances(chunk, balances)
+                for txn in StockTransaction.objects.bulk_create(chunk):
+                    add_to_rollup(rollup, txn)
+                report.imported += len(chunk)
+                chunk = []
+        if chunk:
+            assign_running_balances(chunk, balances)
+            for txn in StockTransaction.objects.bulk_create(chunk):
+                add_to_rollup(rollup, txn)
+            report.imported += len(chunk)
+        apply_stock_deltas(deltas)
+        apply_rollup_deltas(rollup)
+    return report
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from inventory.balances import rebuild_running_balances
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute the running balance_after of every stock transaction in one streaming '
+        'pass over the ledger. Only rows whose stored balance is wrong are written.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Rows fetched and updated per round trip (default: 2000).',
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        scanned, updated = rebuild_running_balances(chunk_size=options['chunk_size'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Scanned {scanned} transaction(s), corrected {updated} balance(s) in {elapsed:.1f}s.'
+            )
+        )
@@ -0,0 +1,136 @@
+import threading
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Q, Sum
+from rest_framework import serializers
+
+from billing.serializers import InvoiceSerializer
+from customers.models import Customer
+from inventory.models import StockTransaction
+from inventory.services import InsufficientStock, create_stock_transactions
+from inventory_billing.benchmark import Stopwatch, scratch_database
+from items.models import Item
+
+
+class Command(BaseCommand):
+    help = (
+        'Stress concurrent stock OUT against one item: several workers race to sell more '
+        'than is in stock, then the run checks stock never went negative and the counters '
+        'match the ledger, and reports sales/sec. Runs against a scratch database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            nargs='+',
+            default=[1, 2, 4, 8, 16],
+            help='Concurrent worker counts to run (default: 1 2 4 8 16).',
+        )
+        parser.add_argument(
+            '--attempts',
+            type=int,
+            default=100,
+            help='Sales attempted by each worker per run (default: 100).',
+        )
+        parser.add_argument(
+            '--stock',
+            type=Decimal,
+            default=Decimal('250'),
+            help='Stock IN before each run, less than workers x attempts so sales run out (default: 250).',
+        )
+        parser.add_argument(
+            '--quantity',
+            type=Decimal,
+            default=Decimal('1.5'),
+            help='Quantity per sale (default: 1.5).',
+        )
+        parser.add_argument(
+            '--path',
+            choices=['txn', 'invoice'],
+            default='txn',
+            help='Sell through stock OUT transactions or through invoices (default: txn).',
+        )
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            customer = Customer.objects.create(name='Benchmark Traders', phone='9000000000')
+            self.stdout.write(
+                f'{"workers":>8}{"sold":>8}{"short":>8}{"errors":>8}{"left":>10}{"sales/sec":>12}'
+            )
+            for workers in options['workers']:
+                item = Item.objects.create(name=f'MS Round Rod {workers}', sku=f'STRESS-{workers}')
+                StockTransaction.objects.create(item=item, txn_type='IN', quantity=options['stock'])
+                sold, short, errors, elapsed = self._run(item, customer, workers, options)
+                left = self._check(item, options['stock'], sold * options['quantity'])
+                rate = sold / elapsed if elapsed else 0
+                self.stdout.write(f'{workers:>8}{sold:>8}{short:>8}{errors:>8}{left:>10}{rate:>12.1f}')
+        self.stdout.write(self.style.SUCCESS('Stock never went negative and counters match the ledger.'))
+
+    def _sell(self, item, customer, quantity, path):
+        if path == 'invoice':
+            serializer = InvoiceSerializer(
+                data={'customer': customer.pk, 'items': [{'item': item.pk, 'quantity': quantity}]}
+            )
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+        else:
+            create_stock_transactions(
+                [StockTransaction(item=item, txn_type='OUT', quantity=quantity, note='Stress')],
+                check_stock=True,
+            )
+
+    def _run(self, item, customer, workers, options):
+        barrier = threading.Barrier(workers + 1)
+        counts = []
+        lock = threading.Lock()
+
+        def sell():
+            sold = short = errors = 0
+            barrier.wait()
+            try:
+                for _ in range(options['attempts']):
+                    try:
+                        self._sell(item, customer, options['quantity'], options['path'])
+                        sold += 1
+                    except (InsufficientStock, serializers.ValidationError):
+                        short += 1
+                    except Exception:
+                        errors += 1
+            finally:
+                connection.close()
+                with lock:
+                    counts.append((sold, short, errors))
+
+        threads = [threading.Thread(target=sell) for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+        with Stopwatch() as timer:
+            barrier.wait()
+            for thread in threads:
+                thread.join()
+        return (
+            sum(c[0] for c in counts),
+            sum(c[1] for c in counts),
+            sum(c[2] for c in counts),
+            timer.elapsed,
+        )
+
+    def _check(self, item, stock_in, sold_qty):
+        item.refresh_from_db()
+        ledger = StockTransaction.objects.filter(item=item).aggregate(
+            total_in=Sum('quantity', filter=Q(txn_type='IN')),
+            total_out=Sum('quantity', filter=Q(txn_type='OUT')),
+        )
+        if item.current_stock < 0:
+            raise CommandError(f'{item.sku}: stock went negative ({item.current_stock}).')
+        if item.total_out_stock != sold_qty or (ledger['total_out'] or 0) != sold_qty:
+            raise CommandError(
+                f'{item.sku}: sold {sold_qty} but counters say {item.total_out_stock} '
+                f'and the ledger {ledger["total_out"]}.'
+            )
+        if item.current_stock != stock_in - sold_qty:
+            raise CommandError(f'{item.sku}: expected {stock_in - sold_qty} left, counters say {item.current_stock}.')
+        return item.current_stock
@@ -0,0 +1,120 @@
+from datetime import timedelta
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from inventory.compaction import (
+    CompactionError,
+    compact_ledger,
+    pending_periods,
+    restore_archive,
+    verify_archive,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Roll stock transactions from closed months into one opening balance per item per '
+        'month, archiving the raw rows to a zstandard JSONL file. Archives can be verified '
+        'against their checksum manifest and restored into the ledger.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--before',
+            help='First month to keep (YYYY-MM); everything earlier is compacted.',
+        )
+        parser.add_argument(
+            '--keep-months',
+            type=int,
+            default=3,
+            help='Closed months to keep besides the current one when --before is not given (default: 3).',
+        )
+        parser.add_argument('--archive-dir', help='Directory for archives (default: INVENTORY["LEDGER_ARCHIVE_DIR"]).')
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show what would be compacted without changing anything.',
+        )
+        parser.add_argument('--verify', metavar='ARCHIVE', help='Check an archive against its manifest.')
+        parser.add_argument('--restore', metavar='ARCHIVE', help='Put an archive back into the ledger.')
+
+    def handle(self, *args, **options):
+        try:
+            if options['verify']:
+                return self._verify(Path(options['verify']))
+            if options['restore']:
+                return self._restore(Path(options['restore']))
+            return self._compact(self._before(options), options)
+        except CompactionError as exc:
+            raise CommandError(str(exc))
+
+    def _before(self, options):
+        if options['before']:
+            try:
+                year, month = (int(part) for part in options['before'].split('-'))
+                return timezone.localdate().replace(year=year, month=month, day=1)
+            except ValueError:
+                raise CommandError('--before must be a month in YYYY-MM format.')
+        month = timezone.localdate().replace(day=1)
+        for _ in range(options['keep_months']):
+            month = (month - timedelta(days=1)).replace(day=1)
+        return month
+
+    def _compact(self, before, options):
+        periods = list(pending_periods(before))
+        if not periods:
+            self.stdout.write(self.style.SUCCESS(f'Nothing to compact before {before:%Y-%m}.'))
+            return
+        for row in periods:
+            self.stdout.write(
+                f'{row["period"]:%Y-%m}: {row["rows"]} row(s) across {row["items"]} item(s), '
+                f'in {row["total_in"] or 0}, out {row["total_out"] or 0}'
+            )
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('Dry run, nothing compacted.'))
+            return
+
+        result = compact_ledger(before, directory=options['archive_dir'])
+        if result is None:
+            self.stdout.write(self.style.SUCCESS(f'Nothing to compact before {before:%Y-%m}.'))
+            return
+        self.stdout.write(f'Archive: {result.archive}')
+        self.stdout.write(f'SHA-256: {result.summary.sha256}')
+        self.stdout.write(
+            f'Ledger totals unchanged for {len(result.totals)} item(s) '
+            f'(transactions plus opening balances, checked before commit).'
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Compacted {result.summary.rows} transaction(s) into '
+                f'{len(result.summary.periods)} opening balance period(s).'
+            )
+        )
+
+    def _verify(self, archive):
+        expected, actual = verify_archive(archive)
+        self.stdout.write(f'Manifest: {expected.rows} row(s), SHA-256 {expected.sha256}')
+        self.stdout.write(f'Archive:  {actual.rows} row(s), SHA-256 {actual.sha256}')
+        mismatched = sorted(
+            key for key in set(expected.periods) | set(actual.periods)
+            if expected.periods.get(key) != actual.periods.get(key)
+        )
+        for item_id, period in mismatched:
+            self.stdout.write(
+                f'Item {item_id} {period:%Y-%m}: manifest {expected.periods.get((item_id, period))}, '
+                f'archive {actual.periods.get((item_id, period))}'
+            )
+        if expected.sha256 != actual.sha256 or expected.rows != actual.rows or mismatched:
+            raise CommandError('Archive does not match its manifest.')
+        self.stdout.write(self.style.SUCCESS('Archive matches its manifest.'))
+
+    def _restore(self, archive):
+        summary = restore_archive(archive)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Restored {summary.rows} transaction(s) and removed them from '
+                f'{len(summary.periods)} opening balance period(s).'
+            )
+        )
@@ -0,0 +1,56 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.imports import CHUNK_SIZE, ImportFormatError, detect_format, import_stock_in
+
+
+class Command(BaseCommand):
+    help = (
+        'Import stock IN rows of (sku, qty, note) from a CSV or JSONL file. Every row is '
+        'validated first; nothing is imported unless all rows are valid.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or JSONL file to import.')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='File format (default: from the extension).')
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Validate the file and report errors without importing.',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=CHUNK_SIZE,
+            help=f'Rows inserted per statement batch (default: {CHUNK_SIZE}).',
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            fmt = detect_format(options['path'], options['format'])
+            with open(options['path'], 'rb') as handle:
+                report = import_stock_in(
+                    handle, fmt, dry_run=options['dry_run'], chunk_size=options['chunk_size']
+                )
+        except (ImportFormatError, OSError) as exc:
+            raise CommandError(str(exc))
+        elapsed = time.perf_counter() - started
+
+        for error in report.errors:
+            self.stderr.write(f'Line {error["line"]} ({error["sku"] or "-"}): {error["error"]}')
+        if report.error_count:
+            if report.error_count > len(report.errors):
+                self.stderr.write(f'... and {report.error_count - len(report.errors)} more.')
+            raise CommandError(f'{report.error_count} of {report.rows} row(s) are invalid; nothing imported.')
+        if options['dry_run']:
+            self.stdout.write(
+                self.style.SUCCESS(f'{report.rows} row(s) for {report.items} item(s) are valid. Dry run, nothing imported.')
+            )
+            return
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Imported {report.imported} row(s) for {report.items} item(s) in {elapsed:.1f}s.'
+            )
+        )
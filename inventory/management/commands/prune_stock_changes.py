@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.changes import prune_events
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete live change feed events older than --days. Clients asking to resume from a '
+        'pruned sequence get 410 and reload.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=7, help='Keep events this many days old or newer (default 7).')
+
+    def handle(self, *args, **options):
+        if options['days'] < 1:
+            raise CommandError('--days must be at least 1.')
+        deleted = prune_events(options['days'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} change event(s).'))
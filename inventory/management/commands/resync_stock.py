@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.reconcile import RESYNC_CHUNK_SIZE, resync_stock
+from items.models import Item
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute total_in_stock, total_out_stock and current_stock from the transaction '
+        'ledger for every item, or only the given SKUs, a chunk of items at a time with one '
+        'grouped aggregate and one bulk update per chunk.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('skus', nargs='*', help='Only resync these SKUs (default: every item).')
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=RESYNC_CHUNK_SIZE,
+            help=f'Items per aggregate and update (default: {RESYNC_CHUNK_SIZE}).',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show the cached → ledger differences without writing them.',
+        )
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be at least 1.')
+        item_ids = None
+        if options['skus']:
+            found = dict(Item.objects.filter(sku__in=options['skus']).values_list('sku', 'id'))
+            missing = sorted(set(options['skus']) - set(found))
+            if missing:
+                raise CommandError(f'Unknown SKU(s): {", ".join(missing)}')
+            item_ids = list(found.values())
+
+        result = resync_stock(item_ids, chunk_size=options['chunk_size'], dry_run=options['dry_run'])
+
+        for drift in result.drifts:
+            self.stdout.write(
+                f'{drift.sku}: in {drift.cached_in} → {drift.ledger_in}, '
+                f'out {drift.cached_out} → {drift.ledger_out}, '
+                f'current {drift.cached_current} → {drift.ledger_current} ({drift.difference:+})'
+            )
+        self.stdout.write(
+            f'Checked {result.checked} item(s) in {result.chunks} chunk(s) '
+            f'in {result.seconds:.2f}s ({result.checked / result.seconds if result.seconds else 0:.0f} items/s).'
+        )
+        if options['dry_run']:
+            self.stdout.write(
+                self.style.WARNING(f'{len(result.drifts)} item(s) out of sync. Dry run, nothing written.')
+            )
+            return
+        self.stdout.write(self.style.SUCCESS(f'Resynced stock counters for {result.repaired} item(s).'))
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-16 20:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0003_alter_stocktransaction_item_and_more'),
+        ('items', '0003_item_current_stock_item_total_in_stock_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='stocktransaction',
+            index=models.Index(fields=['item', 'txn_type', 'created_at', 'id'], name='stock_txn_item_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stocktransaction',
+            index=models.Index(fields=['item', 'created_at', 'id'], name='stock_txn_item_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stocktransaction',
+            index=models.Index(fields=['created_at', 'id'], name='stock_txn_created_idx'),
+        ),
+    ]
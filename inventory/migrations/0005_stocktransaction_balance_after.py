@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-16 20:43
+
+from decimal import Decimal
+
+from django.db import migrations, models
+
+
+def backfill_balances(apps, schema_editor):
+    """
+    Frozen copy of inventory.balances.rebuild_running_balances as of this
+    migration: one ordered pass per item from zero, writing only wrong rows.
+    """
+    StockTransaction = apps.get_model('inventory', 'StockTransaction')
+    connection = schema_editor.connection
+    quote = connection.ops.quote_name
+    sql = (
+        f'UPDATE {quote(StockTransaction._meta.db_table)} SET {quote("balance_after")} = %s '
+        f'WHERE {quote(StockTransaction._meta.pk.column)} = %s'
+    )
+
+    def write(rows):
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, rows)
+
+    chunk_size = 2000
+    pending = []
+    current_item = None
+    balance = Decimal('0')
+    rows = StockTransaction.objects.using(connection.alias).order_by('item_id', 'created_at', 'pk').values_list(
+        'pk', 'item_id', 'txn_type', 'quantity', 'balance_after'
+    )
+    for pk, item_id, txn_type, quantity, stored in rows.iterator(chunk_size=chunk_size):
+        if item_id != current_item:
+            current_item = item_id
+            balance = Decimal('0')
+        quantity = Decimal(quantity)
+        balance += quantity if txn_type == 'IN' else -quantity
+        if stored != balance:
+            pending.append((balance, pk))
+        if len(pending) >= chunk_size:
+            write(pending)
+            pending = []
+    if pending:
+        write(pending)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0004_stocktransaction_history_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stocktransaction',
+            name='balance_after',
+            field=models.DecimalField(blank=True, decimal_places=3, max_digits=14, null=True),
+        ),
+        migrations.RunPython(backfill_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-16 20:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# The table starts empty, so the balances 0005 backfilled from zero stay valid;
+# compact_stock_ledger keeps them consistent with the openings it writes.
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0005_stocktransaction_balance_after'),
+        ('items', '0004_item_stock_changed_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockOpeningBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.DateField()),
+                ('total_in', models.DecimalField(decimal_places=3, default=0, max_digits=14)),
+                ('total_out', models.DecimalField(decimal_places=3, default=0, max_digits=14)),
+                ('closing_balance', models.DecimalField(decimal_places=3, default=0, max_digits=14)),
+                ('txn_count', models.PositiveIntegerField(default=0)),
+                ('archive', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='opening_balances', to='items.item')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('item', 'period'), name='stock_opening_item_period_uniq')],
+            },
+        ),
+    ]
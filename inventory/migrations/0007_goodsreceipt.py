@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-16 21:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0006_stockopeningbalance'),
+        ('items', '0004_item_stock_changed_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GoodsReceipt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('supplier_name', models.CharField(blank=True, max_length=200)),
+                ('supplier_reference', models.CharField(max_length=100)),
+                ('note', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='GoodsReceiptLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.DecimalField(decimal_places=3, max_digits=10)),
+                ('note', models.CharField(blank=True, max_length=255)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='items.item')),
+                ('receipt', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='inventory.goodsreceipt')),
+                ('stock_transaction', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='receipt_line', to='inventory.stocktransaction')),
+            ],
+        ),
+    ]
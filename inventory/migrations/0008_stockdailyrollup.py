@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-16 21:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0007_goodsreceipt'),
+        ('items', '0005_item_reorder_level'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('in_qty', models.DecimalField(decimal_places=3, default=0, max_digits=14)),
+                ('out_qty', models.DecimalField(decimal_places=3, default=0, max_digits=14)),
+                ('txn_count', models.IntegerField(default=0)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='items.item')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day', 'item', 'in_qty', 'out_qty', 'txn_count'], name='stock_rollup_day_item_idx')],
+                'constraints': [models.UniqueConstraint(fields=('item', 'day'), name='stock_rollup_item_day_uniq')],
+            },
+        ),
+    ]
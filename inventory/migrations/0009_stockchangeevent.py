@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-16 21:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0008_stockdailyrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockChangeEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('stock', 'Stock'), ('invoice', 'Invoice')], max_length=10)),
+                ('payload', models.JSONField()),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:30
+
+from django.db import migrations, models
+
+
+def copy_archive_names(apps, schema_editor):
+    StockOpeningBalance = apps.get_model('inventory', 'StockOpeningBalance')
+    openings = list(StockOpeningBalance.objects.using(schema_editor.connection.alias).exclude(archive=''))
+    for opening in openings:
+        opening.archives = [opening.archive]
+    StockOpeningBalance.objects.using(schema_editor.connection.alias).bulk_update(
+        openings, ['archives'], batch_size=500
+    )
+
+
+def copy_latest_archive_name(apps, schema_editor):
+    StockOpeningBalance = apps.get_model('inventory', 'StockOpeningBalance')
+    openings = list(StockOpeningBalance.objects.using(schema_editor.connection.alias).exclude(archives=[]))
+    for opening in openings:
+        opening.archive = opening.archives[-1]
+    StockOpeningBalance.objects.using(schema_editor.connection.alias).bulk_update(
+        openings, ['archive'], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0009_stockchangeevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stockopeningbalance',
+            name='archives',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.RunPython(copy_archive_names, copy_latest_archive_name),
+        migrations.RemoveField(
+            model_name='stockopeningbalance',
+            name='archive',
+        ),
+    ]
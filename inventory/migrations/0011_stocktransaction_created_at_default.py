@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:33
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0010_stockopeningbalance_archives'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='stocktransaction',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -2,6 +2,7 @@ from decimal import Decimal
 
 from django.db import models
 from django.db.models import Q, Sum
+from django.utils import timezone
 
 from items.models import Item
 
@@ -14,15 +15,125 @@ class StockTransaction(models.Model):
     item = models.ForeignKey(Item, on_delete=models.CASCADE, related_name='txns')
     txn_type = models.CharField(max_length=3, choices=TXN_TYPES)
     quantity = models.DecimalField(max_digits=10, decimal_places=3)
+    # Item stock right after this transaction, in (created_at, id) order
+    balance_after = models.DecimalField(max_digits=14, decimal_places=3, null=True, blank=True)
     note = models.CharField(max_length=255, blank=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Defaults to now; sales uploaded by offline terminals are dated when they were made
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # Serve the history API's cursor order for each filter combination
+            models.Index(fields=['item', 'txn_type', 'created_at', 'id'], name='stock_txn_item_type_idx'),
+            models.Index(fields=['item', 'created_at', 'id'], name='stock_txn_item_created_idx'),
+            models.Index(fields=['created_at', 'id'], name='stock_txn_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.item.sku} {self.txn_type} {self.quantity}"
 
+
+class StockOpeningBalance(models.Model):
+    """
+    The net effect of one item's transactions in one compacted calendar month.
+    The raw rows live in the archives named here, one per compaction that
+    folded rows into this month; see inventory.compaction.
+    """
+    item = models.ForeignKey(Item, on_delete=models.CASCADE, related_name='opening_balances')
+    # First day of the compacted month
+    period = models.DateField()
+    total_in = models.DecimalField(max_digits=14, decimal_places=3, default=0)
+    total_out = models.DecimalField(max_digits=14, decimal_places=3, default=0)
+    closing_balance = models.DecimalField(max_digits=14, decimal_places=3, default=0)
+    txn_count = models.PositiveIntegerField(default=0)
+    archives = models.JSONField(default=list, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['item', 'period'], name='stock_opening_item_period_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.item.sku} {self.period:%Y-%m} closing {self.closing_balance}"
+
+
+class StockDailyRollup(models.Model):
+    """
+    One item's stock movement on one local calendar day, kept up to date as
+    transactions are written (see inventory.rollups) so trend queries never
+    scan the ledger. Compacting the ledger leaves these rows in place.
+    """
+    item = models.ForeignKey(Item, on_delete=models.CASCADE, related_name='daily_rollups')
+    day = models.DateField()
+    in_qty = models.DecimalField(max_digits=14, decimal_places=3, default=0)
+    out_qty = models.DecimalField(max_digits=14, decimal_places=3, default=0)
+    txn_count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['item', 'day'], name='stock_rollup_item_day_uniq'),
+        ]
+        indexes = [
+            # Covers catalog-wide trends over a date range, so they never touch the table
+            models.Index(
+                fields=['day', 'item', 'in_qty', 'out_qty', 'txn_count'],
+                name='stock_rollup_day_item_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.item.sku} {self.day} in {self.in_qty} out {self.out_qty}"
+
+
+class StockChangeEvent(models.Model):
+    """
+    Append-only feed of stock counter and invoice changes for live screens.
+    The id is the change sequence clients resume from; see inventory.changes.
+    """
+    KINDS = (
+        ('stock', 'Stock'),
+        ('invoice', 'Invoice'),
+    )
+    kind = models.CharField(max_length=10, choices=KINDS)
+    payload = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"#{self.pk} {self.kind}"
+
+class GoodsReceipt(models.Model):
+    """A goods receipt note (GRN): one supplier delivery of one or more items."""
+    supplier_name = models.CharField(max_length=200, blank=True)
+    supplier_reference = models.CharField(max_length=100)
+    note = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"GRN {self.supplier_reference}"
+
+
+class GoodsReceiptLine(models.Model):
+    receipt = models.ForeignKey(GoodsReceipt, on_delete=models.CASCADE, related_name='lines')
+    item = models.ForeignKey(Item, on_delete=models.PROTECT)
+    quantity = models.DecimalField(max_digits=10, decimal_places=3)
+    note = models.CharField(max_length=255, blank=True)
+    stock_transaction = models.OneToOneField(
+        StockTransaction,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='receipt_line',
+    )
+
+    def __str__(self):
+        return f"{self.receipt} {self.item.sku} {self.quantity}"
+
+
 def _aggregate_stock(item_id: int) -> tuple[Decimal, Decimal]:
     """
-    Aggregate total IN and OUT quantities directly from the stock transaction ledger.
+    Aggregate total IN and OUT quantities directly from the stock transaction ledger
+    and the opening balances of compacted periods.
     This acts as a single source of truth even if cached totals on Item get out-of-sync.
     """
     # Ensure item_id is an integer
@@ -57,36 +168,65 @@ def _aggregate_stock(item_id: int) -> tuple[Decimal, Decimal]:
         total_out = Decimal('0')
     else:
         total_out = Decimal(str(total_out_value))
-    
+
+    # Add back the totals of compacted periods
+    opening = StockOpeningBalance.objects.filter(item_id=item_id).aggregate(
+        total_in=Sum('total_in'), total_out=Sum('total_out')
+    )
+    total_in += opening['total_in'] or Decimal('0')
+    total_out += opening['total_out'] or Decimal('0')
+
     return total_in, total_out
 
 
-def current_stock_for_item(item):
+def _resolve_item_id(item):
+    # Accept either an Item instance or an item ID (int).
+    if hasattr(item, 'pk'):
+        return item.pk
+    if hasattr(item, 'id'):
+        return item.id
+    try:
+        return int(item)
+    except (ValueError, TypeError):
+        return None
+
+
+def current_stock_for_item(item, lock=False, verify=False):
     """
-    Returns current stock for an item by aggregating from the transaction ledger.
-    This ensures we always get the most accurate stock count, even if cached fields
-    are temporarily out of sync. The ledger is the single source of truth.
-    
+    Returns current stock for an item.
+
+    By default this reads the running counters on Item that the stock
+    transaction signals keep up to date, so it is a single indexed read.
+    Pass lock=True (inside a transaction) to take a row lock on the item so
+    the balance cannot change until the caller commits.
+
+    Pass verify=True to re-aggregate the transaction ledger instead and sync
+    the cached fields from it. This is expensive; routine drift detection is
+    handled by the resync_stock management command.
+
     Accepts either an Item instance or an item ID (int).
     """
-    # Handle both Item instance and item ID
-    if hasattr(item, 'pk'):
-        item_id = item.pk
-    elif hasattr(item, 'id'):
-        item_id = item.id
-    else:
-        try:
-            item_id = int(item)
-        except (ValueError, TypeError):
-            return Decimal('0')
-    
+    item_id = _resolve_item_id(item)
     if not item_id:
         return Decimal('0')
 
-    # Always aggregate from the ledger to ensure accuracy
+    if verify:
+        return _verify_stock(item_id)
+
+    queryset = Item.objects.filter(pk=item_id)
+    if lock:
+        queryset = queryset.select_for_update()
+    current = queryset.values_list('current_stock', flat=True).first()
+    if current is None:
+        return Decimal('0')
+    return Decimal(current)
+
+
+def _verify_stock(item_id):
+    """Aggregate the ledger for one item and sync the cached counters from it."""
     total_in, total_out = _aggregate_stock(item_id)
     current = total_in - total_out
-    
+
     # Sync cached fields so subsequent reads are fast and consistent
     # Only update if the item exists
     try:
@@ -94,9 +234,10 @@ def current_stock_for_item(item):
             total_in_stock=total_in,
             total_out_stock=total_out,
             current_stock=current,
+            stock_changed_at=timezone.now(),
         )
     except Exception:
         # If update fails, still return the calculated value
         pass
-    
+
     return current
@@ -0,0 +1,17 @@
+from rest_framework.pagination import CursorPagination
+
+
+class StockTransactionCursorPagination(CursorPagination):
+    """Keyset pagination over (created_at, id), newest first. ?limit= sets the page size."""
+
+    ordering = ('-created_at', '-id')
+    page_size = 100
+    page_size_query_param = 'limit'
+    max_page_size = 500
+
+
+class GoodsReceiptCursorPagination(CursorPagination):
+    ordering = ('-created_at', '-id')
+    page_size = 50
+    page_size_query_param = 'limit'
+    max_page_size = 200
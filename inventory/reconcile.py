@@ -0,0 +1,181 @@
+import time
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+from items.models import Item
+
+from .models import StockOpeningBalance, StockTransaction
+from .services import stock_counters_changed
+
+RESYNC_CHUNK_SIZE = 1000
+
+
+@dataclass
+class StockDrift:
+    item_id: int
+    sku: str
+    cached_in: Decimal
+    cached_out: Decimal
+    cached_current: Decimal
+    ledger_in: Decimal
+    ledger_out: Decimal
+
+    @property
+    def ledger_current(self) -> Decimal:
+        return self.ledger_in - self.ledger_out
+
+    @property
+    def difference(self) -> Decimal:
+        return self.ledger_current - self.cached_current
+
+
+def _ledger_totals(item_ids=None):
+    """
+    Aggregate IN/OUT totals for every item in a single GROUP BY pass over the
+    ledger, plus one over the opening balances of compacted periods.
+    """
+    queryset = StockTransaction.objects.all()
+    openings = StockOpeningBalance.objects.all()
+    if item_ids is not None:
+        queryset = queryset.filter(item_id__in=item_ids)
+        openings = openings.filter(item_id__in=item_ids)
+    rows = queryset.values('item').annotate(
+        total_in=Sum('quantity', filter=Q(txn_type='IN')),
+        total_out=Sum('quantity', filter=Q(txn_type='OUT')),
+    ).order_by()
+    opening_rows = openings.values('item').annotate(
+        total_in=Sum('total_in'),
+        total_out=Sum('total_out'),
+    ).order_by()
+    totals = {}
+    for row in list(rows) + list(opening_rows):
+        total_in, total_out = totals.get(row['item'], (Decimal('0'), Decimal('0')))
+        totals[row['item']] = (
+            total_in + (row['total_in'] or Decimal('0')),
+            total_out + (row['total_out'] or Decimal('0')),
+        )
+    return totals
+
+
+def find_stock_drift(item_ids=None):
+    """
+    Compare the cached counters on every Item (or only `item_ids`) with the
+    transaction ledger and return a StockDrift for each item whose counters
+    disagree.
+    """
+    totals = _ledger_totals(item_ids)
+    zero = (Decimal('0'), Decimal('0'))
+    drifts = []
+    cached_rows = Item.objects.values_list(
+        'id', 'sku', 'total_in_stock', 'total_out_stock', 'current_stock'
+    ).order_by('id')
+    if item_ids is not None:
+        cached_rows = cached_rows.filter(pk__in=item_ids)
+    for item_id, sku, cached_in, cached_out, cached_current in cached_rows.iterator():
+        ledger_in, ledger_out = totals.get(item_id, zero)
+        if (
+            cached_in == ledger_in
+            and cached_out == ledger_out
+            and cached_current == ledger_in - ledger_out
+        ):
+            continue
+        drifts.append(
+            StockDrift(
+                item_id=item_id,
+                sku=sku,
+                cached_in=cached_in,
+                cached_out=cached_out,
+                cached_current=cached_current,
+                ledger_in=ledger_in,
+                ledger_out=ledger_out,
+            )
+        )
+    return drifts
+
+
+def repair_stock_drift(drifts):
+    """
+    Overwrite the cached counters of the drifted items with the ledger totals.
+
+    The drifted items are locked and re-aggregated before writing, so stock
+    movements committed after find_stock_drift() ran are not lost.
+    """
+    if not drifts:
+        return 0
+    item_ids = [drift.item_id for drift in drifts]
+    zero = (Decimal('0'), Decimal('0'))
+    now = timezone.now()
+    with transaction.atomic():
+        list(Item.objects.select_for_update().filter(pk__in=item_ids).values_list('pk'))
+        totals = _ledger_totals(item_ids)
+        items = []
+        for item_id in item_ids:
+            ledger_in, ledger_out = totals.get(item_id, zero)
+            items.append(
+                Item(
+                    pk=item_id,
+                    total_in_stock=ledger_in,
+                    total_out_stock=ledger_out,
+                    current_stock=ledger_in - ledger_out,
+                    stock_changed_at=now,
+                )
+            )
+        Item.objects.bulk_update(
+            items,
+            ['total_in_stock', 'total_out_stock', 'current_stock', 'stock_changed_at'],
+            batch_size=500,
+        )
+        stock_counters_changed(item_ids)
+    return len(items)
+
+
+@dataclass
+class ResyncResult:
+    checked: int = 0
+    repaired: int = 0
+    chunks: int = 0
+    seconds: float = 0.0
+    drifts: list = field(default_factory=list)
+
+
+def _item_id_chunks(item_ids, chunk_size):
+    if item_ids is not None:
+        item_ids = sorted(set(item_ids))
+        for start in range(0, len(item_ids), chunk_size):
+            yield item_ids[start:start + chunk_size]
+        return
+    # Keyset over the whole catalog, so no id list is ever held in full
+    last = 0
+    while True:
+        chunk = list(
+            Item.objects.filter(pk__gt=last).order_by('pk').values_list('pk', flat=True)[:chunk_size]
+        )
+        if not chunk:
+            return
+        yield chunk
+        last = chunk[-1]
+
+
+def resync_stock(item_ids=None, chunk_size=RESYNC_CHUNK_SIZE, dry_run=False):
+    """
+    Recompute the stock counters of `item_ids` (default: every item) from the
+    ledger, `chunk_size` items at a time. Each chunk is one grouped aggregate
+    and, for the items that drifted, one locked bulk update in its own
+    transaction, so a large catalog never holds a long lock. With dry_run
+    the drifts are only collected. Returns a ResyncResult.
+    """
+    result = ResyncResult()
+    started = time.perf_counter()
+    for chunk in _item_id_chunks(item_ids, chunk_size):
+        drifts = find_stock_drift(chunk)
+        result.checked += len(chunk)
+        result.chunks += 1
+        result.drifts.extend(drifts)
+        if not dry_run:
+            result.repaired += repair_stock_drift(drifts)
+    result.seconds = time.perf_counter() - started
+    return result
@@ -0,0 +1,119 @@
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Count, Max, Q, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from .models import StockDailyRollup, StockOpeningBalance, StockTransaction
+
+
+def add_to_rollup(deltas, txn, sign=1):
+    """Add one transaction (sign=-1 to take it out) to `deltas`: (item_id, local day) → (in, out, count)."""
+    key = (txn.item_id, timezone.localtime(txn.created_at).date())
+    in_qty, out_qty, count = deltas.get(key, (Decimal('0'), Decimal('0'), 0))
+    quantity = sign * Decimal(txn.quantity)
+    if txn.txn_type == 'IN':
+        in_qty += quantity
+    else:
+        out_qty += quantity
+    deltas[key] = (in_qty, out_qty, count + sign)
+    return deltas
+
+
+def rollup_deltas(transactions, sign=1):
+    deltas = {}
+    for txn in transactions:
+        add_to_rollup(deltas, txn, sign)
+    return deltas
+
+
+def apply_rollup_deltas(deltas):
+    """
+    Add `deltas` to the daily rollup rows, creating the missing ones, with one
+    batched INSERT ... ON CONFLICT DO UPDATE (SQLite 3.24+ and PostgreSQL).
+    The increment happens in the database, so concurrent writers for the same
+    item and day cannot lose each other's updates.
+    """
+    ops = connection.ops
+    quote = ops.quote_name
+    rows = [
+        (
+            item_id,
+            ops.adapt_datefield_value(day),
+            ops.adapt_decimalfield_value(in_qty, 14, 3),
+            ops.adapt_decimalfield_value(out_qty, 14, 3),
+            count,
+        )
+        for (item_id, day), (in_qty, out_qty, count) in deltas.items()
+        if in_qty or out_qty or count
+    ]
+    if not rows:
+        return
+    table = quote(StockDailyRollup._meta.db_table)
+    columns = [quote(name) for name in ('item_id', 'day', 'in_qty', 'out_qty', 'txn_count')]
+    updates = ', '.join(f'{column} = {table}.{column} + excluded.{column}' for column in columns[2:])
+    sql = (
+        f'INSERT INTO {table} ({", ".join(columns)}) VALUES (%s, %s, %s, %s, %s) '
+        f'ON CONFLICT ({columns[0]}, {columns[1]}) DO UPDATE SET {updates}'
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+
+
+def record_rollup(transactions, sign=1):
+    apply_rollup_deltas(rollup_deltas(transactions, sign))
+
+
+def default_rebuild_start():
+    """
+    First day still covered by the live ledger: the day after the latest
+    compacted month, or None when nothing has been compacted. Rollups before
+    it are all that is left of compacted history, so a rebuild keeps them.
+    """
+    latest = StockOpeningBalance.objects.aggregate(period=Max('period'))['period']
+    if latest is None:
+        return None
+    return (latest + timedelta(days=32)).replace(day=1)
+
+
+def rebuild_daily_rollups(since=None):
+    """
+    Recompute the daily rollups from `since` (a date; default
+    default_rebuild_start()) on, replacing the existing rows for those days
+    in one transaction. The ledger is grouped by item and local day and
+    written with a single INSERT ... SELECT, so no row passes through Python.
+    Returns (rows deleted, rows written).
+    """
+    if since is None:
+        since = default_rebuild_start()
+    rollups = StockDailyRollup.objects.all()
+    ledger = StockTransaction.objects.all()
+    if since is not None:
+        rollups = rollups.filter(day__gte=since)
+        ledger = ledger.filter(created_at__gte=timezone.make_aware(datetime.combine(since, time.min)))
+    zero = Value(Decimal('0'), output_field=StockDailyRollup._meta.get_field('in_qty'))
+    grouped = (
+        ledger.annotate(day=TruncDate('created_at'))
+        .values('item_id', 'day')
+        .annotate(
+            in_qty=Coalesce(Sum('quantity', filter=Q(txn_type='IN')), zero),
+            out_qty=Coalesce(Sum('quantity', filter=Q(txn_type='OUT')), zero),
+            txn_count=Count('pk'),
+        )
+        .values_list('item_id', 'day', 'in_qty', 'out_qty', 'txn_count')
+        .order_by()
+    )
+    select_sql, params = grouped.query.sql_with_params()
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(name) for name in ('item_id', 'day', 'in_qty', 'out_qty', 'txn_count'))
+    with transaction.atomic():
+        deleted, _ = rollups.delete()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {quote(StockDailyRollup._meta.db_table)} ({columns}) {select_sql}',
+                params,
+            )
+            written = cursor.rowcount
+    return deleted, written
@@ -1,5 +1,10 @@
+from django.db import transaction
 from rest_framework import serializers
-from .models import StockTransaction, current_stock_for_item
+
+from items.models import Item
+
+from .models import GoodsReceipt, GoodsReceiptLine, StockTransaction, current_stock_for_item
+from .services import create_stock_transactions
 
 
 class StockTransactionSerializer(serializers.ModelSerializer):
@@ -31,3 +36,60 @@ class StockTransactionSerializer(serializers.ModelSerializer):
                     {'quantity': f'Not enough stock. Available: {available}'}
                 )
         return attrs
+
+
+class GoodsReceiptLineSerializer(serializers.ModelSerializer):
+    # Plain ids on input so GoodsReceiptSerializer can resolve every line's item in one query
+    item = serializers.IntegerField(source='item_id')
+    item_name = serializers.CharField(source='item.name', read_only=True)
+    item_sku = serializers.CharField(source='item.sku', read_only=True)
+
+    class Meta:
+        model = GoodsReceiptLine
+        fields = ['id', 'item', 'item_name', 'item_sku', 'quantity', 'note', 'stock_transaction']
+        read_only_fields = ['id', 'item_name', 'item_sku', 'stock_transaction']
+
+    def validate_quantity(self, value):
+        if value <= 0:
+            raise serializers.ValidationError('Quantity must be positive.')
+        return value
+
+
+class GoodsReceiptSerializer(serializers.ModelSerializer):
+    lines = GoodsReceiptLineSerializer(many=True)
+
+    class Meta:
+        model = GoodsReceipt
+        fields = ['id', 'supplier_name', 'supplier_reference', 'note', 'created_at', 'lines']
+        read_only_fields = ['id', 'created_at']
+
+    def validate_lines(self, lines):
+        if not lines:
+            raise serializers.ValidationError('At least one line is required.')
+        item_ids = {line['item_id'] for line in lines}
+        known = set(Item.objects.filter(pk__in=item_ids).values_list('pk', flat=True))
+        missing = sorted(item_ids - known)
+        if missing:
+            raise serializers.ValidationError(f'Invalid item(s): {", ".join(map(str, missing))}')
+        return lines
+
+    @transaction.atomic
+    def create(self, validated_data):
+        lines_data = validated_data.pop('lines')
+        receipt = GoodsReceipt.objects.create(**validated_data)
+        label = f'GRN {receipt.supplier_reference}'
+        txns = create_stock_transactions(
+            StockTransaction(
+                item_id=line['item_id'],
+                txn_type='IN',
+                quantity=line['quantity'],
+                note=(f'{label}: {line["note"]}' if line.get('note') else label)[:255],
+            )
+            for line in lines_data
+        )
+        GoodsReceiptLine.objects.bulk_create(
+            GoodsReceiptLine(receipt=receipt, stock_transaction=txn, **line)
+            for line, txn in zip(lines_data, txns)
+        )
+        return receipt
+
@@ -0,0 +1,250 @@
+import threading
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, Value, When
+from django.utils import timezone
+
+from items.models import Item
+from notifications.services import queue_low_stock_alert
+
+from .balances import assign_running_balances, rebalance_from
+from .changes import publish_stock_changes
+from .models import StockTransaction
+from .rollups import add_to_rollup, apply_rollup_deltas, record_rollup
+
+STOCK_FIELD = DecimalField(max_digits=14, decimal_places=3)
+
+_batches = threading.local()
+
+
+def _per_item_case(values: dict):
+    """Build a CASE expression mapping item pk → quantity (0 for any other item)."""
+    return Case(
+        *[When(pk=item_id, then=Value(qty)) for item_id, qty in values.items()],
+        default=Value(Decimal('0')),
+        output_field=STOCK_FIELD,
+    )
+
+
+def apply_stock_deltas(deltas: dict):
+    """
+    Apply IN/OUT quantity deltas to the Item stock counters.
+
+    `deltas` maps item_id → (in_qty, out_qty). All items are updated by one
+    CASE-based UPDATE, and low-stock state is evaluated once per item after.
+    """
+    deltas = {
+        item_id: (Decimal(in_qty), Decimal(out_qty))
+        for item_id, (in_qty, out_qty) in deltas.items()
+        if in_qty or out_qty
+    }
+    if not deltas:
+        return
+    in_case = _per_item_case({item_id: qty[0] for item_id, qty in deltas.items()})
+    out_case = _per_item_case({item_id: qty[1] for item_id, qty in deltas.items()})
+    Item.objects.filter(pk__in=deltas.keys()).update(
+        total_in_stock=F('total_in_stock') + in_case,
+        total_out_stock=F('total_out_stock') + out_case,
+        current_stock=(F('total_in_stock') + in_case) - (F('total_out_stock') + out_case),
+        stock_changed_at=timezone.now(),
+    )
+    stock_counters_changed(deltas.keys())
+
+
+def stock_counters_changed(item_ids):
+    """Follow-up for items whose counters just changed: low-stock alerts and live change events."""
+    item_ids = list(item_ids)
+    refresh_low_stock_flags(item_ids)
+    publish_stock_changes(item_ids)
+
+
+def refresh_low_stock_flags(item_ids):
+    """
+    Send low-stock alerts for items that just fell to their reorder level and
+    clear the notified flag for items that were restocked above it.
+    """
+    newly_low = []
+    restocked = []
+    for item in Item.objects.filter(pk__in=list(item_ids)).only(
+        'id', 'name', 'sku', 'unit', 'current_stock', 'reorder_level', 'low_stock_notified'
+    ):
+        current_qty = Decimal(item.current_stock or 0)
+        if current_qty <= item.reorder_level and not item.low_stock_notified:
+            queue_low_stock_alert(item, current_qty, item.reorder_level)
+            newly_low.append(item.pk)
+        elif current_qty > item.reorder_level and item.low_stock_notified:
+            restocked.append(item.pk)
+    if newly_low:
+        Item.objects.filter(pk__in=newly_low).update(low_stock_notified=True)
+    if restocked:
+        Item.objects.filter(pk__in=restocked).update(low_stock_notified=False)
+
+
+class InsufficientStock(Exception):
+    """An OUT movement asked for more than the item has in stock."""
+
+    def __init__(self, item_id, requested, available):
+        self.item_id = item_id
+        self.requested = requested
+        self.available = Decimal(available or 0)
+        super().__init__(f'Item {item_id}: requested {requested}, only {self.available} in stock.')
+
+
+def take_stock(quantities: dict):
+    """
+    Atomically take OUT quantities (item_id → qty) from the item counters.
+
+    Each item is one conditional UPDATE that only matches while
+    current_stock still covers the quantity, so the check and the decrement
+    cannot be separated by a concurrent sale and contention is per item row.
+    Items are taken in pk order; the first one short raises InsufficientStock
+    and the savepoint undoes the ones already taken. Low-stock state is left
+    to the caller.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        for item_id in sorted(quantities):
+            quantity = Decimal(quantities[item_id])
+            taken = Item.objects.filter(pk=item_id, current_stock__gte=quantity).update(
+                total_out_stock=F('total_out_stock') + quantity,
+                current_stock=F('current_stock') - quantity,
+                stock_changed_at=now,
+            )
+            if not taken:
+                available = Item.objects.filter(pk=item_id).values_list('current_stock', flat=True).first()
+                raise InsufficientStock(item_id, quantity, available)
+
+
+def create_stock_transactions(transactions, check_stock=False):
+    """
+    Insert unsaved StockTransaction instances with one bulk INSERT and apply
+    their combined effect to the item counters with one UPDATE.
+
+    bulk_create does not send post_save, so the per-row signal chain in
+    inventory.signals is skipped. Without check_stock callers are expected
+    to have validated availability already; with it, each item's OUT total
+    is taken first by take_stock() and InsufficientStock is raised before
+    anything is written (IN rows in the same call do not fund the OUT rows).
+    Running balances are assigned in list order from the item counters.
+    Inside stock_batch() the rows join the batch and the remaining counter
+    changes are applied when it exits.
+    """
+    transactions = list(transactions)
+    if not transactions:
+        return []
+    deltas = {}
+    for txn in transactions:
+        in_qty, out_qty = deltas.get(txn.item_id, (Decimal('0'), Decimal('0')))
+        if txn.txn_type == 'IN':
+            in_qty += Decimal(txn.quantity)
+        else:
+            out_qty += Decimal(txn.quantity)
+        deltas[txn.item_id] = (in_qty, out_qty)
+    taken = {}
+    if check_stock:
+        taken = {item_id: out_qty for item_id, (_, out_qty) in deltas.items() if out_qty}
+    batch = current_stock_batch()
+    if batch is not None:
+        with transaction.atomic():
+            take_stock(taken)
+            created = StockTransaction.objects.bulk_create(transactions)
+            stock_counters_changed(taken.keys())
+        for txn in created:
+            batch.created(txn, counted=check_stock and txn.txn_type == 'OUT')
+        return created
+    with transaction.atomic():
+        take_stock(taken)
+        opening = dict(
+            Item.objects.select_for_update()
+            .filter(pk__in=deltas.keys())
+            .values_list('pk', 'current_stock')
+        )
+        # Balances run from before this call, so add back what take_stock removed
+        for item_id, quantity in taken.items():
+            opening[item_id] += quantity
+        assign_running_balances(transactions, opening)
+        created = StockTransaction.objects.bulk_create(transactions)
+        record_rollup(created)
+        if taken:
+            apply_stock_deltas({item_id: (in_qty, Decimal('0')) for item_id, (in_qty, _) in deltas.items()})
+            # Items that also had IN rows were followed up by apply_stock_deltas
+            stock_counters_changed(item_id for item_id in taken if not deltas[item_id][0])
+        else:
+            apply_stock_deltas(deltas)
+    return created
+
+
+class StockBatch:
+    """
+    Stock movements collected by stock_batch(): net IN/OUT per item, the
+    earliest ledger position per item whose running balances need redoing,
+    and net movement per item per day for the daily rollups.
+    """
+
+    def __init__(self):
+        self.deltas = {}
+        self.starts = {}
+        self.rollup = {}
+
+    def _touch(self, item_id, txn_type, quantity, position):
+        in_qty, out_qty = self.deltas.get(item_id, (Decimal('0'), Decimal('0')))
+        if txn_type == 'IN':
+            in_qty += quantity
+        else:
+            out_qty += quantity
+        self.deltas[item_id] = (in_qty, out_qty)
+        if item_id not in self.starts or position < self.starts[item_id]:
+            self.starts[item_id] = position
+
+    def created(self, txn, counted=False):
+        """`counted` rows are already on the counters (take_stock); only their balances are redone."""
+        quantity = Decimal('0') if counted else Decimal(txn.quantity)
+        self._touch(txn.item_id, txn.txn_type, quantity, (txn.created_at, txn.pk))
+        add_to_rollup(self.rollup, txn)
+
+    def deleted(self, txn):
+        self._touch(txn.item_id, txn.txn_type, -Decimal(txn.quantity), (txn.created_at, txn.pk))
+        add_to_rollup(self.rollup, txn, sign=-1)
+
+    def flush(self):
+        """Apply the collected deltas with one UPDATE, redo affected running balances and rollups."""
+        apply_stock_deltas(self.deltas)
+        rebalance_from(self.starts)
+        apply_rollup_deltas(self.rollup)
+        self.deltas = {}
+        self.starts = {}
+        self.rollup = {}
+
+
+def current_stock_batch():
+    return getattr(_batches, 'current', None)
+
+
+@contextmanager
+def stock_batch():
+    """
+    Unit of work for stock movements. Inside the block, StockTransaction
+    saves and deletes only record their deltas; on exit the item counters are
+    updated once per item, low-stock state is evaluated once per item and the
+    running balances of touched items are recomputed once.
+
+    The flush runs inside the block's transaction rather than on commit, so
+    the counters can never be committed out of step with the ledger. Counters
+    read inside the block do not include its pending movements yet. Nested
+    blocks join the outermost one.
+    """
+    batch = current_stock_batch()
+    if batch is not None:
+        yield batch
+        return
+    batch = StockBatch()
+    with transaction.atomic():
+        _batches.current = batch
+        try:
+            yield batch
+        finally:
+            _batches.current = None
+        batch.flush()
+
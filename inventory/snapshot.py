@@ -0,0 +1,61 @@
+from decimal import Decimal
+
+from django.db.models import F, Max, Q
+
+from items.models import Item
+
+
+def stock_version():
+    """
+    Version stamp of the stock counters: the latest Item.stock_changed_at as
+    an ISO timestamp, or None before any stock has moved. One index seek.
+    """
+    changed_at = Item.objects.aggregate(changed_at=Max('stock_changed_at'))['changed_at']
+    return changed_at.isoformat() if changed_at else None
+
+
+def stock_rows(threshold=None, search=None, low_only=False):
+    """
+    Per-item IN/OUT/current totals read from the counters on Item, which the
+    stock transaction signals and inventory.services keep up to date. This is
+    a single O(items) query; nothing touches the transaction ledger.
+
+    An item is low when its stock is at or below its own reorder_level, or
+    below `threshold` when one is given. The per-item low_only filter matches
+    the item_low_stock_idx partial index, so it reads only the low rows.
+    """
+    threshold = Decimal(str(threshold)) if threshold is not None else None
+    items = Item.objects.all()
+    if search:
+        items = items.filter(Q(name__icontains=search) | Q(sku__icontains=search))
+    if low_only:
+        if threshold is None:
+            items = items.filter(current_stock__lte=F('reorder_level'))
+        else:
+            items = items.filter(current_stock__lte=threshold)
+    rows = items.values_list(
+        'id', 'name', 'sku', 'unit', 'total_in_stock', 'total_out_stock', 'current_stock', 'reorder_level'
+    ).order_by('name')
+    return [
+        {
+            'item_id': item_id,
+            'name': name,
+            'sku': sku,
+            'unit': unit,
+            'total_in': float(total_in or 0),
+            'total_out': float(total_out or 0),
+            'current_stock': float(current or 0),
+            'reorder_level': float(reorder_level),
+            'is_low_stock': (current or Decimal('0')) <= (reorder_level if threshold is None else threshold),
+        }
+        for item_id, name, sku, unit, total_in, total_out, current, reorder_level in rows
+    ]
+
+
+def stock_snapshot(threshold=None, search=None, low_only=False):
+    """
+    Return (version, rows). The version is read before the rows, so it never
+    claims the data is fresher than it is.
+    """
+    version = stock_version()
+    return version, stock_rows(threshold, search=search, low_only=low_only)
@@ -0,0 +1,375 @@
+import io
+import tempfile
+import unittest
+from datetime import date, datetime
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db.models import F, Q, Sum
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from billing.models import Invoice, InvoiceItem
+from billing.serializers import price_invoice
+from customers.models import Customer
+from items.models import Item
+
+from . import compaction
+from .balances import rebuild_running_balances
+from .models import GoodsReceipt, StockDailyRollup, StockOpeningBalance, StockTransaction
+from .services import InsufficientStock, apply_stock_deltas, stock_batch, take_stock
+
+
+class StockQueryValidationTests(APITestCase):
+    """Malformed report parameters are rejected with 400 instead of failing with a 500."""
+
+    @classmethod
+    def setUpTestData(cls):
+        # The cashier role is created by auth_user.signals
+        cls.user = get_user_model().objects.create_user('cashier', password='secret')
+        cls.item = Item.objects.create(name='Rod', sku='ROD-1')
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.user)
+
+    def test_as_of_rejects_impossible_date(self):
+        response = self.client.get(reverse('stock-as-of'), {'date': '2024-02-30'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_as_of_rejects_non_numeric_item(self):
+        response = self.client.get(reverse('stock-as-of'), {'date': '2024-02-28', 'item': 'abc'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_as_of_answers_valid_item(self):
+        response = self.client.get(
+            reverse('stock-as-of'), {'date': '2024-02-28', 'item': str(self.item.pk)}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'][0]['stock'], 0)
+
+    def test_trends_reject_invalid_and_reversed_ranges(self):
+        for name in ('stock-trends', 'stock-movers'):
+            for params in (
+                {'start': '2024-02-30'},
+                {'end': 'garbage'},
+                {'start': '2024-03-01', 'end': '2024-02-01'},
+            ):
+                with self.subTest(view=name, **params):
+                    response = self.client.get(reverse(name), params)
+                    self.assertEqual(response.status_code, 400)
+
+    def test_txn_list_rejects_bad_item_and_dates(self):
+        for params in (
+            {'item': 'abc'},
+            {'start': 'garbage'},
+            {'end': '2024-02-30'},
+            {'start': '2024-03-01', 'end': '2024-02-01'},
+        ):
+            with self.subTest(**params):
+                response = self.client.get(reverse('stock-txns'), params)
+                self.assertEqual(response.status_code, 400)
+
+    def test_txn_list_filters_by_item_and_day(self):
+        StockTransaction.objects.create(item=self.item, txn_type='IN', quantity=Decimal('4'))
+        today = timezone.localdate().isoformat()
+        response = self.client.get(
+            reverse('stock-txns'), {'item': str(self.item.pk), 'start': today, 'end': today}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_trends_accept_single_day_range(self):
+        for name in ('stock-trends', 'stock-movers'):
+            with self.subTest(view=name):
+                response = self.client.get(reverse(name), {'start': '2024-02-01', 'end': '2024-02-01'})
+                self.assertEqual(response.status_code, 200)
+
+
+@unittest.skipIf(compaction.zstandard is None, 'zstandard is not installed')
+class LedgerRestoreTests(TestCase):
+    def setUp(self):
+        self.item = Item.objects.create(name='Rod', sku='ROD-1')
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def add(self, quantity, day):
+        txn = StockTransaction.objects.create(item=self.item, txn_type='IN', quantity=Decimal(quantity))
+        moment = timezone.make_aware(datetime.combine(day, datetime.min.time().replace(hour=12)))
+        StockTransaction.objects.filter(pk=txn.pk).update(created_at=moment)
+
+    def closings(self):
+        return {
+            opening.period: (opening.closing_balance, opening.archives)
+            for opening in StockOpeningBalance.objects.filter(item=self.item)
+        }
+
+    def test_restore_recomputes_closings_of_surviving_openings(self):
+        self.add('10', date(2024, 1, 10))
+        self.add('5', date(2024, 2, 10))
+        rebuild_running_balances()
+        first = compaction.compact_ledger(date(2024, 3, 1), self.directory.name)
+        # A backdated February receipt, compacted into the same opening later
+        self.add('3', date(2024, 2, 20))
+        rebuild_running_balances()
+        second = compaction.compact_ledger(date(2024, 3, 1), self.directory.name)
+        self.assertEqual(
+            self.closings()[date(2024, 2, 1)], (Decimal('18'), [first.archive.name, second.archive.name])
+        )
+
+        compaction.restore_archive(second.archive)
+
+        self.assertEqual(self.closings(), {
+            date(2024, 1, 1): (Decimal('10'), [first.archive.name]),
+            date(2024, 2, 1): (Decimal('15'), [first.archive.name]),
+        })
+        rebuild_running_balances()
+        restored = StockTransaction.objects.get(item=self.item)
+        self.assertEqual(restored.balance_after, Decimal('18'))
+
+        # The surviving rows are still found through the earlier archive
+        compaction.restore_archive(first.archive)
+        self.assertFalse(StockOpeningBalance.objects.exists())
+        self.assertEqual(StockTransaction.objects.filter(item=self.item).count(), 3)
+
+
+class StockTransactionAdminTests(TestCase):
+    def setUp(self):
+        admin_user = get_user_model().objects.create_superuser('admin', password='secret')
+        self.client.force_login(admin_user)
+        self.rod = Item.objects.create(name='Rod', sku='ROD-1')
+        self.pipe = Item.objects.create(name='Pipe', sku='PIPE-1')
+
+    def edit(self, txn, **changes):
+        data = {'item': txn.item_id, 'txn_type': txn.txn_type, 'quantity': txn.quantity, 'note': txn.note}
+        data.update(changes)
+        response = self.client.post(reverse('admin:inventory_stocktransaction_change', args=[txn.pk]), data)
+        self.assertEqual(response.status_code, 302)
+
+    def assert_stock(self, item, current, rollup_in):
+        item.refresh_from_db()
+        self.assertEqual(item.current_stock, Decimal(current))
+        self.assertEqual(
+            StockDailyRollup.objects.filter(item=item).aggregate(total=Sum('in_qty'))['total'] or 0,
+            Decimal(rollup_in),
+        )
+
+    def test_editing_quantity_updates_counters_balances_and_rollup(self):
+        first = StockTransaction.objects.create(item=self.rod, txn_type='IN', quantity=Decimal('10'))
+        later = StockTransaction.objects.create(item=self.rod, txn_type='IN', quantity=Decimal('2'))
+
+        self.edit(first, quantity='4')
+
+        self.assert_stock(self.rod, '6', '6')
+        later.refresh_from_db()
+        self.assertEqual(later.balance_after, Decimal('6'))
+
+    def test_moving_a_row_to_another_item_moves_its_stock(self):
+        txn = StockTransaction.objects.create(item=self.rod, txn_type='IN', quantity=Decimal('10'))
+
+        self.edit(txn, item=self.pipe.pk)
+
+        self.assert_stock(self.rod, '0', '0')
+        self.assert_stock(self.pipe, '10', '10')
+        txn.refresh_from_db()
+        self.assertEqual(txn.balance_after, Decimal('10'))
+
+
+class StockImportEncodingTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user('admin', password='secret')
+        cls.user.userrole.role = 'admin'
+        cls.user.userrole.save()
+        cls.item = Item.objects.create(name='Rod', sku='ROD-1')
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.user)
+
+    def upload(self, content):
+        return self.client.post(
+            reverse('stock-import'), {'file': SimpleUploadedFile('stock.csv', content)}, format='multipart'
+        )
+
+    def test_utf8_with_bom_imports(self):
+        response = self.upload('﻿sku,qty,note\nROD-1,5,Façade lot\n'.encode('utf-8'))
+        self.assertEqual(response.status_code, 201)
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.current_stock, Decimal('5'))
+
+    def test_non_utf8_file_is_rejected_with_its_line(self):
+        response = self.upload('sku,qty,note\nROD-1,5,ok\nROD-1,5,Façade lot\n'.encode('latin-1'))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Line 3', response.data['detail'])
+        self.assertFalse(StockTransaction.objects.exists())
+
+    def test_command_reports_non_utf8_file(self):
+        with tempfile.NamedTemporaryFile(suffix='.csv') as handle:
+            handle.write('sku,qty,note\nROD-1,5,Façade lot\n'.encode('latin-1'))
+            handle.flush()
+            with self.assertRaisesMessage(CommandError, 'Line 2 is not valid UTF-8'):
+                call_command('import_stock', handle.name, stdout=io.StringIO())
+
+
+@unittest.skipIf(compaction.zstandard is None, 'zstandard is not installed')
+class CompactedAsOfTests(APITestCase):
+    def setUp(self):
+        self.client.force_authenticate(user=get_user_model().objects.create_user('cashier', password='secret'))
+        self.item = Item.objects.create(name='Rod', sku='ROD-1')
+        for quantity, day in (('10', date(2024, 1, 10)), ('5', date(2024, 2, 10))):
+            txn = StockTransaction.objects.create(item=self.item, txn_type='IN', quantity=Decimal(quantity))
+            moment = timezone.make_aware(datetime.combine(day, datetime.min.time().replace(hour=12)))
+            StockTransaction.objects.filter(pk=txn.pk).update(created_at=moment)
+        rebuild_running_balances()
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def as_of(self, day):
+        return self.client.get(reverse('stock-as-of'), {'date': day, 'item': self.item.pk})
+
+    def test_month_ends_answer_the_same_after_compaction(self):
+        before = [self.as_of(day).data['results'][0]['stock'] for day in ('2024-01-31', '2024-02-29')]
+        compaction.compact_ledger(date(2024, 3, 1), self.directory.name)
+        after = [self.as_of(day).data['results'][0]['stock'] for day in ('2024-01-31', '2024-02-29')]
+        self.assertEqual(before, [10, 15])
+        self.assertEqual(after, before)
+
+    def test_days_inside_a_compacted_month_are_refused(self):
+        self.assertEqual(self.as_of('2024-02-15').status_code, 200)
+        compaction.compact_ledger(date(2024, 3, 1), self.directory.name)
+        response = self.as_of('2024-02-15')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('2024-02', response.data['detail'])
+
+
+class StockCounterTests(APITestCase):
+    """Item counters only move together with the ledger, and never below zero."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = get_user_model().objects.create_user('admin', password='secret')
+        cls.admin.userrole.role = 'admin'
+        cls.admin.userrole.save()
+        cls.customer = Customer.objects.create(name='Ravi Traders', phone='9000000001')
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.admin)
+        self.rod = Item.objects.create(name='Rod', sku='ROD-1', price=Decimal('100'))
+        self.pipe = Item.objects.create(name='Pipe', sku='PIPE-1', price=Decimal('50'))
+        for item in (self.rod, self.pipe):
+            StockTransaction.objects.create(item=item, txn_type='IN', quantity=Decimal('5'))
+
+    def counters(self, item):
+        item.refresh_from_db()
+        return item.total_in_stock, item.total_out_stock, item.current_stock
+
+    def assert_counters_match_ledger(self, item):
+        ledger = StockTransaction.objects.filter(item=item).aggregate(
+            total_in=Sum('quantity', filter=Q(txn_type='IN')),
+            total_out=Sum('quantity', filter=Q(txn_type='OUT')),
+        )
+        total_in, total_out = ledger['total_in'] or 0, ledger['total_out'] or 0
+        self.assertEqual(self.counters(item), (total_in, total_out, total_in - total_out))
+
+    def sell(self, *lines):
+        return self.client.post(
+            reverse('invoice-list-create'),
+            {'customer': self.customer.pk, 'items': [{'item': item.pk, 'quantity': qty} for item, qty in lines]},
+            format='json',
+        )
+
+    def test_oversell_is_refused_and_leaves_counters_unchanged(self):
+        before = self.counters(self.rod), self.counters(self.pipe)
+
+        response = self.sell((self.pipe, '2'), (self.rod, '4'), (self.rod, '2'))
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Not enough stock for Rod', str(response.data['items']))
+        self.assertEqual((self.counters(self.rod), self.counters(self.pipe)), before)
+        self.assertFalse(Invoice.objects.exists())
+        self.assertFalse(StockTransaction.objects.filter(txn_type='OUT').exists())
+
+    def test_stock_taken_after_the_check_rolls_the_invoice_back(self):
+        def price_then_lose_race(*args, **kwargs):
+            priced = price_invoice(*args, **kwargs)
+            # Another terminal sells the last rods between the check and the decrement
+            Item.objects.filter(pk=self.rod.pk).update(
+                total_out_stock=F('total_out_stock') + 4, current_stock=F('current_stock') - 4
+            )
+            return priced
+
+        with mock.patch('billing.serializers.price_invoice', side_effect=price_then_lose_race):
+            response = self.sell((self.pipe, '2'), (self.rod, '3'))
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Available: 1', str(response.data['items']))
+        # The simulated sale shared the request's transaction, so it is undone too
+        for item in (self.rod, self.pipe):
+            self.assert_counters_match_ledger(item)
+        self.assertFalse(Invoice.objects.exists())
+        self.assertFalse(InvoiceItem.objects.exists())
+        self.assertFalse(StockTransaction.objects.filter(txn_type='OUT').exists())
+
+    def test_sale_within_stock_updates_counters_from_the_ledger(self):
+        response = self.sell((self.rod, '2'), (self.rod, '3'), (self.pipe, '1'))
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.counters(self.rod), (Decimal('5'), Decimal('5'), Decimal('0')))
+        for item in (self.rod, self.pipe):
+            self.assert_counters_match_ledger(item)
+
+    def test_take_stock_refuses_to_go_negative(self):
+        with self.assertRaises(InsufficientStock) as caught:
+            take_stock({self.rod.pk: Decimal('3'), self.pipe.pk: Decimal('6')})
+
+        self.assertEqual((caught.exception.item_id, caught.exception.available), (self.pipe.pk, Decimal('5')))
+        # The rod taken first is put back by the savepoint
+        self.assertEqual(self.counters(self.rod), (Decimal('5'), Decimal('0'), Decimal('5')))
+        self.assertEqual(self.counters(self.pipe), (Decimal('5'), Decimal('0'), Decimal('5')))
+
+        take_stock({self.rod.pk: Decimal('5')})
+        self.assertEqual(self.counters(self.rod), (Decimal('5'), Decimal('5'), Decimal('0')))
+
+    def test_stock_batch_applies_counters_once_on_exit(self):
+        with mock.patch('inventory.services.apply_stock_deltas', wraps=apply_stock_deltas) as apply:
+            with stock_batch():
+                for quantity in ('1', '2', '3'):
+                    StockTransaction.objects.create(item=self.rod, txn_type='IN', quantity=Decimal(quantity))
+                StockTransaction.objects.create(item=self.pipe, txn_type='OUT', quantity=Decimal('2'))
+                # Pending until the block exits
+                self.assertEqual(self.counters(self.rod), (Decimal('5'), Decimal('0'), Decimal('5')))
+
+        apply.assert_called_once()
+        self.assertEqual(
+            apply.call_args.args[0],
+            {self.rod.pk: (Decimal('6'), Decimal('0')), self.pipe.pk: (Decimal('0'), Decimal('2'))},
+        )
+        for item in (self.rod, self.pipe):
+            self.assert_counters_match_ledger(item)
+        self.assertEqual(StockTransaction.objects.filter(item=self.rod).latest('pk').balance_after, Decimal('11'))
+
+    def test_multi_line_receipt_counters_equal_the_ledger_sum(self):
+        lines = [(self.rod, '10'), (self.pipe, '4'), (self.rod, '2.5')]
+        with mock.patch('inventory.services.apply_stock_deltas', wraps=apply_stock_deltas) as apply:
+            response = self.client.post(
+                reverse('goods-receipts'),
+                {
+                    'supplier_reference': 'INV-77',
+                    'lines': [{'item': item.pk, 'quantity': qty} for item, qty in lines],
+                },
+                format='json',
+            )
+
+        self.assertEqual(response.status_code, 201)
+        # Both items move in one CASE update
+        apply.assert_called_once()
+        self.assertEqual(set(apply.call_args.args[0]), {self.rod.pk, self.pipe.pk})
+        self.assertEqual(self.counters(self.rod), (Decimal('17.5'), Decimal('0'), Decimal('17.5')))
+        for item in (self.rod, self.pipe):
+            self.assert_counters_match_ledger(item)
+        receipt = GoodsReceipt.objects.get()
+        self.assertEqual(receipt.lines.filter(stock_transaction__isnull=False).count(), 3)
@@ -7,4 +7,11 @@ urlpatterns = [
     path('current/', views.CurrentStockView.as_view(), name='current-stock'),
     path('report/', views.StockReportView.as_view(), name='stock-report'),
     path('low-stock/', views.LowStockAlertView.as_view(), name='low-stock'),
+    path('as-of/', views.StockAsOfView.as_view(), name='stock-as-of'),
+    path('trends/', views.StockTrendView.as_view(), name='stock-trends'),
+    path('trends/items/', views.StockMoversView.as_view(), name='stock-movers'),
+    path('changes/', views.StockChangesView.as_view(), name='stock-changes'),
+    path('changes/stream/', views.StockChangeStreamView.as_view(), name='stock-change-stream'),
+    path('import/', views.StockImportView.as_view(), name='stock-import'),
+    path('receipts/', views.GoodsReceiptListCreate.as_view(), name='goods-receipts'),
 ]
@@ -1,41 +1,82 @@
+import json
+import time as clock
+from datetime import datetime, time, timedelta
 from decimal import Decimal
 
-from django.db.models import Q, Sum, Case, When, DecimalField, F, BooleanField
-from django.db.models.functions import Coalesce
+from django.db.models import Sum
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
 from rest_framework import generics
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from auth_user.permissions import IsAdminOrCashier, IsAdminOrReadOnly
+from auth_user.permissions import IsAdminOrCashier, IsAdminOrReadOnly, IsAdminRole
 from items.models import Item
 
-from .models import StockTransaction, current_stock_for_item
-from .serializers import StockTransactionSerializer
+from .balances import balance_as_of, compacted_month
+from .changes import MAX_EVENTS, events_since, is_expired, latest_sequence, wait_for_events
+from .imports import ImportFormatError, detect_format, import_stock_in
+from .models import GoodsReceipt, StockDailyRollup, StockTransaction
+from .pagination import GoodsReceiptCursorPagination, StockTransactionCursorPagination
+from .serializers import GoodsReceiptSerializer, StockTransactionSerializer
+from .services import InsufficientStock, create_stock_transactions
+from .snapshot import stock_snapshot
+
+
+def _start_of_day(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _optional_date(value):
+    """A YYYY-MM-DD query value, or None when absent; anything else raises ValueError."""
+    if not value:
+        return None
+    parsed = parse_date(value)
+    if parsed is None:
+        raise ValueError(f'Invalid date: {value}')
+    return parsed
 
 
 class StockTxnListCreate(APIView):
     permission_classes = [IsAdminOrReadOnly]
 
     def get(self, request):
-        """List stock transactions"""
-        queryset = StockTransaction.objects.select_related('item').order_by('-created_at')
-        item_id = request.query_params.get('item')
-        txn_type = request.query_params.get('txn_type')
-        if item_id:
+        """
+        List stock transactions newest first, one cursor page at a time.
+        Filters: ?item=, ?txn_type=IN|OUT, ?start=&end= (YYYY-MM-DD, inclusive).
+        """
+        params = request.query_params
+        try:
+            item_id = int(params['item']) if params.get('item') else None
+        except ValueError:
+            return Response({'detail': 'Invalid item ID.'}, status=400)
+        try:
+            start = _optional_date(params.get('start'))
+            end = _optional_date(params.get('end'))
+        except ValueError:
+            return Response({'detail': 'Invalid date range.'}, status=400)
+        if start and end and start > end:
+            return Response({'detail': 'start must not be after end.'}, status=400)
+
+        queryset = StockTransaction.objects.select_related('item')
+        txn_type = params.get('txn_type')
+        if item_id is not None:
             queryset = queryset.filter(item_id=item_id)
         if txn_type in ('IN', 'OUT'):
             queryset = queryset.filter(txn_type=txn_type)
-        limit = request.query_params.get('limit')
-        if limit:
-            try:
-                limit = int(limit)
-                if limit > 0:
-                    queryset = queryset[:limit]
-            except (TypeError, ValueError):
-                pass
-        
-        serializer = StockTransactionSerializer(queryset, many=True)
-        return Response(serializer.data)
+
+        # Compare against datetime bounds rather than created_at__date so the
+        # (item, txn_type, created_at) indexes can serve the range
+        if start:
+            queryset = queryset.filter(created_at__gte=_start_of_day(start))
+        if end:
+            queryset = queryset.filter(created_at__lt=_start_of_day(end + timedelta(days=1)))
+
+        paginator = StockTransactionCursorPagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = StockTransactionSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
     def post(self, request):
         item_id = request.data.get('item')
@@ -54,6 +95,11 @@ class StockTxnListCreate(APIView):
                 {'detail': 'Transaction type is required.'},
                 status=400
             )
+        if txn_type not in ('IN', 'OUT'):
+            return Response(
+                {'detail': 'Transaction type must be IN or OUT.'},
+                status=400
+            )
         if not quantity:
             return Response(
                 {'detail': 'Quantity is required.'},
@@ -90,221 +136,417 @@ class StockTxnListCreate(APIView):
                 status=404
             )
 
-        # Check stock before OUT using the centralized function
-        if txn_type == 'OUT':
-            current_stock = current_stock_for_item(item)
-            if qty > current_stock:
-                return Response(
-                    {'detail': f'Cannot OUT {qty}. Only {current_stock} in stock.'},
-                    status=400
-                )
-
-        StockTransaction.objects.create(
-            item=item,
-            txn_type=txn_type,
-            quantity=qty,
-            note=note
-        )
+        # OUT is taken with a conditional decrement, so two cashiers cannot both sell the last unit
+        try:
+            create_stock_transactions(
+                [StockTransaction(item=item, txn_type=txn_type, quantity=qty, note=note)],
+                check_stock=True,
+            )
+        except InsufficientStock as exc:
+            return Response(
+                {'detail': f'Cannot OUT {qty}. Only {exc.available} in stock.'},
+                status=400
+            )
 
         return Response({'status': 'success'})
 
 
-def _parse_threshold(value, default='5'):
+def _parse_threshold(value):
+    """?threshold= overrides every item's reorder_level; absent or invalid means per item."""
     try:
         return int(value)
     except (TypeError, ValueError):
-        return int(default)
+        return None
 
 
 class StockReportView(APIView):
     permission_classes = [IsAdminOrCashier]
 
     def get(self, request):
-        threshold = _parse_threshold(request.GET.get('threshold', 5))
-        search = request.GET.get('search')
-
-        items = Item.objects.all()
+        threshold = _parse_threshold(request.GET.get('threshold'))
+        version, report_list = stock_snapshot(threshold, search=request.GET.get('search'))
+        return Response({
+            'threshold': threshold,
+            'version': version,
+            'count': len(report_list),
+            'results': report_list
+        })
 
-        if search:
-            items = items.filter(
-                Q(name__icontains=search) | Q(sku__icontains=search)
-            )
 
-        report = items.annotate(
-            total_in=Coalesce(
-                Sum(
-                    Case(
-                        When(txns__txn_type='IN', then=F('txns__quantity')),
-                        default=0,
-                        output_field=DecimalField()
-                    )
-                ),
-                0,
-                output_field=DecimalField()
-            ),
-            total_out=Coalesce(
-                Sum(
-                    Case(
-                        When(txns__txn_type='OUT', then=F('txns__quantity')),
-                        default=0,
-                        output_field=DecimalField()
-                    )
-                ),
-                0,
-                output_field=DecimalField()
-            ),
-        ).annotate(
-            calculated_current_stock=F('total_in') - F('total_out'),
-            is_low_stock=Case(
-                When(calculated_current_stock__lte=threshold, then=True),
-                default=False,
-                output_field=BooleanField(),
-            )
-        ).values(
-            'id', 'name', 'sku', 'unit',
-            'total_in', 'total_out', 'calculated_current_stock', 'is_low_stock'
-        ).order_by('name')
-
-        # Convert to list and format for frontend (item_id instead of id)
-        report_list = []
-        for row in report:
-            report_list.append({
-                'item_id': row['id'],
-                'name': row['name'],
-                'sku': row['sku'],
-                'unit': row['unit'],
-                'total_in': float(row['total_in'] or 0),
-                'total_out': float(row['total_out'] or 0),
-                'current_stock': float(row['calculated_current_stock'] or 0),
-                'is_low_stock': row['is_low_stock'],
-            })
+class LowStockAlertView(APIView):
+    permission_classes = [IsAdminOrCashier]
 
+    def get(self, request):
+        threshold = _parse_threshold(request.GET.get('threshold'))
+        version, report_list = stock_snapshot(threshold, low_only=True)
         return Response({
             'threshold': threshold,
+            'version': version,
             'count': len(report_list),
             'results': report_list
         })
 
 
-class LowStockAlertView(APIView):
+class CurrentStockView(APIView):
     permission_classes = [IsAdminOrCashier]
 
     def get(self, request):
-        threshold = _parse_threshold(request.GET.get('threshold', 5))
+        threshold = _parse_threshold(request.GET.get('threshold'))
+        version, report_list = stock_snapshot(threshold)
+        # The body stays a plain list, so the version travels in a header
+        return Response(report_list, headers={'X-Stock-Version': version or ''})
 
-        items = Item.objects.all()
 
-        report = items.annotate(
-            total_in=Coalesce(
-                Sum(
-                    Case(
-                        When(txns__txn_type='IN', then=F('txns__quantity')),
-                        default=0,
-                        output_field=DecimalField()
-                    )
-                ),
-                0,
-                output_field=DecimalField()
-            ),
-            total_out=Coalesce(
-                Sum(
-                    Case(
-                        When(txns__txn_type='OUT', then=F('txns__quantity')),
-                        default=0,
-                        output_field=DecimalField()
-                    )
-                ),
-                0,
-                output_field=DecimalField()
-            ),
-        ).annotate(
-            calculated_current_stock=F('total_in') - F('total_out'),
-            is_low_stock=Case(
-                When(calculated_current_stock__lte=threshold, then=True),
-                default=False,
-                output_field=BooleanField(),
+class StockAsOfView(APIView):
+    """
+    Stock at the end of ?date= (YYYY-MM-DD) for every item, or for one item
+    with ?item=. Each item is answered by one index seek on its ledger. Days
+    inside a compacted month, other than its last, are refused with 400.
+    """
+
+    permission_classes = [IsAdminOrCashier]
+
+    def get(self, request):
+        try:
+            day = parse_date(request.GET.get('date') or '')
+        except ValueError:
+            day = None
+        if day is None:
+            return Response({'detail': 'date is required in YYYY-MM-DD format.'}, status=400)
+        items = Item.objects.all()
+        item_id = request.GET.get('item')
+        item_ids = None
+        if item_id:
+            try:
+                item_ids = [int(item_id)]
+            except ValueError:
+                return Response({'detail': 'Invalid item ID.'}, status=400)
+            items = items.filter(pk__in=item_ids)
+        moment = _start_of_day(day + timedelta(days=1))
+        compacted = compacted_month(moment, item_ids)
+        if compacted is not None:
+            return Response(
+                {'detail': f'{compacted:%Y-%m} has been compacted; only its month end can be answered.'},
+                status=400,
             )
-        ).filter(is_low_stock=True).values(
-            'id', 'name', 'sku', 'unit',
-            'total_in', 'total_out', 'calculated_current_stock', 'is_low_stock'
-        ).order_by('name')
-
-        # Convert to list and format for frontend
-        report_list = []
-        for row in report:
-            report_list.append({
-                'item_id': row['id'],
-                'name': row['name'],
-                'sku': row['sku'],
-                'unit': row['unit'],
-                'total_in': float(row['total_in'] or 0),
-                'total_out': float(row['total_out'] or 0),
-                'current_stock': float(row['calculated_current_stock'] or 0),
-                'is_low_stock': row['is_low_stock'],
-            })
+        rows = items.annotate(
+            balance=balance_as_of(moment)
+        ).values_list('id', 'name', 'sku', 'unit', 'balance').order_by('name')
+        results = [
+            {
+                'item_id': pk,
+                'name': name,
+                'sku': sku,
+                'unit': unit,
+                'stock': float(balance or 0),
+            }
+            for pk, name, sku, unit, balance in rows
+        ]
+        if item_id and not results:
+            return Response({'detail': 'Item not found.'}, status=404)
+        return Response({
+            'date': day.isoformat(),
+            'count': len(results),
+            'results': results
+        })
+
 
+TREND_BUCKETS = {
+    'day': lambda day: day,
+    'week': lambda day: day - timedelta(days=day.weekday()),
+    'month': lambda day: day.replace(day=1),
+}
+TREND_ORDERS = {'out': '-out_qty', 'in': '-in_qty', 'count': '-txn_count'}
+QTY_PLACES = Decimal('0.001')
+
+
+def _trend_range(request):
+    """
+    ?start= and ?end= as dates (YYYY-MM-DD); the default is the last 12
+    months. Raises ValueError for an invalid date or a reversed range.
+    """
+    end = _optional_date(request.GET.get('end')) or timezone.localdate()
+    start = _optional_date(request.GET.get('start')) or end - timedelta(days=364)
+    if start > end:
+        raise ValueError('start must not be after end.')
+    return start, end
+
+
+def _invalid_range_response():
+    return Response(
+        {'detail': 'Invalid date range: use YYYY-MM-DD and keep start on or before end.'},
+        status=400,
+    )
+
+
+def _trend_totals(in_qty, out_qty, txn_count):
+    # SQLite sums decimals as floats, so round back to the stored precision
+    in_qty = Decimal(in_qty or 0).quantize(QTY_PLACES)
+    out_qty = Decimal(out_qty or 0).quantize(QTY_PLACES)
+    return {
+        'in_qty': float(in_qty),
+        'out_qty': float(out_qty),
+        'net': float(in_qty - out_qty),
+        'txn_count': txn_count or 0,
+    }
+
+
+class StockTrendView(APIView):
+    """
+    Stock moved per ?bucket= (day, week or month; default week) between
+    ?start= and ?end=, for one item (?item= or ?sku=) or the whole catalog.
+    Reads only the daily rollups, never the ledger: one grouped query per day
+    (an index-only scan), folded into weeks or months here.
+    """
+
+    permission_classes = [IsAdminOrCashier]
+
+    def get(self, request):
+        bucket = request.GET.get('bucket', 'week')
+        if bucket not in TREND_BUCKETS:
+            return Response({'detail': 'bucket must be one of: day, week, month.'}, status=400)
+        try:
+            start, end = _trend_range(request)
+        except ValueError:
+            return _invalid_range_response()
+        rollups = StockDailyRollup.objects.filter(day__gte=start, day__lte=end)
+        item = None
+        if request.GET.get('item') or request.GET.get('sku'):
+            lookup = {'pk': request.GET['item']} if request.GET.get('item') else {'sku': request.GET['sku']}
+            try:
+                item = Item.objects.get(**lookup)
+            except (Item.DoesNotExist, ValueError):
+                return Response({'detail': 'Item not found.'}, status=404)
+            rollups = rollups.filter(item=item)
+        days = (
+            rollups.values('day')
+            .annotate(in_qty=Sum('in_qty'), out_qty=Sum('out_qty'), txn_count=Sum('txn_count'))
+            .values_list('day', 'in_qty', 'out_qty', 'txn_count')
+            .order_by('day')
+        )
+        periods = {}
+        period_of = TREND_BUCKETS[bucket]
+        for day, in_qty, out_qty, txn_count in days:
+            totals = periods.setdefault(period_of(day), [Decimal('0'), Decimal('0'), 0])
+            totals[0] += in_qty or 0
+            totals[1] += out_qty or 0
+            totals[2] += txn_count or 0
+        results = [
+            {'period': period.isoformat(), **_trend_totals(*totals)}
+            for period, totals in periods.items()
+        ]
         return Response({
-            'threshold': threshold,
-            'count': len(report_list),
-            'results': report_list
+            'item': {'item_id': item.pk, 'name': item.name, 'sku': item.sku, 'unit': item.unit} if item else None,
+            'bucket': bucket,
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'count': len(results),
+            'results': results
         })
 
 
-class CurrentStockView(APIView):
+class StockMoversView(APIView):
+    """
+    Items ranked by stock moved between ?start= and ?end= (?order= out, in or
+    count; default out), top ?limit= (default 20, max 500). Reads only the
+    daily rollups.
+    """
+
+    permission_classes = [IsAdminOrCashier]
+
+    def get(self, request):
+        order = request.GET.get('order', 'out')
+        if order not in TREND_ORDERS:
+            return Response({'detail': 'order must be one of: out, in, count.'}, status=400)
+        try:
+            limit = max(1, min(int(request.GET.get('limit', 20)), 500))
+        except (TypeError, ValueError):
+            limit = 20
+        try:
+            start, end = _trend_range(request)
+        except ValueError:
+            return _invalid_range_response()
+        rows = list(
+            StockDailyRollup.objects.filter(day__gte=start, day__lte=end)
+            .values('item_id')
+            .annotate(in_qty=Sum('in_qty'), out_qty=Sum('out_qty'), txn_count=Sum('txn_count'))
+            .order_by(TREND_ORDERS[order], 'item_id')[:limit]
+        )
+        # Names only for the top rows, not joined into the grouped scan
+        items = Item.objects.in_bulk([row['item_id'] for row in rows])
+        results = [
+            {
+                'item_id': row['item_id'],
+                'name': items[row['item_id']].name,
+                'sku': items[row['item_id']].sku,
+                'unit': items[row['item_id']].unit,
+                **_trend_totals(row['in_qty'], row['out_qty'], row['txn_count']),
+            }
+            for row in rows
+        ]
+        return Response({
+            'order': order,
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'count': len(results),
+            'results': results
+        })
+
+
+def _parse_sequence(value):
+    try:
+        seq = int(value)
+    except (TypeError, ValueError):
+        return None
+    return seq if seq >= 0 else None
+
+
+def _expired_response(since):
+    return Response(
+        {
+            'detail': f'Changes after sequence {since} are no longer kept; reload and resume from last_seq.',
+            'last_seq': latest_sequence(),
+        },
+        status=410,
+    )
+
+
+class StockChangesView(APIView):
+    """
+    Long-poll feed of stock and invoice changes.
+
+    GET ?since=<seq>&timeout=<seconds> returns the events after `since` as
+    soon as there are any (up to MAX_EVENTS, oldest first), or an empty list
+    once `timeout` (default 15, at most 20) runs out. Each wait holds a sync
+    worker, so the cap stays well below gunicorn's 30 s worker timeout;
+    clients simply poll again with `since`. Each event carries
+    only what changed: a 'stock' event is one item's counters, an 'invoice'
+    event one invoice's totals and payment status. Pass back `last_seq` as
+    the next `since`; without `since` only the current `last_seq` is
+    returned, so a client can load a snapshot and follow from there. 410
+    means the requested range has been pruned and the client must reload.
+    """
+    permission_classes = [IsAdminOrCashier]
+    DEFAULT_TIMEOUT = 15
+    MAX_TIMEOUT = 20
+
+    def get(self, request):
+        raw_since = request.query_params.get('since')
+        if raw_since is None:
+            return Response({'last_seq': latest_sequence(), 'events': []})
+        since = _parse_sequence(raw_since)
+        if since is None:
+            return Response({'detail': 'since must be a non-negative integer.'}, status=400)
+        try:
+            timeout = float(request.query_params.get('timeout', self.DEFAULT_TIMEOUT))
+        except ValueError:
+            return Response({'detail': 'timeout must be a number of seconds.'}, status=400)
+        timeout = min(max(timeout, 0), self.MAX_TIMEOUT)
+
+        if is_expired(since):
+            return _expired_response(since)
+        events = wait_for_events(since, timeout)
+        return Response({
+            'last_seq': events[-1]['seq'] if events else since,
+            'more': len(events) == MAX_EVENTS,
+            'events': events,
+        })
+
+
+class StockChangeStreamView(APIView):
+    """
+    The same feed as Server-Sent Events. Every event's `id:` is its sequence,
+    so a reconnecting EventSource resumes by itself through Last-Event-ID;
+    ?since= does the same for the first connection. The stream holds a sync
+    worker while open, so it closes after MAX_LIFETIME seconds, like a
+    long-poll, and the client reconnects from where it was.
+    """
     permission_classes = [IsAdminOrCashier]
+    HEARTBEAT = 10
+    MAX_LIFETIME = 20
 
     def get(self, request):
-        threshold = _parse_threshold(request.GET.get('threshold', 5))
+        raw_since = request.headers.get('Last-Event-ID') or request.query_params.get('since')
+        if raw_since is None:
+            since = latest_sequence()
+        else:
+            since = _parse_sequence(raw_since)
+            if since is None:
+                return Response({'detail': 'since must be a non-negative integer.'}, status=400)
+            if is_expired(since):
+                return _expired_response(since)
+
+        response = StreamingHttpResponse(self._stream(since), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    def _stream(self, since):
+        deadline = clock.monotonic() + self.MAX_LIFETIME
+        yield f'retry: 1000\n: resuming after {since}\n\n'
+        while clock.monotonic() < deadline:
+            events = wait_for_events(since, min(self.HEARTBEAT, max(deadline - clock.monotonic(), 0)))
+            if not events:
+                yield ': keep-alive\n\n'
+                continue
+            for event in events:
+                since = event['seq']
+                yield f"id: {since}\nevent: {event['kind']}\ndata: {json.dumps(event)}\n\n"
+
+
+class StockImportView(APIView):
+    """
+    Bulk stock IN from an uploaded CSV or JSONL file of (sku, qty, note)
+    rows. All rows are validated first; if any fail, nothing is imported and
+    the per-row error report is returned with status 400. Pass dry_run=1 to
+    only validate.
+    """
+
+    permission_classes = [IsAdminRole]
 
-        items = Item.objects.all()
+    def post(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'detail': 'Upload the file as "file".'}, status=400)
+        dry_run = str(request.data.get('dry_run', '')).lower() in ('1', 'true', 'yes')
+        try:
+            fmt = detect_format(upload.name, request.data.get('format'))
+            report = import_stock_in(upload, fmt, dry_run=dry_run)
+        except ImportFormatError as exc:
+            return Response({'detail': str(exc)}, status=400)
+        if report.error_count:
+            return Response(report.as_dict(), status=400)
+        return Response(report.as_dict(), status=200 if dry_run else 201)
+
+
+class GoodsReceiptListCreate(generics.ListCreateAPIView):
+    """
+    Goods receipts, newest first. POST a supplier reference with N lines;
+    all lines are validated together and applied in one transaction, and the
+    response includes the resulting stock of every received item.
+    """
+
+    queryset = GoodsReceipt.objects.prefetch_related('lines__item')
+    serializer_class = GoodsReceiptSerializer
+    pagination_class = GoodsReceiptCursorPagination
+    permission_classes = [IsAdminOrReadOnly]
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        receipt = serializer.save()
+        receipt = self.get_queryset().get(pk=receipt.pk)
+        data = self.get_serializer(receipt).data
+        item_ids = {line.item_id for line in receipt.lines.all()}
+        data['balances'] = [
+            {
+                'item_id': pk,
+                'sku': sku,
+                'current_stock': float(current or 0),
+            }
+            for pk, sku, current in Item.objects.filter(pk__in=item_ids)
+            .values_list('id', 'sku', 'current_stock')
+            .order_by('id')
+        ]
+        return Response(data, status=201)
 
-        report = items.annotate(
-            total_in=Coalesce(
-                Sum(
-                    Case(
-                        When(txns__txn_type='IN', then=F('txns__quantity')),
-                        default=0,
-                        output_field=DecimalField()
-                    )
-                ),
-                0,
-                output_field=DecimalField()
-            ),
-            total_out=Coalesce(
-                Sum(
-                    Case(
-                        When(txns__txn_type='OUT', then=F('txns__quantity')),
-                        default=0,
-                        output_field=DecimalField()
-                    )
-                ),
-                0,
-                output_field=DecimalField()
-            ),
-        ).annotate(
-            calculated_current_stock=F('total_in') - F('total_out'),
-            is_low_stock=Case(
-                When(calculated_current_stock__lte=threshold, then=True),
-                default=False,
-                output_field=BooleanField(),
-            )
-        ).values(
-            'id', 'name', 'sku', 'unit',
-            'total_in', 'total_out', 'calculated_current_stock', 'is_low_stock'
-        ).order_by('name')
-
-        # Convert to list and format for frontend
-        report_list = []
-        for row in report:
-            report_list.append({
-                'item_id': row['id'],
-                'name': row['name'],
-                'sku': row['sku'],
-                'unit': row['unit'],
-                'total_in': float(row['total_in'] or 0),
-                'total_out': float(row['total_out'] or 0),
-                'current_stock': float(row['calculated_current_stock'] or 0),
-                'is_low_stock': row['is_low_stock'],
-            })
-
-        return Response(report_list)
@@ -0,0 +1,44 @@
+import os
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+@contextmanager
+def scratch_database(alias=DEFAULT_DB_ALIAS):
+    """
+    Create a throwaway database with the current schema for benchmarks and
+    destroy it afterwards, so benchmark commands never touch real data.
+
+    SQLite scratch databases are file-backed so that worker threads each get
+    their own connection to the same database.
+    """
+    connection = connections[alias]
+    test_settings = connection.settings_dict.setdefault('TEST', {})
+    tmpdir = None
+    if connection.vendor == 'sqlite' and not test_settings.get('NAME'):
+        tmpdir = tempfile.mkdtemp(prefix='benchmark-')
+        test_settings['NAME'] = os.path.join(tmpdir, 'benchmark.sqlite3')
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield connection
+    finally:
+        connections.close_all()
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        if tmpdir:
+            test_settings.pop('NAME', None)
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+class Stopwatch:
+    def __enter__(self):
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.started
+        return False
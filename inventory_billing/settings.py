@@ -10,7 +10,7 @@ INSTALLED_APPS = [
     'django.contrib.admin', 'django.contrib.auth', 'django.contrib.contenttypes',
     'django.contrib.sessions', 'django.contrib.messages', 'django.contrib.staticfiles',
     'rest_framework',
-    'items', 'customers', 'inventory.apps.InventoryConfig', 'billing', 'auth_user.apps.AuthUserConfig', 'notifications', 'reports',
+    'items', 'customers', 'inventory.apps.InventoryConfig', 'billing', 'auth_user.apps.AuthUserConfig', 'notifications', 'reports', 'sync.apps.SyncConfig',
 ]
 
 MIDDLEWARE = [
@@ -36,7 +36,9 @@ TEMPLATES = [
 ]
 WSGI_APPLICATION = 'inventory_billing.wsgi.application'
 
-DATABASES = {'default': {'ENGINE': 'django.db.backends.sqlite3','NAME': BASE_DIR / 'db.sqlite3'}}
+DATABASES = {'default': {'ENGINE': 'django.db.backends.sqlite3','NAME': BASE_DIR / 'db.sqlite3',
+                         # Take the write lock at BEGIN so concurrent writers queue instead of failing
+                         'OPTIONS': {'transaction_mode': 'IMMEDIATE'}}}
 AUTH_PASSWORD_VALIDATORS = []
 LANGUAGE_CODE = 'en-us'
 TIME_ZONE = 'Asia/Kolkata'
@@ -63,6 +65,24 @@ REST_FRAMEWORK = {
     )
 }
 
+BILLING = {
+    # 'gapless' claims each invoice number inside the invoice transaction (GST-safe).
+    # 'block' reserves INVOICE_NUMBER_BLOCK_SIZE numbers per worker; unused numbers leave gaps.
+    'INVOICE_NUMBER_GAP_POLICY': os.getenv('INVOICE_NUMBER_GAP_POLICY', 'gapless'),
+    'INVOICE_NUMBER_BLOCK_SIZE': int(os.getenv('INVOICE_NUMBER_BLOCK_SIZE', '50')),
+    # Rendered invoice PDFs, keyed by content hash and evicted least-recently-used first
+    'PDF_CACHE_DIR': os.getenv('INVOICE_PDF_CACHE_DIR', str(BASE_DIR / 'var' / 'invoice_pdfs')),
+    'PDF_CACHE_MAX_BYTES': int(os.getenv('INVOICE_PDF_CACHE_MAX_BYTES', str(256 * 1024 * 1024))),
+    # Threads used to render PDFs for invoice ZIPs streamed by the export endpoint
+    # (the export_invoices command renders in processes; see its --workers)
+    'EXPORT_WORKERS': int(os.getenv('INVOICE_EXPORT_WORKERS', '4')),
+}
+
+INVENTORY = {
+    # Compressed archives of stock transactions removed by compact_stock_ledger
+    'LEDGER_ARCHIVE_DIR': os.getenv('STOCK_LEDGER_ARCHIVE_DIR', str(BASE_DIR / 'var' / 'stock_ledger')),
+}
+
 NOTIFICATIONS = {
     'DEFAULT_CHANNELS': ['email'],
     'LOW_STOCK_THRESHOLD': Decimal('5'),
@@ -71,6 +91,16 @@ NOTIFICATIONS = {
         'email': os.getenv('ADMIN_EMAILS', 'ops@example.com').split(','),
     },
     'SENDER_NAME': 'Inventory & Billing System',
+    # Delivery settings for the process_notifications outbox worker
+    'OUTBOX': {
+        'BATCH_SIZE': 50,
+        'CONCURRENCY': 4,
+        'MAX_ATTEMPTS': 5,
+        'BACKOFF_SECONDS': 30,
+        'MAX_BACKOFF_SECONDS': 3600,
+        'LEASE_SECONDS': 300,
+        'POLL_INTERVAL_SECONDS': 2,
+    },
     'CHANNELS': {
         'email': {
             'from_email': os.getenv('NOTIFY_FROM_EMAIL', DEFAULT_FROM_EMAIL),
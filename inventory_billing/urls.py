@@ -9,4 +9,5 @@ urlpatterns = [
     path('api/auth/', include('auth_user.urls')),
     path('api/notifications/', include('notifications.urls')),
     path('api/reports/', include('reports.urls')),
+    path('api/sync/', include('sync.urls')),
 ]
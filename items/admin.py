@@ -1,8 +1,10 @@
 from django.contrib import admin
+from django.db.models import Count, Q
 from django.utils.html import format_html
 from django.urls import reverse
 from .models import Item
-from inventory.models import StockTransaction, current_stock_for_item
+from inventory.models import StockTransaction
+from inventory.reconcile import resync_stock
 
 
 @admin.register(Item)
@@ -21,7 +23,7 @@ class ItemAdmin(admin.ModelAdmin):
             'fields': ('price', 'gst_percent')
         }),
         ('Stock Information', {
-            'fields': ('stock_summary', 'total_in_stock', 'total_out_stock', 'current_stock', 'low_stock_notified'),
+            'fields': ('stock_summary', 'total_in_stock', 'total_out_stock', 'current_stock', 'reorder_level', 'low_stock_notified'),
             'description': 'Stock values are calculated from transactions. Use Stock Transactions to add stock.'
         }),
         ('Metadata', {
@@ -31,12 +33,12 @@ class ItemAdmin(admin.ModelAdmin):
     )
     
     def stock_info(self, obj):
-        """Display current stock with color coding"""
-        current = current_stock_for_item(obj)
+        """Display current stock with color coding, from the cached counter"""
+        current = obj.current_stock
         if current <= 0:
             color = '#dc3545'  # Red
             text = f'{current}'
-        elif current <= 5:
+        elif current <= obj.reorder_level:
             color = '#ffc107'  # Yellow/Orange
             text = f'{current}'
         else:
@@ -53,8 +55,7 @@ class ItemAdmin(admin.ModelAdmin):
     
     def low_stock_indicator(self, obj):
         """Show low stock warning"""
-        current = current_stock_for_item(obj)
-        if current <= 5:
+        if obj.current_stock <= obj.reorder_level:
             return format_html(
                 '<span style="background-color: #ffc107; color: #000; padding: 2px 6px; border-radius: 3px; font-size: 11px;">LOW</span>'
             )
@@ -63,13 +64,17 @@ class ItemAdmin(admin.ModelAdmin):
     
     def stock_summary(self, obj):
         """Show detailed stock summary"""
-        current = current_stock_for_item(obj)
+        current = obj.current_stock
         total_in = obj.total_in_stock or 0
         total_out = obj.total_out_stock or 0
         
-        # Count transactions
-        in_count = StockTransaction.objects.filter(item=obj, txn_type='IN').count()
-        out_count = StockTransaction.objects.filter(item=obj, txn_type='OUT').count()
+        # Count transactions in one grouped pass
+        counts = StockTransaction.objects.filter(item=obj).aggregate(
+            in_count=Count('pk', filter=Q(txn_type='IN')),
+            out_count=Count('pk', filter=Q(txn_type='OUT')),
+        )
+        in_count = counts['in_count']
+        out_count = counts['out_count']
         
         return format_html(
             '<div style="padding: 10px; background: #f8f9fa; border-radius: 4px;">'
@@ -88,18 +93,14 @@ class ItemAdmin(admin.ModelAdmin):
         )
     stock_summary.short_description = 'Stock Details'
     
-    def get_queryset(self, request):
-        """Optimize queries"""
-        qs = super().get_queryset(request)
-        return qs.prefetch_related('txns')
-    
     actions = ['sync_stock_values']
     
     def sync_stock_values(self, request, queryset):
-        """Admin action to sync stock values from transactions"""
-        count = 0
-        for item in queryset:
-            current_stock_for_item(item)
-            count += 1
-        self.message_user(request, f'Successfully synced stock for {count} item(s).')
+        """Admin action to resync stock values from transactions, chunked and set-based"""
+        result = resync_stock(queryset.values_list('pk', flat=True))
+        self.message_user(
+            request,
+            f'Checked stock for {result.checked} item(s) in {result.seconds:.2f}s; '
+            f'repaired {result.repaired} out of sync with transactions.'
+        )
     sync_stock_values.short_description = 'Sync stock values from transactions'
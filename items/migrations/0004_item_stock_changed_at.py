@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-16 20:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('items', '0003_item_current_stock_item_total_in_stock_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='item',
+            name='stock_changed_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-16 21:02
+
+import items.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('items', '0004_item_stock_changed_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='item',
+            name='reorder_level',
+            field=models.DecimalField(decimal_places=3, default=items.models.default_reorder_level, max_digits=14),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(condition=models.Q(('current_stock__lte', models.F('reorder_level'))), fields=['name'], name='item_low_stock_idx'),
+        ),
+    ]
@@ -1,4 +1,12 @@
+from decimal import Decimal
+
+from django.conf import settings
 from django.db import models
+from django.db.models import F, Q
+
+
+def default_reorder_level():
+    return Decimal(str(settings.NOTIFICATIONS.get('LOW_STOCK_THRESHOLD', '5')))
 
 
 class Item(models.Model):
@@ -13,8 +21,23 @@ class Item(models.Model):
     total_out_stock = models.DecimalField(max_digits=14, decimal_places=3, default=0)
     current_stock = models.DecimalField(max_digits=14, decimal_places=3, default=0)
     low_stock_notified = models.BooleanField(default=False)
+    # Stock at or below this is low; set per item since units differ (pcs, kg, meter)
+    reorder_level = models.DecimalField(max_digits=14, decimal_places=3, default=default_reorder_level)
+    # Bumped whenever the stock counters above change; see inventory.snapshot
+    stock_changed_at = models.DateTimeField(null=True, blank=True, db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Partial index holding only the low-stock rows, so the low-stock
+            # list reads them directly instead of scanning every item
+            models.Index(
+                fields=['name'],
+                name='item_low_stock_idx',
+                condition=Q(current_stock__lte=F('reorder_level')),
+            ),
+        ]
+
     def __str__(self):
         return f"{self.name} ({self.sku})"
@@ -9,4 +9,5 @@ class ItemSerializer(serializers.ModelSerializer):
             'total_in_stock',
             'total_out_stock',
             'current_stock',
+            'stock_changed_at',
         ]
@@ -1,6 +1,8 @@
 from rest_framework import generics, filters
 
 from auth_user.permissions import IsAdminOrReadOnly
+from inventory.changes import publish_stock_changes
+from inventory.services import refresh_low_stock_flags
 
 from .models import Item
 from .serializers import ItemSerializer
@@ -18,3 +20,9 @@ class ItemRetrieveUpdateDestroy(generics.RetrieveUpdateDestroyAPIView):
     queryset = Item.objects.all()
     serializer_class = ItemSerializer
     permission_classes = [IsAdminOrReadOnly]
+
+    def perform_update(self, serializer):
+        item = serializer.save()
+        # A changed reorder_level can put the item on either side of it
+        refresh_low_stock_flags([item.pk])
+        publish_stock_changes([item.pk])
@@ -1,6 +1,7 @@
 from django.contrib import admin
+from django.utils import timezone
 
-from .models import NotificationLog
+from .models import NotificationLog, NotificationOutbox
 
 
 @admin.register(NotificationLog)
@@ -37,3 +38,38 @@ class NotificationLogAdmin(admin.ModelAdmin):
         """Notifications are read-only logs."""
         return False
 
+
+@admin.register(NotificationOutbox)
+class NotificationOutboxAdmin(admin.ModelAdmin):
+    list_display = ['id', 'event', 'status', 'attempts', 'available_at', 'created_at', 'processed_at']
+    list_filter = ['event', 'status', 'created_at']
+    readonly_fields = [
+        'event',
+        'payload',
+        'status',
+        'attempts',
+        'available_at',
+        'locked_by',
+        'locked_at',
+        'last_error',
+        'created_at',
+        'processed_at',
+    ]
+    date_hierarchy = 'created_at'
+    ordering = ['-id']
+    actions = ['requeue_entries']
+
+    def has_add_permission(self, request):
+        """Outbox entries are queued by the application, not manually."""
+        return False
+
+    @admin.action(description='Requeue selected entries for delivery')
+    def requeue_entries(self, request, queryset):
+        count = queryset.exclude(status=NotificationOutbox.Status.SENT).update(
+            status=NotificationOutbox.Status.PENDING,
+            attempts=0,
+            available_at=timezone.now(),
+            locked_by='',
+            locked_at=None,
+        )
+        self.message_user(request, f'Requeued {count} notification(s).')
@@ -0,0 +1,103 @@
+import socketserver
+import threading
+import time
+
+from django.core.mail import EmailMessage
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from inventory_billing.benchmark import Stopwatch
+from notifications.providers import close_providers, get_provider
+
+
+class _SinkHandler(socketserver.StreamRequestHandler):
+    """Just enough SMTP to accept and discard messages."""
+
+    def handle(self):
+        # Stand-in for the TCP + TLS handshake cost of a real mail server
+        time.sleep(self.server.handshake_delay)
+        self._reply('220 benchmark ESMTP')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode('ascii', 'replace').strip().upper()
+            if command.startswith(('EHLO', 'HELO')):
+                self._reply('250 benchmark')
+            elif command.startswith('DATA'):
+                self._reply('354 End data with <CR><LF>.<CR><LF>')
+                while self.rfile.readline() not in (b'.\r\n', b''):
+                    pass
+                self.server.received += 1
+                self._reply('250 OK')
+            elif command.startswith('QUIT'):
+                self._reply('221 Bye')
+                return
+            else:
+                self._reply('250 OK')
+
+    def _reply(self, text):
+        self.wfile.write(f'{text}\r\n'.encode('ascii'))
+
+
+class _SinkServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, handshake_delay):
+        super().__init__(('127.0.0.1', 0), _SinkHandler)
+        self.handshake_delay = handshake_delay
+        self.received = 0
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare email throughput of one SMTP connection per message against the pooled '
+        'provider batch path, using a local SMTP stand-in that discards everything.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=200, help='Messages per run (default: 200).')
+        parser.add_argument(
+            '--handshake-ms',
+            type=float,
+            default=20.0,
+            help='Simulated connection/TLS setup latency per SMTP session (default: 20ms).',
+        )
+
+    def handle(self, *args, **options):
+        server = _SinkServer(options['handshake_ms'] / 1000)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        host, port = server.server_address
+        count = options['messages']
+        messages = [
+            (f'customer{i}@example.com', f'Invoice {i}', 'Thank you for your purchase!', None)
+            for i in range(count)
+        ]
+        try:
+            with override_settings(
+                EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+                EMAIL_HOST=host,
+                EMAIL_PORT=port,
+                EMAIL_USE_TLS=False,
+                EMAIL_USE_SSL=False,
+                EMAIL_HOST_USER='',
+                EMAIL_HOST_PASSWORD='',
+            ):
+                with Stopwatch() as per_message:
+                    for recipient, subject, body, _ in messages:
+                        EmailMessage(subject=subject, body=body, to=[recipient]).send()
+
+                with Stopwatch() as pooled:
+                    errors = get_provider('email').send_batch(messages)
+                close_providers()
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        failures = sum(1 for error in errors if error)
+        self.stdout.write(f'{"mode":<28}{"messages":>10}{"msg/sec":>12}')
+        self.stdout.write(f'{"connection per message":<28}{count:>10}{count / per_message.elapsed:>12.1f}')
+        self.stdout.write(f'{"pooled batch":<28}{count:>10}{count / pooled.elapsed:>12.1f}')
+        self.stdout.write(f'Stand-in received {server.received} message(s), {failures} pooled failure(s).')
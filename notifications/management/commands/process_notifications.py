@@ -0,0 +1,55 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from notifications.worker import outbox_setting, process_batch
+
+
+class Command(BaseCommand):
+    help = (
+        'Deliver queued notifications from the outbox. Failed deliveries are retried '
+        'with exponential backoff and dead-lettered after the maximum number of attempts.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Drain the currently due entries and exit instead of polling forever.',
+        )
+        parser.add_argument('--batch-size', type=int, help='Entries claimed per batch.')
+        parser.add_argument('--concurrency', type=int, help='Deliveries in flight at once.')
+        parser.add_argument('--max-attempts', type=int, help='Attempts before dead-lettering.')
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            help='Seconds to sleep when the outbox is empty.',
+        )
+
+    def handle(self, *args, **options):
+        poll_interval = options['poll_interval'] or outbox_setting('POLL_INTERVAL_SECONDS', 2)
+        concurrency = options['concurrency'] or outbox_setting('CONCURRENCY', 4)
+        # One pool for the life of the worker so each thread reuses its SMTP session
+        pool = ThreadPoolExecutor(max_workers=concurrency)
+        try:
+            while True:
+                result = process_batch(
+                    batch_size=options['batch_size'],
+                    concurrency=concurrency,
+                    max_attempts=options['max_attempts'],
+                    pool=pool,
+                )
+                if result.claimed:
+                    self.stdout.write(
+                        f'Processed {result.claimed} notification(s): {result.sent} sent, '
+                        f'{result.retried} scheduled for retry, {result.dead} dead-lettered.'
+                    )
+                    continue
+                if options['once']:
+                    break
+                time.sleep(poll_interval)
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping notification worker.')
+        finally:
+            pool.shutdown(wait=True)
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 
 
 class NotificationLog(models.Model):
@@ -32,3 +33,38 @@ class NotificationLog(models.Model):
     def __str__(self):
         return f"{self.event} → {self.recipient} ({self.channel})"
 
+
+class NotificationOutbox(models.Model):
+    """
+    Notifications queued by the request path, written in the same transaction
+    as the change that caused them and delivered by the process_notifications
+    worker.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Pending'
+        PROCESSING = 'processing', 'Processing'
+        SENT = 'sent', 'Sent'
+        DEAD = 'dead', 'Dead Letter'
+
+    event = models.CharField(max_length=50, choices=NotificationLog.Event.choices)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=64, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['id']
+        verbose_name = 'Notification Outbox Entry'
+        verbose_name_plural = 'Notification Outbox'
+        indexes = [
+            models.Index(fields=['status', 'available_at'], name='notif_outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.event} #{self.pk} ({self.status})"
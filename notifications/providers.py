@@ -1,9 +1,13 @@
 import logging
+import smtplib
+import threading
+import time
 from dataclasses import dataclass
 from typing import Optional
 
 from django.conf import settings
-from django.core.mail import EmailMessage
+from django.core.mail import EmailMessage, get_connection
+from django.core.signals import setting_changed
 
 try:
     from twilio.base.exceptions import TwilioRestException
@@ -25,31 +29,125 @@ class BaseChannelProvider:
     channel: str
     config: dict
 
+    def __post_init__(self):
+        """Hook for subclasses that hold long-lived resources."""
+
     def send(self, recipient: str, subject: str, message: str, attachments=None):
         raise NotImplementedError
 
+    def send_batch(self, messages):
+        """
+        Send several (recipient, subject, message, attachments) tuples.
+        Returns one error string (or None on success) per message, in order.
+        """
+        errors = []
+        for recipient, subject, message, attachments in messages:
+            try:
+                self.send(recipient, subject, message, attachments=attachments)
+            except NotificationSendError as exc:
+                errors.append(str(exc))
+            else:
+                errors.append(None)
+        return errors
+
+    def close(self):
+        """Release any long-lived resources held by the provider."""
+
 
 class EmailProvider(BaseChannelProvider):
-    def send(self, recipient: str, subject: str, message: str, attachments=None):
+    """
+    Sends email over one long-lived backend connection, reopened when it has
+    been idle longer than `max_idle_seconds` or the server dropped it.
+    """
+
+    def __post_init__(self):
+        self._connection = None
+        self._last_used = 0.0
+
+    @property
+    def max_idle_seconds(self):
+        return self.config.get('max_idle_seconds', 60)
+
+    def _get_connection(self):
+        now = time.monotonic()
+        if self._connection is not None and now - self._last_used > self.max_idle_seconds:
+            self.close()
+        if self._connection is None:
+            self._connection = get_connection(fail_silently=False)
+            self._connection.open()
+        self._last_used = now
+        return self._connection
+
+    def close(self):
+        if self._connection is not None:
+            try:
+                self._connection.close()
+            except Exception:  # pragma: no cover - depends on backend
+                pass
+            self._connection = None
+
+    def build_message(self, recipient: str, subject: str, message: str, attachments=None):
         from_email = self.config.get('from_email') or settings.DEFAULT_FROM_EMAIL
+        email = EmailMessage(
+            subject=subject or '',
+            body=message,
+            from_email=from_email,
+            to=[recipient],
+        )
+        if attachments:
+            for attachment in attachments:
+                email.attach(
+                    attachment['filename'],
+                    attachment['content'],
+                    attachment.get('mimetype', 'application/octet-stream'),
+                )
+        return email
+
+    def _deliver(self, emails):
         try:
-            email = EmailMessage(
-                subject=subject or '',
-                body=message,
-                from_email=from_email,
-                to=[recipient],
-            )
-            if attachments:
-                for attachment in attachments:
-                    email.attach(
-                        attachment['filename'],
-                        attachment['content'],
-                        attachment.get('mimetype', 'application/octet-stream'),
-                    )
-            email.send(fail_silently=False)
+            self._get_connection().send_messages(emails)
+        except smtplib.SMTPServerDisconnected:
+            # The pooled session went stale; reconnect once and retry
+            self.close()
+            self._get_connection().send_messages(emails)
+
+    def send(self, recipient: str, subject: str, message: str, attachments=None):
+        try:
+            self._deliver([self.build_message(recipient, subject, message, attachments)])
         except Exception as exc:  # pragma: no cover - depends on backend
+            self.close()
             raise NotificationSendError(str(exc)) from exc
 
+    def send_batch(self, messages):
+        """
+        Hand the whole batch to the backend in one `send_messages` call. If that
+        raises, fall back to sending one at a time so a single bad recipient
+        does not fail the rest, and report failures per message.
+        """
+        emails = [
+            self.build_message(recipient, subject, message, attachments)
+            for recipient, subject, message, attachments in messages
+        ]
+        if not emails:
+            return []
+        try:
+            self._deliver(emails)
+        except Exception:  # pragma: no cover - depends on backend
+            self.close()
+        else:
+            return [None] * len(emails)
+        # Backends stop at the first failure, so messages before it may go out twice
+        errors = []
+        for email in emails:
+            try:
+                self._deliver([email])
+            except Exception as exc:  # pragma: no cover - depends on backend
+                self.close()
+                errors.append(str(exc))
+            else:
+                errors.append(None)
+        return errors
+
 
 class TwilioProvider(BaseChannelProvider):
     _client: Optional[Client] = None
@@ -98,3 +196,42 @@ class ConsoleProvider(BaseChannelProvider):
             bool(attachments),
         )
 
+
+_registry = threading.local()
+
+
+def get_provider(channel: str) -> BaseChannelProvider:
+    """
+    Return the long-lived provider for a channel. Providers are cached per
+    thread so each worker thread keeps its own pooled connection.
+    """
+    providers = getattr(_registry, 'providers', None)
+    if providers is None:
+        providers = _registry.providers = {}
+    provider = providers.get(channel)
+    if provider is None:
+        config = settings.NOTIFICATIONS.get('CHANNELS', {}).get(channel, {})
+        if channel == 'email':
+            provider = EmailProvider(channel, config)
+        elif config.get('provider') == 'twilio':
+            provider = TwilioProvider(channel, config)
+        else:
+            provider = ConsoleProvider(channel, config)
+        providers[channel] = provider
+    return provider
+
+
+def close_providers():
+    """Close the current thread's providers and their connections."""
+    providers = getattr(_registry, 'providers', None) or {}
+    for provider in providers.values():
+        provider.close()
+    _registry.providers = {}
+
+
+def _reset_on_setting_change(setting, **kwargs):
+    if setting in ('NOTIFICATIONS', 'DEFAULT_FROM_EMAIL') or setting.startswith('EMAIL_'):
+        close_providers()
+
+
+setting_changed.connect(_reset_on_setting_change)
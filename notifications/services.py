@@ -1,4 +1,5 @@
 import logging
+from collections import defaultdict
 from dataclasses import dataclass
 from decimal import Decimal
 from typing import Iterable, List
@@ -9,13 +10,8 @@ from django.utils import timezone
 from billing.models import Invoice
 from items.models import Item
 
-from .models import NotificationLog
-from .providers import (
-    ConsoleProvider,
-    EmailProvider,
-    NotificationSendError,
-    TwilioProvider,
-)
+from .models import NotificationLog, NotificationOutbox
+from .providers import get_provider
 from .templates import TEMPLATES
 
 logger = logging.getLogger(__name__)
@@ -45,7 +41,7 @@ def _render(event_key: str, channel: str, context: dict):
     return subject, message
 
 
-def _log_delivery(
+def _log_entry(
     event_key: str,
     recipient: Recipient,
     subject: str,
@@ -54,7 +50,7 @@ def _log_delivery(
     error: str = '',
     metadata=None,
 ):
-    NotificationLog.objects.create(
+    return NotificationLog(
         event=event_key,
         channel=recipient.channel,
         recipient=recipient.address,
@@ -66,85 +62,74 @@ def _log_delivery(
     )
 
 
-def _provider_for(channel: str):
-    config = settings.NOTIFICATIONS.get('CHANNELS', {}).get(channel, {})
-    if channel == NotificationLog.Channel.EMAIL:
-        return EmailProvider(channel, config)
-    provider_name = config.get('provider')
-    if provider_name == 'twilio':
-        return TwilioProvider(channel, config)
-    return ConsoleProvider(channel, config)
-
-
 def _dispatch(
     event_key: str,
     recipients: Iterable[Recipient],
     context: dict,
     metadata=None,
     attachments=None,
+    only=None,
 ):
-    """Dispatch notifications to all recipients, logging each attempt."""
+    """
+    Dispatch notifications to all recipients, logging each attempt.
+    Recipients on the same channel are sent as one batch through the channel's
+    long-lived provider. Returns the recipients whose delivery failed. Pass
+    `only` (a collection of addresses) to restrict delivery to those
+    recipients, e.g. on a retry.
+    """
+    if only is not None:
+        recipients = [recipient for recipient in recipients if recipient.address in only]
     if not recipients:
         logger.warning(f"No recipients found for event: {event_key}")
-        return
-    
+        return []
+
+    failed = []
+    logs = []
+    batches = defaultdict(list)
     for recipient in recipients:
         try:
             subject, message = _render(event_key, recipient.channel, context)
         except KeyError as e:
             logger.error(f"Template missing key for {event_key}: {e}")
             error = f"Template error: {str(e)}"
-            _log_delivery(
-                event_key,
-                recipient,
-                '',
-                '',
-                NotificationLog.Status.FAILED,
-                error,
-                metadata=metadata,
-            )
+            logs.append(_log_entry(event_key, recipient, '', '', NotificationLog.Status.FAILED, error, metadata))
+            failed.append(recipient)
             continue
         except Exception as e:
             logger.error(f"Error rendering template for {event_key}: {e}")
             error = f"Template rendering error: {str(e)}"
-            _log_delivery(
-                event_key,
-                recipient,
-                '',
-                '',
-                NotificationLog.Status.FAILED,
-                error,
-                metadata=metadata,
-            )
+            logs.append(_log_entry(event_key, recipient, '', '', NotificationLog.Status.FAILED, error, metadata))
+            failed.append(recipient)
             continue
-        
-        provider = _provider_for(recipient.channel)
+        batches[recipient.channel].append((recipient, subject, message))
+
+    for channel, batch in batches.items():
         channel_attachments = None
         if attachments:
-            channel_attachments = attachments.get(recipient.channel) or attachments.get('default')
-        status = NotificationLog.Status.SENT
-        error = ''
+            channel_attachments = attachments.get(channel) or attachments.get('default')
         try:
-            provider.send(recipient.address, subject, message, attachments=channel_attachments)
-            logger.info(f"Notification sent: {event_key} → {recipient.channel}:{recipient.address}")
-        except NotificationSendError as exc:
-            status = NotificationLog.Status.FAILED
-            error = str(exc)
-            logger.error(f"Notification failed: {event_key} → {recipient.channel}:{recipient.address} - {error}")
+            errors = get_provider(channel).send_batch(
+                [
+                    (recipient.address, subject, message, channel_attachments)
+                    for recipient, subject, message in batch
+                ]
+            )
         except Exception as exc:
-            status = NotificationLog.Status.FAILED
-            error = f"Unexpected error: {str(exc)}"
-            logger.exception(f"Unexpected error sending notification: {event_key} → {recipient.channel}:{recipient.address}")
-        
-        _log_delivery(
-            event_key,
-            recipient,
-            subject,
-            message,
-            status,
-            error,
-            metadata=metadata,
-        )
+            logger.exception(f"Unexpected error sending notification batch: {event_key} → {channel}")
+            errors = [f"Unexpected error: {str(exc)}"] * len(batch)
+
+        for (recipient, subject, message), error in zip(batch, errors):
+            if error:
+                status = NotificationLog.Status.FAILED
+                failed.append(recipient)
+                logger.error(f"Notification failed: {event_key} → {recipient.channel}:{recipient.address} - {error}")
+            else:
+                status = NotificationLog.Status.SENT
+                logger.info(f"Notification sent: {event_key} → {recipient.channel}:{recipient.address}")
+            logs.append(_log_entry(event_key, recipient, subject, message, status, error or '', metadata))
+
+    NotificationLog.objects.bulk_create(logs)
+    return failed
 
 
 def _customer_recipients(customer) -> List[Recipient]:
@@ -166,7 +151,47 @@ def _admin_recipients():
     return recipients
 
 
-def notify_invoice_created(invoice: Invoice):
+def queue_notification(event_key: str, **payload):
+    """
+    Record a notification in the outbox. Call this inside the transaction that
+    made the change; the process_notifications worker delivers it after commit.
+    """
+    return NotificationOutbox.objects.create(event=event_key, payload=payload)
+
+
+def queue_invoice_created(invoice: Invoice):
+    return queue_notification(NotificationLog.Event.INVOICE_CREATED, invoice_id=invoice.id)
+
+
+def queue_invoices_created(invoices):
+    """queue_invoice_created() for many invoices with one INSERT."""
+    return NotificationOutbox.objects.bulk_create([
+        NotificationOutbox(event=NotificationLog.Event.INVOICE_CREATED, payload={'invoice_id': invoice.id})
+        for invoice in invoices
+    ])
+
+
+def queue_payment_confirmation(invoice: Invoice, payment_data: dict):
+    return queue_notification(
+        NotificationLog.Event.PAYMENT_CONFIRMED,
+        invoice_id=invoice.id,
+        amount=str(payment_data['amount']),
+        method=payment_data['method'],
+        reference=payment_data.get('reference', ''),
+        date=timezone.now().isoformat(),
+    )
+
+
+def queue_low_stock_alert(item: Item, current_qty: Decimal, threshold: Decimal):
+    return queue_notification(
+        NotificationLog.Event.LOW_STOCK,
+        item_id=item.id,
+        current_qty=str(current_qty),
+        threshold=str(threshold),
+    )
+
+
+def notify_invoice_created(invoice: Invoice, only=None):
     """Send notification when a new invoice is created."""
     event = NotificationLog.Event.INVOICE_CREATED
     base_url = _get_base_url()
@@ -185,11 +210,9 @@ def notify_invoice_created(invoice: Invoice):
         recipients = _admin_recipients()
     attachments = {}
     try:
-        from billing.invoice_generator import generate_invoice_pdf
+        from billing.pdf_cache import invoice_pdf_bytes
 
-        pdf_buffer = generate_invoice_pdf(invoice)
-        pdf_bytes = pdf_buffer.getvalue()
-        pdf_buffer.close()
+        pdf_bytes = invoice_pdf_bytes(invoice)
         attachments['email'] = [
             {
                 'filename': f'{invoice.invoice_no}.pdf',
@@ -200,18 +223,19 @@ def notify_invoice_created(invoice: Invoice):
     except Exception as exc:
         logger.error('Failed to generate invoice PDF attachment: %s', exc)
     if recipients:
-        _dispatch(
+        return _dispatch(
             event,
             recipients,
             context,
             metadata={'invoice_id': invoice.id},
             attachments=attachments or None,
+            only=only,
         )
-    else:
-        logger.warning(f"No recipients found for invoice {invoice.invoice_no}")
+    logger.warning(f"No recipients found for invoice {invoice.invoice_no}")
+    return []
 
 
-def notify_payment_confirmation(invoice: Invoice, payment_data: dict):
+def notify_payment_confirmation(invoice: Invoice, payment_data: dict, only=None):
     """Send notification when a payment is confirmed."""
     event = NotificationLog.Event.PAYMENT_CONFIRMED
     context = {
@@ -220,18 +244,18 @@ def notify_payment_confirmation(invoice: Invoice, payment_data: dict):
         'amount': float(payment_data['amount']),
         'method': payment_data['method'],
         'reference': payment_data.get('reference', '') or 'N/A',
-        'date': timezone.now().strftime('%d-%b-%Y %H:%M'),
+        'date': (payment_data.get('date') or timezone.now()).strftime('%d-%b-%Y %H:%M'),
         'payment_status': invoice.get_payment_status_display(),
         'sender': _get_sender(),
     }
     recipients = _customer_recipients(invoice.customer) or _admin_recipients()
     if recipients:
-        _dispatch(event, recipients, context, metadata={'invoice_id': invoice.id})
-    else:
-        logger.warning(f"No recipients found for payment confirmation on invoice {invoice.invoice_no}")
+        return _dispatch(event, recipients, context, metadata={'invoice_id': invoice.id}, only=only)
+    logger.warning(f"No recipients found for payment confirmation on invoice {invoice.invoice_no}")
+    return []
 
 
-def notify_low_stock_alert(item: Item, current_qty: Decimal, threshold: Decimal):
+def notify_low_stock_alert(item: Item, current_qty: Decimal, threshold: Decimal, only=None):
     """Send notification when an item's stock falls below threshold."""
     event = NotificationLog.Event.LOW_STOCK
     context = {
@@ -244,7 +268,7 @@ def notify_low_stock_alert(item: Item, current_qty: Decimal, threshold: Decimal)
     }
     recipients = _admin_recipients()
     if recipients:
-        _dispatch(event, recipients, context, metadata={'item_id': item.id})
-    else:
-        logger.warning(f"No admin recipients configured for low stock alert on item {item.sku}")
+        return _dispatch(event, recipients, context, metadata={'item_id': item.id}, only=only)
+    logger.warning(f"No admin recipients configured for low stock alert on item {item.sku}")
+    return []
 
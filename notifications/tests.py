@@ -0,0 +1,42 @@
+from unittest import mock
+
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.test import SimpleTestCase
+
+from .providers import EmailProvider
+
+
+class RefusingBackend(EmailBackend):
+    """Locmem backend that refuses one address, like an SMTP server would."""
+
+    refused = 'bad@example.com'
+
+    def send_messages(self, messages):
+        for message in messages:
+            if self.refused in message.to:
+                raise ValueError(f'{self.refused} refused')
+        return super().send_messages(messages)
+
+
+class EmailBatchTests(SimpleTestCase):
+    def setUp(self):
+        mail.outbox = []
+        self.provider = EmailProvider('email', {'from_email': 'shop@example.com'})
+        self.addCleanup(self.provider.close)
+
+    def batch(self, *recipients):
+        return [(recipient, 'Invoice', 'Thanks', None) for recipient in recipients]
+
+    def test_batch_is_one_send_messages_call(self):
+        with mock.patch.object(EmailBackend, 'send_messages', autospec=True, return_value=3) as send:
+            errors = self.provider.send_batch(self.batch('a@example.com', 'b@example.com', 'c@example.com'))
+        self.assertEqual(errors, [None, None, None])
+        self.assertEqual(send.call_count, 1)
+        self.assertEqual(len(send.call_args.args[1]), 3)
+
+    def test_one_bad_recipient_does_not_drop_the_rest(self):
+        with mock.patch('notifications.providers.get_connection', lambda **kwargs: RefusingBackend(**kwargs)):
+            errors = self.provider.send_batch(self.batch('a@example.com', 'bad@example.com', 'c@example.com'))
+        self.assertEqual(errors, [None, 'bad@example.com refused', None])
+        self.assertEqual([message.to for message in mail.outbox], [['a@example.com'], ['c@example.com']])
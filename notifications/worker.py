@@ -0,0 +1,216 @@
+import logging
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from billing.models import Invoice
+from items.models import Item
+
+from .models import NotificationLog, NotificationOutbox
+from .services import (
+    notify_invoice_created,
+    notify_low_stock_alert,
+    notify_payment_confirmation,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class PermanentDeliveryError(Exception):
+    """Raised when an outbox entry can never be delivered and should be dead-lettered."""
+
+
+def outbox_setting(name, default):
+    return settings.NOTIFICATIONS.get('OUTBOX', {}).get(name, default)
+
+
+def _deliver_invoice_created(payload, only):
+    invoice = (
+        Invoice.objects.select_related('customer')
+        .filter(pk=payload.get('invoice_id'))
+        .first()
+    )
+    if invoice is None:
+        raise PermanentDeliveryError(f"Invoice {payload.get('invoice_id')} no longer exists.")
+    return notify_invoice_created(invoice, only=only)
+
+
+def _deliver_payment_confirmation(payload, only):
+    invoice = (
+        Invoice.objects.select_related('customer')
+        .filter(pk=payload.get('invoice_id'))
+        .first()
+    )
+    if invoice is None:
+        raise PermanentDeliveryError(f"Invoice {payload.get('invoice_id')} no longer exists.")
+    payment_data = {
+        'amount': Decimal(payload['amount']),
+        'method': payload['method'],
+        'reference': payload.get('reference', ''),
+        'date': parse_datetime(payload['date']) if payload.get('date') else None,
+    }
+    return notify_payment_confirmation(invoice, payment_data, only=only)
+
+
+def _deliver_low_stock_alert(payload, only):
+    item = Item.objects.filter(pk=payload.get('item_id')).first()
+    if item is None:
+        raise PermanentDeliveryError(f"Item {payload.get('item_id')} no longer exists.")
+    return notify_low_stock_alert(
+        item,
+        Decimal(payload['current_qty']),
+        Decimal(payload['threshold']),
+        only=only,
+    )
+
+
+HANDLERS = {
+    NotificationLog.Event.INVOICE_CREATED: _deliver_invoice_created,
+    NotificationLog.Event.PAYMENT_CONFIRMED: _deliver_payment_confirmation,
+    NotificationLog.Event.LOW_STOCK: _deliver_low_stock_alert,
+}
+
+
+@dataclass
+class BatchResult:
+    claimed: int = 0
+    sent: int = 0
+    retried: int = 0
+    dead: int = 0
+
+
+def _backoff(attempts: int) -> timedelta:
+    base = outbox_setting('BACKOFF_SECONDS', 30)
+    ceiling = outbox_setting('MAX_BACKOFF_SECONDS', 3600)
+    return timedelta(seconds=min(base * (2 ** (attempts - 1)), ceiling))
+
+
+def claim_batch(batch_size: int):
+    """
+    Claim up to batch_size due entries for this worker. Entries stuck in
+    processing longer than the lease (a crashed worker) are claimed again.
+    """
+    now = timezone.now()
+    lease = timedelta(seconds=outbox_setting('LEASE_SECONDS', 300))
+    due = Q(status=NotificationOutbox.Status.PENDING, available_at__lte=now) | Q(
+        status=NotificationOutbox.Status.PROCESSING, locked_at__lt=now - lease
+    )
+    candidate_ids = list(
+        NotificationOutbox.objects.filter(due).order_by('id').values_list('id', flat=True)[:batch_size]
+    )
+    if not candidate_ids:
+        return []
+    token = uuid.uuid4().hex
+    # The due filter is repeated so two workers never claim the same entry
+    NotificationOutbox.objects.filter(due, pk__in=candidate_ids).update(
+        status=NotificationOutbox.Status.PROCESSING,
+        locked_by=token,
+        locked_at=now,
+    )
+    return list(NotificationOutbox.objects.filter(locked_by=token))
+
+
+def _finish(entry, status, error='', payload=None, available_at=None):
+    updates = {
+        'status': status,
+        'attempts': entry.attempts + 1,
+        'last_error': error,
+        'locked_by': '',
+        'locked_at': None,
+    }
+    if payload is not None:
+        updates['payload'] = payload
+    if available_at is not None:
+        updates['available_at'] = available_at
+    if status in (NotificationOutbox.Status.SENT, NotificationOutbox.Status.DEAD):
+        updates['processed_at'] = timezone.now()
+    NotificationOutbox.objects.filter(pk=entry.pk, locked_by=entry.locked_by).update(**updates)
+
+
+def deliver(entry, max_attempts: int):
+    """Deliver one claimed entry and record the outcome. Returns the new status."""
+    handler = HANDLERS.get(entry.event)
+    attempts = entry.attempts + 1
+    try:
+        if handler is None:
+            raise PermanentDeliveryError(f'No handler for event {entry.event}.')
+        failed = handler(entry.payload, entry.payload.get('retry_recipients')) or []
+    except PermanentDeliveryError as exc:
+        _finish(entry, NotificationOutbox.Status.DEAD, str(exc))
+        return NotificationOutbox.Status.DEAD
+    except Exception as exc:
+        logger.exception('Outbox entry %s failed', entry.pk)
+        failed = None
+        error = f'Unexpected error: {exc}'
+    else:
+        if not failed:
+            _finish(entry, NotificationOutbox.Status.SENT)
+            return NotificationOutbox.Status.SENT
+        error = 'Delivery failed for: ' + ', '.join(r.address for r in failed)
+
+    if attempts >= max_attempts:
+        _finish(entry, NotificationOutbox.Status.DEAD, error)
+        return NotificationOutbox.Status.DEAD
+
+    payload = None
+    if failed:
+        # Only retry the recipients that did not get the message
+        payload = {**entry.payload, 'retry_recipients': [r.address for r in failed]}
+    _finish(
+        entry,
+        NotificationOutbox.Status.PENDING,
+        error,
+        payload=payload,
+        available_at=timezone.now() + _backoff(attempts),
+    )
+    return NotificationOutbox.Status.PENDING
+
+
+def _deliver_in_thread(entry, max_attempts):
+    close_old_connections()
+    try:
+        return deliver(entry, max_attempts)
+    finally:
+        connection.close()
+
+
+def process_batch(batch_size=None, concurrency=None, max_attempts=None, pool=None) -> BatchResult:
+    """
+    Claim and deliver one batch. Pass a long-lived ThreadPoolExecutor as `pool`
+    so its threads keep their provider connections open between batches.
+    """
+    batch_size = batch_size or outbox_setting('BATCH_SIZE', 50)
+    concurrency = concurrency or outbox_setting('CONCURRENCY', 4)
+    max_attempts = max_attempts or outbox_setting('MAX_ATTEMPTS', 5)
+
+    entries = claim_batch(batch_size)
+    result = BatchResult(claimed=len(entries))
+    if not entries:
+        return result
+
+    if pool is not None:
+        statuses = list(pool.map(lambda entry: _deliver_in_thread(entry, max_attempts), entries))
+    elif concurrency <= 1:
+        statuses = [deliver(entry, max_attempts) for entry in entries]
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as temporary_pool:
+            statuses = list(
+                temporary_pool.map(lambda entry: _deliver_in_thread(entry, max_attempts), entries)
+            )
+
+    for status in statuses:
+        if status == NotificationOutbox.Status.SENT:
+            result.sent += 1
+        elif status == NotificationOutbox.Status.DEAD:
+            result.dead += 1
+        else:
+            result.retried += 1
+    return result
@@ -0,0 +1,118 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from inventory.models import StockDailyRollup
+from inventory.snapshot import stock_version
+from items.models import Item
+
+try:
+    import numpy as np
+    import pandas as pd
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+    pd = None
+
+DEFAULT_WINDOW_DAYS = 90
+MAX_WINDOW_DAYS = 730
+RECENT_DAYS = 7
+CACHE_TIMEOUT = 24 * 60 * 60
+
+
+def forecast_available():
+    return np is not None and pd is not None
+
+
+def _consumption(window, today):
+    """
+    Daily OUT quantities per item over the `window` local days ending with
+    `today`, as (item ids, days × items matrix as float). Read from the daily
+    rollups, one row per item and day with any OUT, so compacted months
+    still count and the ledger itself is never scanned.
+    """
+    start = today - timedelta(days=window - 1)
+    rows = list(
+        StockDailyRollup.objects.filter(day__gte=start, day__lte=today, out_qty__gt=0)
+        .order_by()
+        .values_list('item_id', 'day', 'out_qty')
+    )
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.zeros((window, 0))
+    frame = pd.DataFrame.from_records(rows, columns=['item_id', 'day', 'quantity'])
+    day = (pd.to_datetime(frame['day']).to_numpy().astype('datetime64[D]') - np.datetime64(start, 'D')).astype(np.int64)
+    item_index, item_ids = pd.factorize(frame['item_id'], sort=True)
+    quantity = pd.to_numeric(frame['quantity'], errors='coerce').fillna(0).to_numpy(dtype=float)
+    cells = day * len(item_ids) + item_index
+    daily = np.bincount(cells, weights=quantity, minlength=window * len(item_ids))
+    daily = daily.reshape(window, len(item_ids))
+    return np.asarray(item_ids, dtype=np.int64), daily
+
+
+def consumption_stats(window=DEFAULT_WINDOW_DAYS):
+    """
+    Per item daily consumption over the last `window` days: mean, variance
+    and the latest and peak RECENT_DAYS rolling means, as a DataFrame indexed by item
+    id. Every item is computed at once on a days × items array; nothing loops
+    per item. Cached until the next stock change (or the next day, since the
+    window moves).
+    """
+    today = timezone.localdate()
+    key = f'reports:forecast:{stock_version()}:{today.isoformat()}:{window}'
+    stats = cache.get(key)
+    if stats is not None:
+        return stats
+    item_ids, daily = _consumption(window, today)
+    recent = min(RECENT_DAYS, window)
+    # Rolling sums from one cumulative sum; the last row is the latest window
+    cumulative = np.cumsum(daily, axis=0)
+    rolling = cumulative[recent - 1:] - np.vstack([np.zeros((1, daily.shape[1])), cumulative[:-recent]])
+    stats = pd.DataFrame(
+        {
+            'daily_mean': daily.mean(axis=0),
+            'daily_variance': daily.var(axis=0, ddof=1) if window > 1 else np.zeros(daily.shape[1]),
+            'recent_daily_mean': rolling[-1] / recent if len(rolling) else np.zeros(daily.shape[1]),
+            'peak_rolling_mean': rolling.max(axis=0) / recent if len(rolling) else np.zeros(daily.shape[1]),
+        },
+        index=pd.Index(item_ids, name='item_id'),
+    )
+    cache.set(key, stats, CACHE_TIMEOUT)
+    return stats
+
+
+def reorder_forecast(window=DEFAULT_WINDOW_DAYS):
+    """
+    Project days until each item reaches its reorder level and runs out, at
+    its average daily consumption over the window. Items with no consumption
+    get no projection (None). Consumption comes from consumption_stats();
+    stock counters and reorder levels are read fresh, in one query.
+    """
+    stats = consumption_stats(window)
+    items = pd.DataFrame.from_records(
+        Item.objects.order_by('pk').values('id', 'name', 'sku', 'unit', 'current_stock', 'reorder_level'),
+        columns=['id', 'name', 'sku', 'unit', 'current_stock', 'reorder_level'],
+    ).set_index('id')
+    frame = items.join(stats, how='left').fillna(
+        {'daily_mean': 0.0, 'daily_variance': 0.0, 'recent_daily_mean': 0.0, 'peak_rolling_mean': 0.0}
+    )
+    current = frame['current_stock'].astype(float).to_numpy()
+    reorder_level = frame['reorder_level'].astype(float).to_numpy()
+    rate = frame['daily_mean'].to_numpy()
+    consuming = rate > 0
+    safe_rate = np.where(consuming, rate, 1.0)
+    frame['current_stock'] = current
+    frame['reorder_level'] = reorder_level
+    frame['daily_std'] = np.sqrt(frame['daily_variance'].to_numpy())
+    frame['days_until_reorder'] = np.where(consuming, np.maximum(current - reorder_level, 0) / safe_rate, np.nan)
+    frame['days_until_stockout'] = np.where(consuming, np.maximum(current, 0) / safe_rate, np.nan)
+    frame['is_low_stock'] = current <= reorder_level
+    frame = frame.sort_values(['days_until_stockout', 'name'], na_position='last')
+
+    numeric = [
+        'current_stock', 'reorder_level', 'daily_mean', 'daily_variance', 'daily_std',
+        'recent_daily_mean', 'peak_rolling_mean', 'days_until_reorder', 'days_until_stockout',
+    ]
+    frame[numeric] = frame[numeric].round(3)
+    frame = frame.reset_index().rename(columns={'id': 'item_id'})
+    frame = frame.astype(object).where(frame.notna(), None)
+    return frame.to_dict('records')
@@ -0,0 +1,47 @@
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+
+from inventory import compaction
+from inventory.balances import rebuild_running_balances
+from inventory.models import StockTransaction
+from inventory.rollups import rebuild_daily_rollups
+from items.models import Item
+
+from . import forecast
+
+
+@unittest.skipUnless(forecast.forecast_available(), 'numpy and pandas are not installed')
+class ReorderForecastTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.item = Item.objects.create(name='Rod', sku='ROD-1')
+        self.today = timezone.localdate()
+        for quantity, days_ago, txn_type in (('100', 60, 'IN'), ('9', 50, 'OUT'), ('6', 40, 'OUT'), ('3', 2, 'OUT')):
+            txn = StockTransaction.objects.create(item=self.item, txn_type=txn_type, quantity=Decimal(quantity))
+            moment = timezone.make_aware(datetime.combine(self.today - timedelta(days=days_ago), datetime.min.time()))
+            StockTransaction.objects.filter(pk=txn.pk).update(created_at=moment.replace(hour=12))
+        rebuild_running_balances()
+        rebuild_daily_rollups()
+
+    def daily_mean(self, window=90):
+        cache.clear()
+        return forecast.consumption_stats(window).loc[self.item.pk, 'daily_mean']
+
+    def test_consumption_counts_every_out_in_the_window(self):
+        self.assertAlmostEqual(self.daily_mean(), 18 / 90)
+        self.assertAlmostEqual(self.daily_mean(window=45), 9 / 45)
+
+    @unittest.skipIf(compaction.zstandard is None, 'zstandard is not installed')
+    def test_compacted_months_still_count(self):
+        before = self.daily_mean()
+        with tempfile.TemporaryDirectory() as directory:
+            compaction.compact_ledger(self.today.replace(day=1), directory)
+        self.assertLess(StockTransaction.objects.count(), 4)
+        self.assertAlmostEqual(self.daily_mean(), before)
@@ -5,6 +5,7 @@ from . import views
 urlpatterns = [
     path('sales/daily/', views.DailySalesReportView.as_view(), name='daily-sales-report'),
     path('stock/', views.StockReportView.as_view(), name='stock-report'),
+    path('stock/forecast/', views.ReorderForecastView.as_view(), name='stock-forecast'),
     path(
         'sales/customers/<int:pk>/',
         views.CustomerSalesHistoryView.as_view(),
@@ -19,7 +19,9 @@ from auth_user.permissions import IsAdminRole
 from billing.models import Invoice, InvoiceItem
 from billing.serializers import InvoiceSerializer
 from customers.models import Customer
-from items.models import Item
+from inventory.snapshot import stock_snapshot, stock_version
+
+from . import forecast
 
 
 def _parse_date(value):
@@ -116,39 +118,50 @@ class StockReportView(APIView):
     permission_classes = [IsAdminRole]
 
     def get(self, request):
+        # Without ?threshold= each item is judged against its own reorder_level
         threshold = request.query_params.get('threshold')
         try:
-            threshold = Decimal(str(threshold)) if threshold is not None else Decimal('5')
+            threshold = Decimal(str(threshold)) if threshold is not None else None
         except Exception:
-            threshold = Decimal('5')
-        search = request.query_params.get('search')
+            threshold = None
+        version, report = stock_snapshot(threshold, search=request.query_params.get('search'))
+        return Response(
+            {
+                'threshold': float(threshold) if threshold is not None else None,
+                'version': version,
+                'count': len(report),
+                'results': report,
+            }
+        )
 
-        items_qs = Item.objects.all().order_by('name')
-        if search:
-            items_qs = items_qs.filter(
-                Q(name__icontains=search) | Q(sku__icontains=search)
-            )
 
-        report = []
-        for item in items_qs:
-            report.append(
-                {
-                    'item_id': item.id,
-                    'name': item.name,
-                    'sku': item.sku,
-                    'unit': item.unit,
-                    'total_in': float(item.total_in_stock or 0),
-                    'total_out': float(item.total_out_stock or 0),
-                    'current_stock': float(item.current_stock or 0),
-                    'is_low_stock': (item.current_stock or Decimal('0')) <= threshold,
-                }
-            )
+class ReorderForecastView(APIView):
+    """
+    Days until each item hits its reorder level and runs out, projected from
+    its daily OUT consumption over the last ?window= days (default 90).
+    """
 
+    permission_classes = [IsAdminRole]
+
+    def get(self, request):
+        if not forecast.forecast_available():
+            return Response(
+                {'detail': 'Stock forecasting needs numpy and pandas installed.'},
+                status=503,
+            )
+        try:
+            window = int(request.query_params.get('window', forecast.DEFAULT_WINDOW_DAYS))
+        except (TypeError, ValueError):
+            window = forecast.DEFAULT_WINDOW_DAYS
+        window = max(1, min(window, forecast.MAX_WINDOW_DAYS))
+        version = stock_version()
+        results = forecast.reorder_forecast(window)
         return Response(
             {
-                'threshold': float(threshold),
-                'count': len(report),
-                'results': report,
+                'window_days': window,
+                'version': version,
+                'count': len(results),
+                'results': results,
             }
         )
 
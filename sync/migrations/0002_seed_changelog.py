@@ -0,0 +1,29 @@
+from django.db import migrations
+
+
+def seed_changelog(apps, schema_editor):
+    """Log every existing item and customer once, so since=0 is the whole catalog."""
+    ChangeLog = apps.get_model('sync', 'ChangeLog')
+    Item = apps.get_model('items', 'Item')
+    Customer = apps.get_model('customers', 'Customer')
+    for kind, model in (('item', Item), ('customer', Customer)):
+        ChangeLog.objects.bulk_create(
+            (
+                ChangeLog(kind=kind, object_id=object_id)
+                for object_id in model.objects.order_by('pk').values_list('pk', flat=True).iterator()
+            ),
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sync', '0001_initial'),
+        ('items', '0005_item_reorder_level'),
+        ('customers', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_changelog, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+from django.db import migrations, models
+from django.db.models import F, Max
+
+
+def copy_versions(apps, schema_editor):
+    """Existing rows keep their id as the version, so clients' `since` values stay valid."""
+    ChangeLog = apps.get_model('sync', 'ChangeLog')
+    SyncVersion = apps.get_model('sync', 'SyncVersion')
+    ChangeLog.objects.update(version=F('id'))
+    last = ChangeLog.objects.aggregate(last=Max('id'))['last'] or 0
+    SyncVersion.objects.update_or_create(pk=1, defaults={'current': last})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sync', '0002_seed_changelog'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('current', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='changelog',
+            name='version',
+            field=models.PositiveBigIntegerField(null=True),
+        ),
+        migrations.RunPython(copy_versions, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='changelog',
+            name='version',
+            field=models.PositiveBigIntegerField(unique=True),
+        ),
+    ]
@@ -0,0 +1,37 @@
+from django.db import models
+
+
+class ChangeLog(models.Model):
+    """
+    Latest change per synced object. Every save or delete moves the object's
+    row to a new version from SyncVersion, so the rows above a client's
+    version are exactly the objects it has not seen yet, and the table grows
+    with the catalog, not with the number of edits.
+    """
+    KINDS = [('item', 'Item'), ('customer', 'Customer')]
+    kind = models.CharField(max_length=10, choices=KINDS)
+    object_id = models.IntegerField()
+    version = models.PositiveBigIntegerField(unique=True)
+    # Tombstone: the object is gone and clients should drop their copy
+    deleted = models.BooleanField(default=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id'], name='sync_changelog_object_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id} @ {self.version}{' (deleted)' if self.deleted else ''}"
+
+
+class SyncVersion(models.Model):
+    """
+    Single row holding the last sync version handed out. Writers lock it
+    until they commit, so versions become visible in the order they were
+    issued and a client never skips past a change that commits late, which
+    auto-increment ids do not guarantee outside SQLite.
+    """
+    current = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f'Version {self.current}'
@@ -0,0 +1,74 @@
+from django.db import transaction
+
+from customers.models import Customer
+from items.models import Item
+
+from .models import ChangeLog, SyncVersion
+
+SYNC_PAGE_SIZE = 2000
+
+# What an offline terminal needs to sell; stock counters move on every sale
+# and are followed through inventory.changes instead
+SYNCED = {
+    'item': (Item, ['id', 'sku', 'name', 'unit', 'brand', 'price', 'gst_percent']),
+    'customer': (Customer, ['id', 'name', 'phone', 'email', 'address']),
+}
+
+
+def record_change(kind, object_id, deleted=False):
+    """
+    Move the object to the head of the log, in the caller's transaction. The
+    SyncVersion row stays locked until that transaction commits.
+    """
+    with transaction.atomic():
+        counter, _ = SyncVersion.objects.select_for_update().get_or_create(pk=1)
+        counter.current += 1
+        counter.save(update_fields=['current'])
+        ChangeLog.objects.update_or_create(
+            kind=kind, object_id=object_id, defaults={'version': counter.current, 'deleted': deleted}
+        )
+
+
+def latest_version():
+    return SyncVersion.objects.filter(pk=1).values_list('current', flat=True).first() or 0
+
+
+def _compact(value):
+    # Decimals as strings, like the rest of the API
+    return value if value is None or isinstance(value, (bool, int, str)) else str(value)
+
+
+def changes_since(since, limit=SYNC_PAGE_SIZE):
+    """
+    Objects changed after version `since`, at most `limit` of them, as
+    {'version', 'more', 'item': {...}, 'customer': {...}} where each kind has
+    'fields', 'rows' (one list per object, in 'fields' order) and 'deleted'
+    (ids). One range scan on the log plus one query per kind; pass
+    'version' back as the next `since` until 'more' is false. since=0 is
+    the full catalog.
+    """
+    entries = list(
+        ChangeLog.objects.filter(version__gt=since)
+        .order_by('version')
+        .values_list('version', 'kind', 'object_id', 'deleted')[:limit + 1]
+    )
+    more = len(entries) > limit
+    entries = entries[:limit]
+
+    changed = {kind: [] for kind in SYNCED}
+    deleted = {kind: [] for kind in SYNCED}
+    for _, kind, object_id, is_deleted in entries:
+        (deleted if is_deleted else changed)[kind].append(object_id)
+
+    result = {'version': entries[-1][0] if entries else since, 'more': more}
+    for kind, (model, fields) in SYNCED.items():
+        rows = [
+            [_compact(value) for value in row]
+            for row in model.objects.filter(pk__in=changed[kind]).order_by('pk').values_list(*fields)
+        ] if changed[kind] else []
+        # Deleted after its log row was read: its tombstone is further on,
+        # but there is nothing to send now either
+        found = {row[0] for row in rows}
+        gone = [object_id for object_id in changed[kind] if object_id not in found]
+        result[kind] = {'fields': fields, 'rows': rows, 'deleted': deleted[kind] + gone}
+    return result
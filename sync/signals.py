@@ -0,0 +1,21 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from customers.models import Customer
+from items.models import Item
+
+from .services import record_change
+
+_KINDS = {Item: 'item', Customer: 'customer'}
+
+
+@receiver(post_save, sender=Item)
+@receiver(post_save, sender=Customer)
+def handle_synced_save(sender, instance, **kwargs):
+    record_change(_KINDS[sender], instance.pk)
+
+
+@receiver(post_delete, sender=Item)
+@receiver(post_delete, sender=Customer)
+def handle_synced_delete(sender, instance, **kwargs):
+    record_change(_KINDS[sender], instance.pk, deleted=True)
@@ -0,0 +1,33 @@
+from django.test import TestCase
+
+from items.models import Item
+
+from .models import ChangeLog
+from .services import changes_since, latest_version
+
+
+class ChangeLogVersionTests(TestCase):
+    def test_saves_move_the_object_to_the_next_version(self):
+        start = latest_version()
+        rod = Item.objects.create(name='Rod', sku='ROD-1')
+        pipe = Item.objects.create(name='Pipe', sku='PIPE-1')
+        rod.name = 'Steel rod'
+        rod.save()
+
+        self.assertEqual(latest_version(), start + 3)
+        self.assertEqual(ChangeLog.objects.get(kind='item', object_id=rod.pk).version, start + 3)
+        self.assertEqual(ChangeLog.objects.filter(kind='item', object_id=rod.pk).count(), 1)
+
+        page = changes_since(start + 1)
+        self.assertEqual(page['version'], start + 3)
+        self.assertEqual({row[0] for row in page['item']['rows']}, {pipe.pk, rod.pk})
+
+    def test_delete_leaves_a_tombstone_at_a_new_version(self):
+        rod = Item.objects.create(name='Rod', sku='ROD-1')
+        before = latest_version()
+        rod_id = rod.pk
+        rod.delete()
+
+        page = changes_since(before)
+        self.assertEqual(page['version'], before + 1)
+        self.assertEqual(page['item']['deleted'], [rod_id])
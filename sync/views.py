@@ -0,0 +1,29 @@
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from auth_user.permissions import IsAdminOrCashier
+
+from .services import SYNC_PAGE_SIZE, changes_since
+
+
+class SyncView(APIView):
+    """
+    Delta sync for offline terminals.
+
+    GET ?since=<version>&limit=<n> returns the items and customers changed
+    after `version` in a column/row format, plus the ids deleted since then.
+    Start with since=0 (the whole catalog), then keep the returned
+    'version' and call again while 'more' is true. Reconnecting costs one
+    row per object that changed while offline.
+    """
+    permission_classes = [IsAdminOrCashier]
+
+    def get(self, request):
+        try:
+            since = int(request.query_params.get('since', 0))
+            limit = int(request.query_params.get('limit', SYNC_PAGE_SIZE))
+        except ValueError:
+            return Response({'detail': 'since and limit must be integers.'}, status=400)
+        if since < 0 or limit < 1:
+            return Response({'detail': 'since must be 0 or more and limit at least 1.'}, status=400)
+        return Response(changes_since(since, min(limit, SYNC_PAGE_SIZE)))